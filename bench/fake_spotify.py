@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import itertools
+import random
+from collections import Counter
+
+from aiohttp import web
+
+"""
+Локальная замена Spotify Web API и сервера авторизации для нагрузочного теста
+"""
+
+# Размер каталога фиктивных треков
+CATALOG_SIZE = 10000
+
+
+def track_id(index: int) -> str:
+    """
+    Идентификатор фиктивного трека (22 символа, как у Spotify).
+
+    :param index: Номер трека в каталоге
+    :type index: int
+    :return: Идентификатор трека
+    :rtype: str
+    """
+    return f"bench{index:017d}"
+
+
+def track_item(index: int) -> dict:
+    """
+    Объект трека в формате Spotify Web API.
+
+    :param index: Номер трека в каталоге
+    :type index: int
+    :return: Объект трека
+    :rtype: dict
+    """
+    tid = track_id(index)
+    return {
+        "id": tid,
+        "name": f"Track {index}",
+        "uri": f"spotify:track:{tid}",
+        "duration_ms": 180000 + index % 120000,
+        "artists": [{"name": f"Artist {index % 500}"}],
+        "album": {"name": f"Album {index % 2000}", "images": []},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{tid}"},
+    }
+
+
+class FakeSpotify:
+    """
+    Сервер, имитирующий Spotify: задержку ответа, истечение токенов (401)
+    и ограничение частоты запросов (429 с Retry-After).
+
+    :ivar latency: Задержка ответа в секундах
+    :ivar error_401: Доля запросов, на которые токен «истекает»
+    :ivar error_429: Доля запросов, отклоняемых с 429
+    :ivar retry_after: Значение Retry-After для ответов 429 (сек.)
+    :ivar requests: Число запросов по эндпоинтам
+    :ivar statuses: Число ответов по HTTP-статусам
+    """
+
+    def __init__(self, latency: float = 0.05, error_401: float = 0.0, error_429: float = 0.0,
+                 retry_after: int = 1, seed: int | None = None):
+        self.latency = latency
+        self.error_401 = error_401
+        self.error_429 = error_429
+        self.retry_after = retry_after
+        self.requests: Counter[str] = Counter()
+        self.statuses: Counter[int] = Counter()
+        self._random = random.Random(seed)
+        self._tokens: set[str] = set()
+        self._token_ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+        self.app = self._make_app()
+
+    def issue_token(self) -> str:
+        """
+        Выдача действующего токена доступа.
+
+        :return: Токен доступа
+        :rtype: str
+        """
+        token = f"bench-token-{next(self._token_ids)}"
+        self._tokens.add(token)
+        return token
+
+    def total_requests(self, prefix: str = "") -> int:
+        """
+        Число запросов к эндпоинтам с заданным префиксом.
+
+        :param prefix: Префикс метки эндпоинта (например, "POST /api/token")
+        :type prefix: str
+        :return: Число запросов
+        :rtype: int
+        """
+        return sum(count for endpoint, count in self.requests.items() if endpoint.startswith(prefix))
+
+    def _make_app(self) -> web.Application:
+        """
+        Создание приложения aiohttp с маршрутами Spotify.
+
+        :return: Приложение aiohttp
+        :rtype: web.Application
+        """
+        app = web.Application(middlewares=[self._middleware])
+        app.router.add_post("/api/token", self._token)
+        app.router.add_get("/v1/me", self._me)
+        app.router.add_get("/v1/search", self._search)
+        app.router.add_get("/v1/tracks", self._tracks)
+        app.router.add_get("/v1/tracks/{id}", self._track)
+        app.router.add_get("/v1/me/player/devices", self._devices)
+        app.router.add_put("/v1/me/player/play", self._no_content)
+        app.router.add_post("/v1/me/player/queue", self._no_content)
+        app.router.add_put("/v1/me/tracks", self._no_content)
+        app.router.add_get("/v1/me/tracks/contains", self._contains)
+        return app
+
+    @web.middleware
+    async def _middleware(self, request: web.Request, handler) -> web.StreamResponse:
+        """
+        Учёт запросов, задержка и внедрение ошибок 401/429.
+
+        :param request: Входящий запрос
+        :param handler: Обработчик маршрута
+        :return: Ответ
+        """
+        resource = request.match_info.route.resource
+        endpoint = f"{request.method} {resource.canonical if resource else request.path}"
+        self.requests[endpoint] += 1
+        await asyncio.sleep(self.latency)
+
+        if request.path.startswith("/v1/"):
+            response = self._inject_errors(request)
+            if response is None:
+                response = await handler(request)
+        else:
+            response = await handler(request)
+
+        self.statuses[response.status] += 1
+        return response
+
+    def _inject_errors(self, request: web.Request) -> web.Response | None:
+        """
+        Проверка токена и случайные ответы 401/429.
+
+        :param request: Входящий запрос
+        :return: Ответ с ошибкой или None
+        """
+        if self._random.random() < self.error_429:
+            return web.json_response(
+                {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                status=429,
+                headers={"Retry-After": str(self.retry_after)},
+            )
+
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        # Истечение токена раньше срока: клиент должен обновить его и повторить запрос
+        if token in self._tokens and self._random.random() < self.error_401:
+            self._tokens.discard(token)
+        if token not in self._tokens:
+            return web.json_response(
+                {"error": {"status": 401, "message": "The access token expired"}},
+                status=401,
+            )
+        return None
+
+    async def _token(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "access_token": self.issue_token(),
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "scope": "user-modify-playback-state user-library-modify user-library-read",
+        })
+
+    async def _me(self, request: web.Request) -> web.Response:
+        return web.json_response({"id": "bench-user", "display_name": "Bench"})
+
+    async def _search(self, request: web.Request) -> web.Response:
+        limit = int(request.query.get("limit", 10))
+        offset = int(request.query.get("offset", 0))
+        digest = hashlib.sha1(request.query.get("q", "").encode()).digest()
+        start = int.from_bytes(digest[:4], "big") % CATALOG_SIZE
+        items = [track_item((start + offset + i) % CATALOG_SIZE) for i in range(limit)]
+        return web.json_response({"tracks": {"items": items, "total": 1000, "limit": limit, "offset": offset}})
+
+    async def _tracks(self, request: web.Request) -> web.Response:
+        ids = request.query.get("ids", "").split(",")
+        return web.json_response({"tracks": [track_item(int(tid[5:])) for tid in ids]})
+
+    async def _track(self, request: web.Request) -> web.Response:
+        return web.json_response(track_item(int(request.match_info["id"][5:])))
+
+    async def _devices(self, request: web.Request) -> web.Response:
+        return web.json_response({"devices": [
+            {"id": "bench-device", "name": "Bench", "type": "Computer", "is_active": True},
+        ]})
+
+    async def _contains(self, request: web.Request) -> web.Response:
+        ids = request.query.get("ids", "").split(",")
+        return web.json_response([int(tid[5:]) % 3 == 0 for tid in ids])
+
+    async def _no_content(self, request: web.Request) -> web.Response:
+        return web.Response(status=204)
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """
+        Запуск сервера.
+
+        :param host: Адрес
+        :type host: str
+        :param port: Порт (0 — любой свободный)
+        :type port: int
+        :return: Базовый URL сервера
+        :rtype: str
+        """
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        """
+        Остановка сервера.
+
+        :return: None
+        """
+        if self._runner:
+            await self._runner.cleanup()
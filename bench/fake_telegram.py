@@ -0,0 +1,146 @@
+import datetime
+import itertools
+from collections import Counter
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import EditMessageText, SendMessage, TelegramMethod
+from aiogram.types import Chat, InlineKeyboardMarkup, Message, Update
+
+"""
+Сессия Telegram без сети и генерация синтетических апдейтов для нагрузочного теста
+"""
+
+# Счётчики идентификаторов апдейтов, сообщений и запросов
+_update_ids = itertools.count(1)
+_message_ids = itertools.count(1)
+_query_ids = itertools.count(1)
+
+
+class BenchSession(BaseSession):
+    """
+    Сессия бота, отвечающая на методы Bot API локально.
+
+    Запоминает последнюю клавиатуру в каждом чате, чтобы генератор
+    нагрузки мог «нажимать» кнопки, которые бот действительно отправил.
+
+    :ivar methods: Число вызовов по методам Bot API
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.methods: Counter[str] = Counter()
+        self._keyboards: dict[int, list[str]] = {}
+
+    def buttons(self, chat_id: int) -> list[str]:
+        """
+        callback_data кнопок последнего сообщения в чате.
+
+        :param chat_id: ID чата
+        :type chat_id: int
+        :return: Список callback_data
+        :rtype: list[str]
+        """
+        return self._keyboards.get(chat_id, [])
+
+    async def make_request(self, bot: Bot, method: TelegramMethod[Any], timeout: int | None = None) -> Any:
+        self.methods[type(method).__name__] += 1
+        if not isinstance(method, (SendMessage, EditMessageText)):
+            return True
+
+        chat_id = int(method.chat_id)
+        markup = method.reply_markup
+        if isinstance(markup, InlineKeyboardMarkup):
+            self._keyboards[chat_id] = [
+                button.callback_data for row in markup.inline_keyboard for button in row if button.callback_data
+            ]
+        return Message(
+            message_id=getattr(method, "message_id", None) or next(_message_ids),
+            date=datetime.datetime.now(),
+            chat=Chat(id=chat_id, type="private"),
+            text=method.text,
+        )
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def _from_user(telegram_id: int) -> dict:
+    return {"id": telegram_id, "is_bot": False, "first_name": "Bench"}
+
+
+def message_update(telegram_id: int, text: str) -> Update:
+    """
+    Апдейт с текстовым сообщением пользователя.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param text: Текст сообщения
+    :type text: str
+    :return: Апдейт
+    :rtype: Update
+    """
+    return Update.model_validate({
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": next(_message_ids),
+            "date": int(datetime.datetime.now().timestamp()),
+            "chat": {"id": telegram_id, "type": "private"},
+            "from": _from_user(telegram_id),
+            "text": text,
+        },
+    })
+
+
+def callback_update(telegram_id: int, data: str) -> Update:
+    """
+    Апдейт с нажатием inline-кнопки.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param data: callback_data кнопки
+    :type data: str
+    :return: Апдейт
+    :rtype: Update
+    """
+    return Update.model_validate({
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_query_ids)),
+            "chat_instance": str(telegram_id),
+            "from": _from_user(telegram_id),
+            "data": data,
+            "message": {
+                "message_id": next(_message_ids),
+                "date": int(datetime.datetime.now().timestamp()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "text": "bench",
+            },
+        },
+    })
+
+
+def inline_update(telegram_id: int, query: str) -> Update:
+    """
+    Апдейт с inline-запросом.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param query: Текст запроса
+    :type query: str
+    :return: Апдейт
+    :rtype: Update
+    """
+    return Update.model_validate({
+        "update_id": next(_update_ids),
+        "inline_query": {
+            "id": str(next(_query_ids)),
+            "from": _from_user(telegram_id),
+            "query": query,
+            "offset": "",
+        },
+    })
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import datetime
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+from bench.fake_spotify import FakeSpotify
+from bench.fake_telegram import BenchSession, callback_update, inline_update, message_update
+
+"""
+Нагрузочный тест бота без сети: синтетические апдейты Telegram проходят
+через настоящий Dispatcher из setup_bot(), а запросы к Spotify — в локальный
+фиктивный сервер.
+
+Запуск из корня проекта::
+
+    python -m bench.run_bench --updates 2000 --concurrency 50 --latency 0.05
+"""
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    """
+    Разбор параметров командной строки.
+
+    :param argv: Аргументы (по умолчанию sys.argv)
+    :type argv: list[str] | None
+    :return: Параметры теста
+    :rtype: argparse.Namespace
+    """
+    parser = argparse.ArgumentParser(description="Нагрузочный тест Spotify-бота")
+    parser.add_argument("--updates", type=int, default=2000, help="число апдейтов")
+    parser.add_argument("--users", type=int, default=200, help="число пользователей")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременно обрабатываемых апдейтов")
+    parser.add_argument("--queries", type=int, default=100, help="число различных поисковых запросов")
+    parser.add_argument("--inline-share", type=float, default=0.2, help="доля inline-запросов")
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа Spotify (сек.)")
+    parser.add_argument("--error-401", type=float, default=0.0, help="доля запросов с истёкшим токеном")
+    parser.add_argument("--error-429", type=float, default=0.0, help="доля запросов с ответом 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After для ответов 429 (сек.)")
+    parser.add_argument("--rate-limit", type=float, default=1000, help="SPOTIFY_RATE_LIMIT бота (запросов/сек.)")
+    parser.add_argument("--inline-debounce", type=float, default=0.0, help="INLINE_DEBOUNCE бота (сек.)")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора случайных чисел")
+    parser.add_argument("--output", help="файл для сохранения отчёта")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args: argparse.Namespace, spotify_url: str):
+    """
+    Настройка окружения бота до импорта bot.config.
+
+    :param args: Параметры теста
+    :type args: argparse.Namespace
+    :param spotify_url: Базовый URL фиктивного Spotify
+    :type spotify_url: str
+    :return: None
+    """
+    os.environ.update({
+        "BOT_TOKEN": "42:bench",
+        "SPOTIFY_CLIENT_ID": "bench",
+        "SPOTIFY_CLIENT_SECRET": "bench",
+        "SPOTIFY_API_URL": f"{spotify_url}/v1",
+        "SPOTIFY_ACCOUNTS_URL": spotify_url,
+        "SOCKS5_PROXY": "",
+        "DATABASE_URL": "sqlite://bench.sqlite3",
+        "SPOTIFY_RATE_LIMIT": str(args.rate_limit),
+        "SPOTIFY_RATE_BURST": str(max(1, int(args.rate_limit))),
+        "INLINE_DEBOUNCE": str(args.inline_debounce),
+    })
+
+
+def percentile(values: list[float], q: float) -> float:
+    """
+    Перцентиль по методу ближайшего ранга.
+
+    :param values: Отсортированные значения
+    :type values: list[float]
+    :param q: Перцентиль от 0 до 100
+    :type q: float
+    :return: Значение перцентиля
+    :rtype: float
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(q / 100 * len(values)) - 1))]
+
+
+class LoadGenerator:
+    """
+    Генератор сценариев пользователей: поиск, выбор трека, действия
+    с треком и возврат к результатам, а также inline-запросы.
+
+    :ivar session: Сессия бота, хранящая отправленные клавиатуры
+    :ivar queries: Набор поисковых запросов
+    :ivar inline_share: Доля inline-запросов
+    """
+
+    def __init__(self, session: BenchSession, queries: int, inline_share: float, seed: int):
+        self.session = session
+        self.queries = [f"artist {i} song" for i in range(queries)]
+        self.inline_share = inline_share
+        self._random = random.Random(seed)
+
+    def _query(self) -> str:
+        # Популярные запросы повторяются чаще (распределение, близкое к Ципфу)
+        return self.queries[min(len(self.queries) - 1, int(self._random.paretovariate(1.2)) - 1)]
+
+    def next_update(self, telegram_id: int):
+        """
+        Следующий апдейт пользователя с учётом его последней клавиатуры.
+
+        :param telegram_id: ID пользователя
+        :type telegram_id: int
+        :return: Пара (вид апдейта, апдейт)
+        """
+        if self._random.random() < self.inline_share:
+            query = self._query()
+            return "inline", inline_update(telegram_id, query[:self._random.randint(3, len(query))])
+
+        buttons = self.session.buttons(telegram_id)
+        if not buttons or self._random.random() < 0.2:
+            return "search", message_update(telegram_id, f"/search {self._query()}")
+
+        data = self._random.choice(buttons)
+        return data.split(":", 1)[0], callback_update(telegram_id, data)
+
+
+async def seed_users(spotify: FakeSpotify, count: int):
+    """
+    Создание авторизованных пользователей в БД.
+
+    :param spotify: Фиктивный Spotify, выдающий токены
+    :type spotify: FakeSpotify
+    :param count: Число пользователей
+    :type count: int
+    :return: None
+    """
+    from bot.database.models import User
+
+    expires_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+    await User.bulk_create([
+        User(
+            telegram_id=telegram_id,
+            spotify_access_token=spotify.issue_token(),
+            spotify_refresh_token=f"bench-refresh-{telegram_id}",
+            spotify_token_expires_at=expires_at,
+        ) for telegram_id in range(1, count + 1)
+    ])
+
+
+def format_report(args: argparse.Namespace, spotify: FakeSpotify, session: BenchSession,
+                  latencies: dict[str, list[float]], errors: int, elapsed: float) -> str:
+    """
+    Текстовый отчёт о прогоне.
+
+    :return: Отчёт
+    :rtype: str
+    """
+    from bot.services.ratelimit import limiter
+
+    total = sum(len(values) for values in latencies.values())
+    api_calls = spotify.total_requests("GET /v1") + spotify.total_requests("PUT /v1") \
+        + spotify.total_requests("POST /v1")
+    lines = [
+        f"updates={total} users={args.users} concurrency={args.concurrency} "
+        f"latency={args.latency}s 401={args.error_401} 429={args.error_429}",
+        f"elapsed: {elapsed:.2f}s  throughput: {total / elapsed:.1f} updates/s  errors: {errors}",
+        f"spotify calls/update: {api_calls / max(total, 1):.2f}  "
+        f"token refreshes: {spotify.total_requests('POST /api/token')}  "
+        f"limiter rejected: {limiter.rejected}",
+        "",
+        f"{'kind':<14}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for kind, values in sorted(latencies.items()) + [("all", sum(latencies.values(), []))]:
+        values = sorted(values)
+        lines.append(
+            f"{kind:<14}{len(values):>7}"
+            + "".join(f"{percentile(values, q) * 1000:>10.1f}" for q in (50, 95, 99))
+        )
+
+    lines += ["", "spotify requests:"]
+    lines += [f"  {endpoint:<32}{count:>7}" for endpoint, count in spotify.requests.most_common()]
+    lines += ["spotify statuses: " + ", ".join(f"{status}={count}" for status, count in sorted(spotify.statuses.items()))]
+    lines += ["telegram methods: " + ", ".join(f"{name}={count}" for name, count in session.methods.most_common())]
+    return "\n".join(lines)
+
+
+async def run(args: argparse.Namespace) -> str:
+    """
+    Прогон нагрузочного теста.
+
+    :param args: Параметры теста
+    :type args: argparse.Namespace
+    :return: Отчёт
+    :rtype: str
+    """
+    spotify = FakeSpotify(args.latency, args.error_401, args.error_429, args.retry_after, args.seed)
+    configure_environment(args, await spotify.start())
+
+    # База данных и bot.log создаются во временном каталоге
+    cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+
+    from aiogram import Bot
+    from tortoise import Tortoise
+
+    from bot.main import setup_bot
+    from bot.services.spotify_api import close_session
+
+    # Журнал каждого апдейта искажает замеры — остаются только предупреждения
+    logging.getLogger().setLevel(logging.WARNING)
+
+    try:
+        dp, _ = await setup_bot()
+        session = BenchSession()
+        bot = Bot("42:bench", session=session)
+        await seed_users(spotify, args.users)
+
+        generator = LoadGenerator(session, args.queries, args.inline_share, args.seed)
+        latencies: dict[str, list[float]] = defaultdict(list)
+        errors = 0
+        remaining = args.updates
+        user_ids = iter(range(args.updates))
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                telegram_id = next(user_ids) % args.users + 1
+                kind, update = generator.next_update(telegram_id)
+                start = time.perf_counter()
+                try:
+                    await dp.feed_update(bot, update)
+                except Exception:
+                    errors += 1
+                latencies[kind].append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        return format_report(args, spotify, session, latencies, errors, elapsed)
+    finally:
+        await close_session()
+        await Tortoise.close_connections()
+        await spotify.stop()
+        os.chdir(cwd)
+        workdir.cleanup()
+
+
+def main(argv: list[str] | None = None):
+    """
+    Точка входа нагрузочного теста.
+
+    :param argv: Аргументы командной строки
+    :type argv: list[str] | None
+    :return: None
+    """
+    args = parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    report = asyncio.run(run(args))
+    print(report)
+    if output:
+        with open(output, "w", encoding="utf-8") as file:
+            file.write(report + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -18,3 +18,132 @@ SPOTIFY_REDIRECT_URI = os.getenv("SPOTIFY_REDIRECT_URI")
 
 # Прокси SOCKS5 (опционально)
 SOCKS5_PROXY = os.getenv("SOCKS5_PROXY")
+
+# Адреса Spotify Web API и сервера авторизации
+SPOTIFY_API_URL = os.getenv("SPOTIFY_API_URL", "https://api.spotify.com/v1")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+
+# Пул HTTP-соединений к Spotify: максимум соединений и таймаут запроса (сек.)
+SPOTIFY_HTTP_POOL_SIZE = int(os.getenv("SPOTIFY_HTTP_POOL_SIZE", "100"))
+SPOTIFY_HTTP_TIMEOUT = float(os.getenv("SPOTIFY_HTTP_TIMEOUT", "10"))
+
+# Реестр клиентов Spotify: максимум пользователей и время простоя до вытеснения (сек.)
+SPOTIFY_CLIENT_CACHE_SIZE = int(os.getenv("SPOTIFY_CLIENT_CACHE_SIZE", "1000"))
+SPOTIFY_CLIENT_IDLE_TTL = float(os.getenv("SPOTIFY_CLIENT_IDLE_TTL", "1800"))
+
+# Рынок (ISO 3166-1 alpha-2) для запросов к каталогу Spotify (опционально)
+SPOTIFY_MARKET = os.getenv("SPOTIFY_MARKET") or None
+
+# Кэш результатов поиска: бэкенд, максимум запросов и время жизни (сек.)
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "5000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+
+# Кэш метаданных треков: максимум записей и время жизни (сек.)
+TRACK_CACHE_SIZE = int(os.getenv("TRACK_CACHE_SIZE", "20000"))
+TRACK_CACHE_TTL = float(os.getenv("TRACK_CACHE_TTL", "86400"))
+
+# Сессии результатов поиска для inline-кнопок: максимум сессий и время жизни (сек.)
+SEARCH_SESSION_CACHE_SIZE = int(os.getenv("SEARCH_SESSION_CACHE_SIZE", "10000"))
+SEARCH_SESSION_TTL = float(os.getenv("SEARCH_SESSION_TTL", "3600"))
+
+# Кэш пользователей из БД: максимум записей и время жизни (сек.)
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "3600"))
+
+# Время жизни кэша списка устройств пользователя (сек.)
+DEVICE_CACHE_TTL = float(os.getenv("DEVICE_CACHE_TTL", "30"))
+
+# Webhook: публичный адрес бота (если не задан — используется polling), путь и секрет
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+
+# Максимум одновременных соединений Telegram к webhook
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+
+# Максимум одновременно обрабатываемых апдейтов (webhook и polling)
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "100"))
+
+# Глобальное ограничение запросов к Spotify: запросов в секунду и размер всплеска
+SPOTIFY_RATE_LIMIT = float(os.getenv("SPOTIFY_RATE_LIMIT", "20"))
+SPOTIFY_RATE_BURST = int(os.getenv("SPOTIFY_RATE_BURST", "40"))
+
+# Максимальное ожидание в очереди к Spotify (сек.): для действий пользователя и фоновых задач
+SPOTIFY_QUEUE_TIMEOUT = float(os.getenv("SPOTIFY_QUEUE_TIMEOUT", "5"))
+SPOTIFY_BACKGROUND_QUEUE_TIMEOUT = float(os.getenv("SPOTIFY_BACKGROUND_QUEUE_TIMEOUT", "120"))
+
+# Окно подавления повторных нажатий одной кнопки (сек.) и лимит одновременных действий пользователя
+ACTION_DEDUP_WINDOW = float(os.getenv("ACTION_DEDUP_WINDOW", "2"))
+USER_MAX_CONCURRENT_ACTIONS = int(os.getenv("USER_MAX_CONCURRENT_ACTIONS", "2"))
+
+# Пакетная запись лайков: окно накопления (сек.); кэш признака «в избранном» (сек.)
+LIKE_BATCH_WINDOW = float(os.getenv("LIKE_BATCH_WINDOW", "0.5"))
+SAVED_STATE_TTL = float(os.getenv("SAVED_STATE_TTL", "300"))
+
+# Inline-режим: задержка перед поиском (сек.), число результатов и время кэша ответа в Telegram (сек.)
+INLINE_DEBOUNCE = float(os.getenv("INLINE_DEBOUNCE", "0.4"))
+INLINE_RESULTS_LIMIT = int(os.getenv("INLINE_RESULTS_LIMIT", "10"))
+INLINE_CACHE_TIME = int(os.getenv("INLINE_CACHE_TIME", "300"))
+
+# База данных: URL Tortoise ORM (sqlite://, postgres://, mysql://) и размер пула соединений серверных СУБД
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite://db.sqlite3")
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+# SQLite: ожидание снятия блокировки (мс) и режим synchronous (с WAL достаточно NORMAL)
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+# Логирование: уровень, формат (text или json) и размер очереди записей до фонового потока
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Число процессов-обработчиков апдейтов (больше 1 — режим супервизора с шардированием по telegram_id)
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Период отчёта процессов-обработчиков о состоянии (сек.)
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5"))
+
+# Первый порт /metrics процессов-обработчиков: порт процесса — WORKER_METRICS_PORT + номер (0 — не запускать)
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "0"))
+
+# Номер процесса-обработчика (задаётся супервизором при запуске процесса)
+WORKER_INDEX = os.getenv("BOT_WORKER_INDEX")
+
+# OAuth: ключ подписи state (по умолчанию выводится из BOT_TOKEN), срок действия ссылки авторизации (сек.)
+OAUTH_STATE_SECRET = os.getenv("OAUTH_STATE_SECRET")
+OAUTH_STATE_TTL = int(os.getenv("OAUTH_STATE_TTL", "600"))
+
+# Максимум одновременных обменов кода авторизации на токен
+OAUTH_MAX_CONCURRENT = int(os.getenv("OAUTH_MAX_CONCURRENT", "10"))
+
+# Размер страницы результатов /search (Spotify отдаёт не больше 50 треков за запрос)
+SEARCH_PAGE_SIZE = min(50, max(1, int(os.getenv("SEARCH_PAGE_SIZE", "5"))))
+
+# /nowplaying: бюджет опроса Spotify для всех подписчиков (запросов в секунду, делится между процессами),
+# максимальный период опроса во время воспроизведения, период при паузе и его предел (сек.), длительность слежения (сек.)
+NOWPLAYING_RATE = float(os.getenv("NOWPLAYING_RATE", "2"))
+NOWPLAYING_INTERVAL = float(os.getenv("NOWPLAYING_INTERVAL", "15"))
+NOWPLAYING_IDLE_INTERVAL = float(os.getenv("NOWPLAYING_IDLE_INTERVAL", "30"))
+NOWPLAYING_MAX_IDLE_INTERVAL = float(os.getenv("NOWPLAYING_MAX_IDLE_INTERVAL", "300"))
+NOWPLAYING_WATCH_TTL = float(os.getenv("NOWPLAYING_WATCH_TTL", "3600"))
+
+# Зеркало библиотеки: период синхронизации пользователя (сек.), период проверки очереди синхронизации (сек.)
+# и число пользователей, синхронизируемых одновременно
+LIBRARY_SYNC_INTERVAL = float(os.getenv("LIBRARY_SYNC_INTERVAL", "3600"))
+LIBRARY_SYNC_TICK = float(os.getenv("LIBRARY_SYNC_TICK", "60"))
+LIBRARY_SYNC_CONCURRENCY = int(os.getenv("LIBRARY_SYNC_CONCURRENCY", "2"))
+
+# Локальный поисковый индекс треков: задержка пакетной записи новых треков (сек.)
+# и время ожидания Spotify, после которого /search отвечает из индекса (сек.)
+TRACK_INDEX_FLUSH_DELAY = float(os.getenv("TRACK_INDEX_FLUSH_DELAY", "1"))
+SEARCH_LATENCY_BUDGET = float(os.getenv("SEARCH_LATENCY_BUDGET", "2"))
+
+# Просмотр плейлистов: треков и плейлистов на странице, число треков для «в очередь»,
+# кэш страниц треков по snapshot_id (максимум страниц и время жизни, сек.)
+PLAYLIST_BROWSER_PAGE_SIZE = min(50, max(1, int(os.getenv("PLAYLIST_BROWSER_PAGE_SIZE", "10"))))
+PLAYLIST_QUEUE_COUNT = int(os.getenv("PLAYLIST_QUEUE_COUNT", "10"))
+PLAYLIST_PAGE_CACHE_SIZE = int(os.getenv("PLAYLIST_PAGE_CACHE_SIZE", "5000"))
+PLAYLIST_PAGE_CACHE_TTL = float(os.getenv("PLAYLIST_PAGE_CACHE_TTL", "86400"))
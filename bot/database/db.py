@@ -1,17 +1,62 @@
 from tortoise import Tortoise
+from tortoise.backends.base.config_generator import expand_db_url
+
+from bot.config import (
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    SQLITE_BUSY_TIMEOUT,
+    SQLITE_SYNCHRONOUS,
+)
+from bot.database.migrations import migrate
+from bot.utils.metrics import instrument_db_client
+
+
+def db_config(db_url: str = DATABASE_URL) -> dict:
+    """
+    Конфигурация Tortoise ORM по URL базы данных.
+
+    Для SQLite задаются PRAGMA для конкурентного доступа (WAL, ожидание
+    блокировки, synchronous), для серверных СУБД — размер пула соединений.
+    Параметры, явно указанные в URL, имеют приоритет.
+
+    :param db_url: URL базы данных
+    :type db_url: str
+    :return: Словарь конфигурации для Tortoise.init
+    :rtype: dict
+    """
+    connection = expand_db_url(db_url)
+    credentials = connection["credentials"]
+    if connection["engine"] == "tortoise.backends.sqlite":
+        credentials.setdefault("journal_mode", "WAL")
+        credentials.setdefault("busy_timeout", SQLITE_BUSY_TIMEOUT)
+        credentials.setdefault("synchronous", SQLITE_SYNCHRONOUS)
+    else:
+        credentials.setdefault("minsize", DB_POOL_MIN_SIZE)
+        credentials.setdefault("maxsize", DB_POOL_MAX_SIZE)
+
+    return {
+        "connections": {"default": connection},
+        "apps": {
+            "models": {
+                "models": ["bot.database.models"],
+                "default_connection": "default",
+            },
+        },
+    }
 
 
 async def init_db():
     """
-    Инициализация базы данных и генерация схем.
+    Инициализация базы данных и миграция схемы.
 
     :return: None
     """
-    # Подключение к базе данных SQLite и регистрация моделей
-    await Tortoise.init(
-        db_url="sqlite://db.sqlite3",
-        modules={"models": ["bot.database.models"]}
-    )
-
-    # Создание таблиц согласно моделям
-    await Tortoise.generate_schemas()
+    # Подключение к базе данных и регистрация моделей
+    await Tortoise.init(config=db_config())
+
+    # Замер длительности запросов к БД
+    instrument_db_client(Tortoise.get_connection("default"))
+
+    # Создание или обновление схемы по версиям
+    await migrate()
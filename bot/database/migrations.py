@@ -0,0 +1,274 @@
+import datetime
+import sqlite3
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+from tortoise.utils import get_schema_sql
+
+from bot.database.models import SchemaVersion
+from bot.utils.logger import logger
+
+"""
+Версионные миграции схемы БД: каждая применяется один раз и записывается в schema_version
+"""
+
+# Таблица с применёнными версиями схемы
+VERSION_TABLE = SchemaVersion._meta.db_table
+
+# Ключ advisory-блокировки миграций в PostgreSQL
+MIGRATION_LOCK_ID = 0x5EC7_0B07
+
+
+async def table_exists(conn: BaseDBAsyncClient, table: str) -> bool:
+    """
+    Проверка существования таблицы.
+
+    :param conn: Подключение к БД
+    :type conn: BaseDBAsyncClient
+    :param table: Имя таблицы
+    :type table: str
+    :return: True, если таблица есть
+    :rtype: bool
+    """
+    if conn.capabilities.dialect == "sqlite":
+        rows = await conn.execute_query_dict(
+            f"SELECT name FROM sqlite_master WHERE type = 'table' AND name = '{table}'"
+        )
+    else:
+        rows = await conn.execute_query_dict(
+            f"SELECT table_name FROM information_schema.tables WHERE table_name = '{table}'"
+        )
+    return bool(rows)
+
+
+async def table_columns(conn: BaseDBAsyncClient, table: str) -> set[str]:
+    """
+    Имена колонок таблицы.
+
+    :param conn: Подключение к БД
+    :type conn: BaseDBAsyncClient
+    :param table: Имя таблицы
+    :type table: str
+    :return: Множество имён колонок
+    :rtype: set[str]
+    """
+    if conn.capabilities.dialect == "sqlite":
+        rows = await conn.execute_query_dict(f"PRAGMA table_info({table})")
+        return {row["name"] for row in rows}
+    rows = await conn.execute_query_dict(
+        f"SELECT column_name FROM information_schema.columns WHERE table_name = '{table}'"
+    )
+    return {row["column_name"] for row in rows}
+
+
+async def add_column(conn: BaseDBAsyncClient, table: str, column: str, ddl: str):
+    """
+    Добавление колонки, если её ещё нет.
+
+    :param conn: Подключение к БД
+    :type conn: BaseDBAsyncClient
+    :param table: Имя таблицы
+    :type table: str
+    :param column: Имя колонки
+    :type column: str
+    :param ddl: Тип и ограничения колонки
+    :type ddl: str
+    :return: None
+    """
+    if column not in await table_columns(conn, table):
+        await conn.execute_query(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+async def execute_statements(conn: BaseDBAsyncClient, script: str):
+    """
+    Выполнение SQL-скрипта внутри транзакции миграции.
+
+    executescript в SQLite сначала фиксирует открытую транзакцию (и снимает
+    блокировку миграций), поэтому там скрипт выполняется по одной инструкции.
+
+    :param conn: Подключение к БД (транзакция)
+    :type conn: BaseDBAsyncClient
+    :param script: Инструкции SQL, разделённые «;»
+    :type script: str
+    :return: None
+    """
+    if conn.capabilities.dialect != "sqlite":
+        await conn.execute_script(script)
+        return
+
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            await conn.execute_query(statement)
+            statement = ""
+
+
+async def create_schema(conn: BaseDBAsyncClient):
+    """
+    Создание недостающих таблиц по моделям (CREATE ... IF NOT EXISTS).
+
+    :param conn: Подключение к БД (транзакция)
+    :type conn: BaseDBAsyncClient
+    :return: None
+    """
+    await execute_statements(conn, get_schema_sql(conn, safe=True))
+
+
+async def _token_expiry_and_device(conn: BaseDBAsyncClient):
+    # Срок действия токена и предпочитаемое устройство (раньше добавлялись при каждом запуске)
+    await add_column(conn, "users", "spotify_token_expires_at", "TIMESTAMP NULL")
+    await add_column(conn, "users", "spotify_device_id", "TEXT NULL")
+
+
+async def _library_mirror(conn: BaseDBAsyncClient):
+    # Таблицы зеркала библиотеки (tracks, saved_tracks, playlists, playlist_tracks, library_state);
+    # CREATE ... IF NOT EXISTS не трогает уже существующие таблицы
+    await create_schema(conn)
+
+
+# Полнотекстовый индекс по tracks: регистр и диакритика игнорируются, префиксы из 2–3 символов
+# индексируются отдельно. Индекс ссылается на rowid таблицы tracks, поэтому после VACUUM его
+# нужно перестроить: INSERT INTO tracks_fts(tracks_fts) VALUES('rebuild').
+TRACK_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS tracks_fts USING fts5("
+    "name, artist, content='tracks', content_rowid='rowid', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS tracks_fts_insert AFTER INSERT ON tracks BEGIN "
+    "INSERT INTO tracks_fts(rowid, name, artist) VALUES (new.rowid, new.name, new.artist); END",
+    "CREATE TRIGGER IF NOT EXISTS tracks_fts_update AFTER UPDATE OF name, artist ON tracks "
+    "WHEN old.name IS NOT new.name OR old.artist IS NOT new.artist BEGIN "
+    "INSERT INTO tracks_fts(tracks_fts, rowid, name, artist) VALUES ('delete', old.rowid, old.name, old.artist); "
+    "INSERT INTO tracks_fts(rowid, name, artist) VALUES (new.rowid, new.name, new.artist); END",
+    "CREATE TRIGGER IF NOT EXISTS tracks_fts_delete AFTER DELETE ON tracks BEGIN "
+    "INSERT INTO tracks_fts(tracks_fts, rowid, name, artist) VALUES ('delete', old.rowid, old.name, old.artist); END",
+]
+
+
+async def _track_search_index(conn: BaseDBAsyncClient):
+    # Индекс FTS5 есть только в SQLite; без него локальный поиск работает через LIKE
+    if conn.capabilities.dialect != "sqlite":
+        return
+    try:
+        await conn.execute_query(TRACK_SEARCH_INDEX[0])
+    except Exception as e:
+        logger.warning("SQLite собран без FTS5, локальный поиск будет без индекса: %s", e)
+        return
+    for statement in TRACK_SEARCH_INDEX[1:]:
+        await conn.execute_query(statement)
+
+    # Индексация уже сохранённых треков
+    await conn.execute_query("INSERT INTO tracks_fts(tracks_fts) VALUES('rebuild')")
+
+
+# Миграции по порядку версий. Версия 1 — исходная схема (таблица users).
+# Новая миграция добавляется в конец списка и должна быть идемпотентной:
+# для новой базы она выполняется поверх схемы, созданной по моделям.
+MIGRATIONS: list[tuple[int, str, Callable[[BaseDBAsyncClient], Awaitable[None]]]] = [
+    (2, "token expiry and preferred device", _token_expiry_and_device),
+    (3, "library mirror", _library_mirror),
+    (4, "track search index", _track_search_index),
+]
+
+
+@asynccontextmanager
+async def _migration_lock(connection_name: str) -> AsyncIterator[BaseDBAsyncClient]:
+    """
+    Транзакция, которую одновременно держит только один процесс.
+
+    Процессы, запущенные вместе, ждут друг друга, а не применяют одну
+    миграцию дважды: в SQLite транзакция начинается с записи (как
+    BEGIN IMMEDIATE, ожидание — до busy_timeout), в PostgreSQL берётся
+    advisory-блокировка, в остальных СУБД — блокировка строк schema_version.
+
+    :param connection_name: Имя подключения Tortoise
+    :type connection_name: str
+    :return: Подключение в транзакции
+    :rtype: AsyncIterator[BaseDBAsyncClient]
+    """
+    async with in_transaction(connection_name) as transaction:
+        dialect = transaction.capabilities.dialect
+        if dialect == "sqlite":
+            await transaction.execute_query(f"UPDATE {VERSION_TABLE} SET version = version WHERE 0")
+        elif dialect == "postgres":
+            await transaction.execute_query(f"SELECT pg_advisory_xact_lock({MIGRATION_LOCK_ID})")
+        else:
+            await transaction.execute_query(f"SELECT version FROM {VERSION_TABLE} FOR UPDATE")
+        yield transaction
+
+
+async def _current_version(conn: BaseDBAsyncClient) -> int | None:
+    """
+    Последняя применённая версия схемы.
+
+    :param conn: Подключение к БД
+    :type conn: BaseDBAsyncClient
+    :return: Номер версии или None, если версии ещё не записывались
+    :rtype: int | None
+    """
+    latest = await SchemaVersion.all().using_db(conn).order_by("-version").first()
+    return latest.version if latest else None
+
+
+async def _record_version(conn: BaseDBAsyncClient, version: int, name: str):
+    """
+    Запись применённой версии схемы.
+
+    :param conn: Подключение к БД
+    :type conn: BaseDBAsyncClient
+    :param version: Номер версии
+    :type version: int
+    :param name: Описание миграции
+    :type name: str
+    :return: None
+    """
+    applied_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    await SchemaVersion.create(version=version, name=name, applied_at=applied_at, using_db=conn)
+
+
+async def migrate(connection_name: str = "default"):
+    """
+    Приведение схемы БД к последней версии.
+
+    Пустая база создаётся по моделям, база без записей о версиях
+    считается версией 1. Затем по порядку выполняются недостающие
+    миграции, каждая в своей транзакции под блокировкой миграций.
+
+    :param connection_name: Имя подключения Tortoise
+    :type connection_name: str
+    :return: None
+    """
+    conn = Tortoise.get_connection(connection_name)
+    await conn.execute_script(
+        f"CREATE TABLE IF NOT EXISTS {VERSION_TABLE} ("
+        "version INT NOT NULL PRIMARY KEY, "
+        "name VARCHAR(255) NOT NULL, "
+        "applied_at VARCHAR(64) NOT NULL)"
+    )
+
+    version = await _current_version(conn)
+    if version is None:
+        async with _migration_lock(connection_name) as transaction:
+            # Другой процесс мог создать схему, пока ждали блокировку
+            version = await _current_version(transaction)
+            if version is None:
+                # Новая база: таблицы по текущим моделям
+                if not await table_exists(transaction, "users"):
+                    await create_schema(transaction)
+                    logger.info("Создана схема БД по моделям")
+                version = 1
+                await _record_version(transaction, version, "initial schema")
+
+    for number, name, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        async with _migration_lock(connection_name) as transaction:
+            # Другой процесс мог применить миграцию, пока ждали блокировку
+            if (await _current_version(transaction) or 0) >= number:
+                continue
+            await migration(transaction)
+            await _record_version(transaction, number, name)
+        logger.info("Применена миграция БД %d: %s", number, name)
@@ -10,6 +10,8 @@ class User(Model):
     :ivar telegram_id: ID пользователя Telegram
     :ivar spotify_access_token: Токен доступа Spotify
     :ivar spotify_refresh_token: Токен обновления Spotify
+    :ivar spotify_token_expires_at: Момент истечения токена доступа
+    :ivar spotify_device_id: Последнее устройство, на котором запускалось воспроизведение
     """
     # Первичный ключ
     id = fields.IntField(pk=True)
@@ -23,6 +25,161 @@ class User(Model):
     # Токен обновления Spotify
     spotify_refresh_token = fields.TextField(null=True)
 
+    # Момент истечения токена доступа Spotify
+    spotify_token_expires_at = fields.DatetimeField(null=True)
+
+    # Предпочитаемое (последнее использованное) устройство Spotify
+    spotify_device_id = fields.TextField(null=True)
+
     class Meta:
         # Название таблицы в базе
         table = "users"
+
+
+class Track(Model):
+    """
+    Метаданные трека Spotify, известного боту.
+
+    :ivar id: ID трека Spotify
+    :ivar name: Название трека
+    :ivar artist: Основной исполнитель
+    :ivar spotify_url: Ссылка на трек
+    """
+    # ID трека Spotify
+    id = fields.CharField(max_length=64, pk=True)
+
+    # Название и исполнитель
+    name = fields.TextField()
+    artist = fields.TextField()
+
+    # Ссылка на трек в Spotify
+    spotify_url = fields.TextField()
+
+    class Meta:
+        # Название таблицы в базе
+        table = "tracks"
+
+
+class SavedTrack(Model):
+    """
+    Трек из избранного пользователя (зеркало Liked Songs).
+
+    :ivar id: Внутренний ID записи
+    :ivar telegram_id: ID пользователя Telegram
+    :ivar track_id: ID трека Spotify
+    :ivar added_at: Момент добавления в избранное
+    """
+    id = fields.IntField(pk=True)
+
+    # Владелец и трек
+    telegram_id = fields.BigIntField(index=True)
+    track_id = fields.CharField(max_length=64, index=True)
+
+    # Момент добавления (по нему считается водяной знак синхронизации)
+    added_at = fields.DatetimeField()
+
+    class Meta:
+        # Название таблицы в базе
+        table = "saved_tracks"
+        unique_together = (("telegram_id", "track_id"),)
+
+
+class Playlist(Model):
+    """
+    Плейлист из библиотеки пользователя.
+
+    :ivar id: Внутренний ID записи
+    :ivar telegram_id: ID пользователя Telegram
+    :ivar playlist_id: ID плейлиста Spotify
+    :ivar name: Название плейлиста
+    :ivar position: Порядок в списке плейлистов пользователя
+    :ivar tracks_total: Число треков по данным Spotify
+    :ivar snapshot_id: Версия плейлиста, треки которой сохранены (None — не сохранены)
+    """
+    id = fields.IntField(pk=True)
+
+    # Владелец и плейлист Spotify
+    telegram_id = fields.BigIntField(index=True)
+    playlist_id = fields.CharField(max_length=64)
+
+    # Название, порядок в библиотеке и размер
+    name = fields.TextField()
+    position = fields.IntField(default=0)
+    tracks_total = fields.IntField(default=0)
+
+    # snapshot_id сохранённых треков; пока не совпадает со Spotify, треки загружаются заново
+    snapshot_id = fields.CharField(max_length=128, null=True)
+
+    class Meta:
+        # Название таблицы в базе
+        table = "playlists"
+        unique_together = (("telegram_id", "playlist_id"),)
+
+
+class PlaylistTrack(Model):
+    """
+    Трек в сохранённой версии плейлиста.
+
+    :ivar id: Внутренний ID записи
+    :ivar playlist: Плейлист пользователя
+    :ivar track_id: ID трека Spotify
+    :ivar position: Позиция в плейлисте
+    """
+    id = fields.IntField(pk=True)
+
+    # Плейлист (записи удаляются вместе с ним)
+    playlist = fields.ForeignKeyField("models.Playlist", related_name="items", on_delete=fields.CASCADE)
+
+    # Трек и его позиция
+    track_id = fields.CharField(max_length=64, index=True)
+    position = fields.IntField()
+
+    class Meta:
+        # Название таблицы в базе
+        table = "playlist_tracks"
+
+
+class LibraryState(Model):
+    """
+    Состояние синхронизации библиотеки пользователя.
+
+    :ivar id: Внутренний ID записи
+    :ivar telegram_id: ID пользователя Telegram
+    :ivar saved_total: Число треков в избранном по данным Spotify
+    :ivar saved_watermark: added_at самого нового сохранённого трека
+    :ivar synced_at: Момент последней успешной синхронизации
+    """
+    id = fields.IntField(pk=True)
+
+    # Telegram ID пользователя (уникальный)
+    telegram_id = fields.BigIntField(unique=True)
+
+    # Размер избранного и самый новый сохранённый added_at
+    saved_total = fields.IntField(default=0)
+    saved_watermark = fields.DatetimeField(null=True)
+
+    # Момент последней успешной синхронизации
+    synced_at = fields.DatetimeField(null=True)
+
+    class Meta:
+        # Название таблицы в базе
+        table = "library_state"
+
+
+class SchemaVersion(Model):
+    """
+    Применённая версия схемы БД (заполняется миграциями).
+
+    :ivar version: Номер версии
+    :ivar name: Описание миграции
+    :ivar applied_at: Момент применения (ISO 8601)
+    """
+    version = fields.IntField(pk=True, generated=False)
+
+    # Описание миграции и момент её применения
+    name = fields.CharField(max_length=255)
+    applied_at = fields.CharField(max_length=64)
+
+    class Meta:
+        # Название таблицы в базе
+        table = "schema_version"
@@ -0,0 +1,131 @@
+import asyncio
+
+from aiogram import Router
+from aiogram.types import (
+    InlineQuery,
+    InlineQueryResultArticle,
+    InlineQueryResultsButton,
+    InputTextMessageContent,
+    InlineKeyboardMarkup,
+    InlineKeyboardButton,
+)
+from bot.config import INLINE_DEBOUNCE, INLINE_RESULTS_LIMIT, INLINE_CACHE_TIME
+from bot.database.models import User
+from bot.services.ratelimit import SpotifyBusyError
+from bot.services.search_cache import normalize_query
+from bot.services.spotify import search_tracks
+from bot.utils.cache import TTLCache
+
+router = Router()
+
+# Номер последнего запроса пользователя: более старые запросы не выполняются
+_versions = TTLCache(maxsize=10000, ttl=60)
+
+# Последний ответ пользователю: (нормализованный запрос, треки) для уточняющих запросов
+_last_results = TTLCache(maxsize=10000, ttl=60)
+
+# Минимум совпадений среди прошлых результатов, чтобы не обращаться к Spotify
+PREFIX_MIN_RESULTS = 5
+
+
+def _filter_previous(telegram_id: int, query: str) -> list[dict] | None:
+    """
+    Отбор треков из предыдущего ответа, если новый запрос его уточняет.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :param query: Нормализованный запрос
+    :type query: str
+    :return: Подходящие треки или None, если их недостаточно
+    :rtype: list[dict] | None
+    """
+    previous = _last_results.get(telegram_id)
+    if not previous or not query.startswith(previous[0]):
+        return None
+
+    words = query.split()
+    tracks = [
+        track for track in previous[1]
+        if all(word in f"{track['artist']} {track['name']}".casefold() for word in words)
+    ]
+    return tracks if len(tracks) >= PREFIX_MIN_RESULTS else None
+
+
+def _track_result(track: dict) -> InlineQueryResultArticle:
+    """
+    Карточка трека для ответа на inline-запрос.
+
+    :param track: Словарь трека
+    :type track: dict
+    :return: Результат inline-запроса
+    :rtype: InlineQueryResultArticle
+    """
+    track_id = track["id"]
+    return InlineQueryResultArticle(
+        id=track_id,
+        title=track["name"],
+        description=track["artist"],
+        url=track["spotify_url"],
+        input_message_content=InputTextMessageContent(
+            message_text=f"{track['artist']} — {track['name']}\n{track['spotify_url']}"
+        ),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=[[
+            InlineKeyboardButton(text="▶️", callback_data=f"play:{track_id}"),
+            InlineKeyboardButton(text="❤️", callback_data=f"like:{track_id}"),
+            InlineKeyboardButton(text="➕", callback_data=f"queue:{track_id}"),
+        ]]),
+    )
+
+
+@router.inline_query()
+async def inline_search_handler(inline_query: InlineQuery, user: User | None):
+    """
+    Поиск треков по мере ввода: @bot запрос.
+
+    :param inline_query: Inline-запрос пользователя
+    :type inline_query: InlineQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Без авторизации предлагаем перейти в бота
+    if not user or not user.spotify_access_token:
+        await inline_query.answer(
+            [],
+            cache_time=0,
+            is_personal=True,
+            button=InlineQueryResultsButton(text="🔐 Войти через Spotify", start_parameter="login"),
+        )
+        return
+
+    query = normalize_query(inline_query.query)
+    if not query:
+        await inline_query.answer([], cache_time=INLINE_CACHE_TIME)
+        return
+
+    # Пропуск запросов, которые пользователь успел дописать за время задержки
+    telegram_id = inline_query.from_user.id
+    version = _versions.get(telegram_id, 0) + 1
+    _versions.set(telegram_id, version)
+    await asyncio.sleep(INLINE_DEBOUNCE)
+    if _versions.get(telegram_id) != version:
+        return
+
+    # Уточнение предыдущего запроса отвечается из его результатов
+    tracks = _filter_previous(telegram_id, query)
+    if tracks is None:
+        try:
+            # Полная страница из локального индекса отвечается сразу, без Spotify
+            tracks, _ = await search_tracks(user, query, limit=INLINE_RESULTS_LIMIT, local_first=True)
+        except SpotifyBusyError:
+            return
+        if _versions.get(telegram_id) != version:
+            return
+        _last_results.set(telegram_id, (query, tracks))
+
+    # Результаты одинаковы для всех, поэтому Telegram может кэшировать их сам
+    await inline_query.answer(
+        [_track_result(track) for track in tracks],
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+    )
@@ -0,0 +1,73 @@
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+
+from bot.database.models import User
+from bot.services.library import library_summary, liked_tracks, schedule_sync
+
+router = Router()
+
+# Сколько последних избранных треков показывать в /library
+RECENT_LIKED = 10
+
+
+@router.message(F.text == "/library")
+async def library_command(message: Message, user: User | None):
+    """
+    Обработка команды /library — сводка по избранному и плейлистам.
+
+    Данные читаются из локального зеркала библиотеки.
+
+    :param message: Сообщение пользователя
+    :type message: Message
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Проверка авторизации
+    if not user or not user.spotify_access_token:
+        await message.answer("⚠️ Сначала авторизуйтесь через /start")
+        return
+
+    summary = await library_summary(user.telegram_id)
+    if summary is None:
+        # Первая синхронизация идёт в фоне
+        schedule_sync(user)
+        await message.answer("⏳ Библиотека синхронизируется, повторите /library через минуту.")
+        return
+
+    lines = [
+        "📚 Ваша библиотека",
+        f"❤️ Избранное: {summary['saved']}",
+        f"📂 Плейлистов: {summary['playlists']}",
+        f"🕒 Синхронизировано: {summary['synced_at']:%d.%m %H:%M}",
+    ]
+    recent = await liked_tracks(user.telegram_id, RECENT_LIKED)
+    if recent:
+        lines += ["", "Последние лайки:"]
+        lines += [f"• {track['artist']} — {track['name']}" for track in recent]
+
+    kb = InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🔄 Синхронизировать", callback_data="library_sync")]
+    ])
+    # Без разметки: названия треков могут содержать * и _
+    await message.answer("\n".join(lines), reply_markup=kb)
+
+
+@router.callback_query(F.data == "library_sync")
+async def library_sync_handler(callback: CallbackQuery, user: User | None):
+    """
+    Внеочередная синхронизация библиотеки.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Проверка авторизации
+    if not user or not user.spotify_access_token:
+        await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
+        return
+
+    schedule_sync(user)
+    await callback.answer("⏳ Синхронизация запущена, повторите /library через минуту.")
@@ -0,0 +1,111 @@
+from aiogram import Router, F
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, CallbackQuery
+
+from bot.database.models import User
+from bot.services.nowplaying import get_now_playing, now_playing_keyboard, now_playing_text, watcher
+from bot.services.ratelimit import BUSY_MESSAGE, SpotifyBusyError
+from bot.services.spotify_api import SpotifyAPIError
+from bot.utils.logger import logger
+
+router = Router()
+
+
+async def _load_state(user: User) -> tuple[bool, dict | None, str]:
+    """
+    Получение текущего трека с текстом ошибки для пользователя.
+
+    :param user: Пользователь
+    :type user: User
+    :return: Кортеж (успех, состояние, сообщение об ошибке)
+    :rtype: tuple[bool, dict | None, str]
+    """
+    try:
+        return True, await get_now_playing(user), ""
+    except SpotifyBusyError:
+        return False, None, BUSY_MESSAGE
+    except SpotifyAPIError as e:
+        logger.error("SpotifyAPIError: %s", e)
+        return False, None, "❌ Не удалось получить текущий трек."
+    except Exception as e:
+        logger.error("Error getting now playing: %s", e)
+        return False, None, "❌ Не удалось получить текущий трек."
+
+
+@router.message(F.text == "/nowplaying")
+async def now_playing_command(message: Message, user: User | None):
+    """
+    Обработка команды /nowplaying — текущий трек пользователя.
+
+    :param message: Сообщение пользователя
+    :type message: Message
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Проверка авторизации
+    if not user or not user.spotify_access_token:
+        await message.answer("⚠️ Сначала авторизуйтесь через /start")
+        return
+
+    success, state, error = await _load_state(user)
+    if not success:
+        await message.answer(error)
+        return
+
+    await message.answer(now_playing_text(state), parse_mode="HTML", reply_markup=now_playing_keyboard(state))
+
+
+@router.callback_query(F.data.in_({"nowplaying_refresh", "nowplaying_watch"}))
+async def now_playing_refresh_handler(callback: CallbackQuery, user: User | None):
+    """
+    Обновление сообщения о текущем треке и включение живого режима.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Проверка авторизации
+    if not user or not user.spotify_access_token:
+        await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
+        return
+
+    success, state, error = await _load_state(user)
+    if not success:
+        await callback.answer(error, show_alert=True)
+        return
+
+    live = callback.data == "nowplaying_watch"
+    try:
+        await callback.message.edit_text(
+            now_playing_text(state, live=live),
+            parse_mode="HTML",
+            reply_markup=now_playing_keyboard(state, live=live),
+        )
+    except TelegramBadRequest as e:
+        # Повторное «Обновить» без смены трека
+        if "message is not modified" not in str(e):
+            raise
+
+    # Сообщение передаётся общему планировщику опроса
+    if live:
+        watcher.subscribe(callback.bot, user.telegram_id, callback.message.chat.id, callback.message.message_id, state)
+    await callback.answer()
+
+
+@router.callback_query(F.data == "nowplaying_stop")
+async def now_playing_stop_handler(callback: CallbackQuery):
+    """
+    Остановка живого обновления сообщения.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :return: None
+    """
+    watcher.unsubscribe(callback.from_user.id, callback.message.message_id)
+
+    # Сообщение остаётся с последним треком и обычными кнопками
+    await callback.message.edit_reply_markup(reply_markup=now_playing_keyboard(None))
+    await callback.answer("⏹ Обновление остановлено")
@@ -0,0 +1,266 @@
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
+
+from bot.config import PLAYLIST_BROWSER_PAGE_SIZE, PLAYLIST_QUEUE_COUNT
+from bot.database.models import User
+from bot.services.dedup import actions
+from bot.services.playlists import (
+    PlaylistSession,
+    create_playlist_session,
+    get_playlist_session,
+    load_playlists_page,
+    load_track_page,
+    prefetch_playlists_page,
+    prefetch_track_page,
+    queue_tracks,
+)
+from bot.services.ratelimit import BUSY_MESSAGE, SpotifyBusyError
+from bot.services.spotify_api import SpotifyAPIError
+
+router = Router()
+
+# Ответ на кнопки устаревшего сообщения
+EXPIRED_MESSAGE = "⌛ Список устарел, отправьте /playlists ещё раз"
+
+
+def error_text(error: Exception) -> str:
+    """
+    Сообщение пользователю об ошибке загрузки плейлистов.
+
+    :param error: Ошибка SpotifyBusyError или SpotifyAPIError
+    :type error: Exception
+    :return: Текст ответа
+    :rtype: str
+    """
+    if isinstance(error, SpotifyBusyError):
+        return BUSY_MESSAGE
+    if isinstance(error, SpotifyAPIError) and error.status in (403, 404):
+        return "❌ Плейлист удалён или стал недоступен, отправьте /playlists ещё раз"
+    return "❌ Не удалось загрузить плейлисты из Spotify."
+
+
+def own_session(key: str, user: User | None) -> PlaylistSession | None:
+    """
+    Сессия просмотра плейлистов, если она принадлежит пользователю.
+
+    :param key: Ключ сессии из callback_data
+    :type key: str
+    :param user: Пользователь из БД
+    :type user: User | None
+    :return: Сессия или None, если она истекла или чужая
+    :rtype: PlaylistSession | None
+    """
+    session = get_playlist_session(key)
+    if not session or not user or session.telegram_id != user.telegram_id:
+        return None
+    return session
+
+
+def playlists_view(key: str, session: PlaylistSession, playlists: list[dict]) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Текст и клавиатура страницы списка плейлистов.
+
+    :param key: Ключ сессии
+    :type key: str
+    :param session: Сессия
+    :type session: PlaylistSession
+    :param playlists: Плейлисты текущей страницы
+    :type playlists: list[dict]
+    :return: Кортеж (текст, клавиатура)
+    :rtype: tuple[str, InlineKeyboardMarkup]
+    """
+    rows = [
+        [InlineKeyboardButton(text=f"📂 {playlist['name']} ({playlist['total']})",
+                              callback_data=f"pl_open:{key}:{index}")]
+        for index, playlist in enumerate(playlists)
+    ]
+
+    # Переключение страниц списка
+    navigation = []
+    if session.list_page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"pl_list:{key}:{session.list_page - 1}"))
+    if session.list_page + 1 < session.list_pages():
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"pl_list:{key}:{session.list_page + 1}"))
+    if navigation:
+        rows.append(navigation)
+
+    text = f"📚 Ваши плейлисты (стр. {session.list_page + 1}/{session.list_pages()}):"
+    return text, InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def tracks_view(key: str, session: PlaylistSession, tracks: list[dict]) -> tuple[str, InlineKeyboardMarkup]:
+    """
+    Текст и клавиатура страницы треков открытого плейлиста.
+
+    :param key: Ключ сессии
+    :type key: str
+    :param session: Сессия
+    :type session: PlaylistSession
+    :param tracks: Треки текущей страницы
+    :type tracks: list[dict]
+    :return: Кортеж (текст, клавиатура)
+    :rtype: tuple[str, InlineKeyboardMarkup]
+    """
+    playlist = session.playlist
+    first = session.track_page * PLAYLIST_BROWSER_PAGE_SIZE
+    lines = [f"📂 {playlist['name']} (стр. {session.track_page + 1}/{session.track_pages()}, треков: {playlist['total']})", ""]
+    lines += [f"{first + index + 1}. {track['artist']} — {track['name']}" for index, track in enumerate(tracks)]
+
+    rows = []
+    navigation = []
+    if session.track_page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"pl_page:{key}:{session.track_page - 1}"))
+    if session.track_page + 1 < session.track_pages():
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"pl_page:{key}:{session.track_page + 1}"))
+    if navigation:
+        rows.append(navigation)
+    if tracks:
+        rows.append([InlineKeyboardButton(
+            text=f"➕ {PLAYLIST_QUEUE_COUNT} треков отсюда в очередь", callback_data=f"pl_queue:{key}"
+        )])
+    rows.append([InlineKeyboardButton(text="⬅️ К плейлистам", callback_data=f"pl_back:{key}")])
+
+    return "\n".join(lines), InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@router.message(F.text == "/playlists")
+async def playlists_command(message: Message, user: User | None):
+    """
+    Обработка команды /playlists — список плейлистов пользователя.
+
+    :param message: Сообщение пользователя
+    :type message: Message
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Проверка авторизации
+    if not user or not user.spotify_access_token:
+        await message.answer("⚠️ Сначала авторизуйтесь через /start")
+        return
+
+    key, session = create_playlist_session(user.telegram_id)
+    try:
+        playlists = await load_playlists_page(session, user, 0)
+    except (SpotifyBusyError, SpotifyAPIError) as e:
+        await message.answer(error_text(e))
+        return
+    if not playlists:
+        await message.answer("📭 У вас нет плейлистов.")
+        return
+
+    text, keyboard = playlists_view(key, session, playlists)
+    await message.answer(text, reply_markup=keyboard)
+
+    # Следующая страница списка загружается заранее
+    prefetch_playlists_page(session, user, 1)
+
+
+@router.callback_query(F.data.startswith("pl_list:") | F.data.startswith("pl_back:"))
+async def playlists_page_handler(callback: CallbackQuery, user: User | None):
+    """
+    Переключение страницы списка плейлистов и возврат к нему из плейлиста.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    action, key, *rest = callback.data.split(":")
+    session = own_session(key, user)
+    if not session:
+        await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+        return
+
+    page = int(rest[0]) if action == "pl_list" and rest and rest[0].isdigit() else session.list_page
+    try:
+        playlists = await load_playlists_page(session, user, page)
+    except (SpotifyBusyError, SpotifyAPIError) as e:
+        await callback.answer(error_text(e), show_alert=True)
+        return
+
+    session.list_page = page
+    text, keyboard = playlists_view(key, session, playlists)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+    prefetch_playlists_page(session, user, page + 1)
+
+
+@router.callback_query(F.data.startswith("pl_open:") | F.data.startswith("pl_page:"))
+async def playlist_tracks_handler(callback: CallbackQuery, user: User | None):
+    """
+    Открытие плейлиста и переключение страниц его треков.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    action, key, number = callback.data.split(":")
+    session = own_session(key, user)
+    if not session or not number.isdigit():
+        await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+        return
+
+    if action == "pl_open":
+        playlists = session.playlists.get(session.list_page, [])
+        if int(number) >= len(playlists):
+            await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+            return
+        playlist, page = playlists[int(number)], 0
+    else:
+        playlist, page = session.playlist, int(number)
+        if playlist is None:
+            await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+            return
+
+    try:
+        tracks = await load_track_page(user, playlist, page)
+    except (SpotifyBusyError, SpotifyAPIError) as e:
+        await callback.answer(error_text(e), show_alert=True)
+        return
+
+    session.playlist, session.track_page = playlist, page
+    text, keyboard = tracks_view(key, session, tracks)
+    await callback.message.edit_text(text, reply_markup=keyboard)
+    await callback.answer()
+
+    # Загружается только следующая страница, остальные — по мере листания
+    prefetch_track_page(user, playlist, page + 1)
+
+
+@router.callback_query(F.data.startswith("pl_queue:"))
+async def playlist_queue_handler(callback: CallbackQuery, user: User | None):
+    """
+    Добавление следующих треков плейлиста в очередь воспроизведения.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    session = own_session(callback.data[len("pl_queue:"):], user)
+    if not session or not session.playlist:
+        await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+        return
+
+    # Проверка авторизации
+    if not user.spotify_access_token:
+        await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
+        return
+
+    # Повторные нажатия получают результат первого
+    playlist, start = session.playlist, session.track_page * PLAYLIST_BROWSER_PAGE_SIZE
+    try:
+        queued, message = await actions.run(
+            user.telegram_id, "queue_playlist", f"{playlist['id']}:{start}",
+            lambda: queue_tracks(user, playlist, start, PLAYLIST_QUEUE_COUNT),
+        )
+    except (SpotifyBusyError, SpotifyAPIError) as e:
+        await callback.answer(error_text(e), show_alert=True)
+        return
+    await callback.answer(message, show_alert=not queued)
@@ -1,4 +1,7 @@
-from aiogram import Router, F
+import asyncio
+
+import aiohttp
+from aiogram import Router, F, html
 from aiogram.types import (
     Message,
     CallbackQuery,
@@ -6,22 +9,121 @@ from aiogram.types import (
     InlineKeyboardButton,
 )
 from bot.database.models import User
+from bot.services.dedup import actions
+from bot.services.library import mark_saved, playlists_with_track, saved_flags
+from bot.services.ratelimit import BUSY_MESSAGE, SpotifyBusyError
+from bot.services.sessions import SearchSession, create_session, get_session, load_page, prefetch_page
 from bot.services.spotify import (
+    add_track_to_queue,
     like_track,
+    play_track,
     search_tracks,
-    get_track_info,
 )
+from bot.services.spotify_api import SpotifyAPIError
 
 router = Router()
 
+# Ошибки поиска в Spotify, о которых сообщается пользователю
+SEARCH_ERRORS = (SpotifyBusyError, SpotifyAPIError, aiohttp.ClientError, asyncio.TimeoutError)
+
+
+# Ответ на кнопки устаревшего или чужого сообщения с результатами
+EXPIRED_MESSAGE = "⌛ Результаты поиска устарели, повторите /search"
+
+
+def own_session(key: str, user: User | None) -> SearchSession | None:
+    """
+    Сессия поиска, если она принадлежит пользователю.
+
+    :param key: Ключ сессии из callback_data
+    :type key: str
+    :param user: Пользователь из БД
+    :type user: User | None
+    :return: Сессия или None, если она истекла или чужая
+    :rtype: SearchSession | None
+    """
+    session = get_session(key)
+    if not session or not user or session.telegram_id != user.telegram_id:
+        return None
+    return session
+
+
+def search_error_text(error: Exception) -> str:
+    """
+    Сообщение пользователю об ошибке поиска.
+
+    :param error: Ошибка из SEARCH_ERRORS
+    :type error: Exception
+    :return: Текст ответа
+    :rtype: str
+    """
+    if isinstance(error, SpotifyBusyError):
+        return BUSY_MESSAGE
+    return "❌ Не удалось выполнить поиск в Spotify, попробуйте позже."
+
+
+async def results_keyboard(key: str, session: SearchSession, user: User) -> InlineKeyboardMarkup:
+    """
+    Клавиатура с треками текущей страницы (❤️ отмечены треки из избранного)
+    и переключением страниц.
+
+    :param key: Ключ сессии поиска
+    :type key: str
+    :param session: Сессия поиска
+    :type session: SearchSession
+    :param user: Пользователь
+    :type user: User
+    :return: Inline-клавиатура
+    :rtype: InlineKeyboardMarkup
+    """
+    # Отметки избранного не обязательны — при ошибке клавиатура строится без них
+    try:
+        saved = await saved_flags(user, [track["id"] for track in session.tracks])
+    except Exception:
+        saved = {}
+
+    rows = [
+        [
+            InlineKeyboardButton(
+                text=f"{'❤️ ' if saved.get(track['id']) else ''}{track['artist']} — {track['name']}",
+                callback_data=f"track_select:{key}:{index}"
+            )
+        ] for index, track in enumerate(session.tracks)
+    ]
+
+    # Переключение страниц
+    navigation = []
+    if session.page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️", callback_data=f"search_page:{key}:{session.page - 1}"))
+    if session.has_next():
+        navigation.append(InlineKeyboardButton(text="➡️", callback_data=f"search_page:{key}:{session.page + 1}"))
+    if navigation:
+        rows.append(navigation)
+
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def results_text(session: SearchSession) -> str:
+    """
+    Заголовок сообщения с результатами поиска.
+
+    :param session: Сессия поиска
+    :type session: SearchSession
+    :return: Текст сообщения
+    :rtype: str
+    """
+    return "🔍 Найденные треки:" if session.page == 0 else f"🔍 Найденные треки (стр. {session.page + 1}):"
+
 
 @router.message(F.text.startswith("/search"))
-async def search_command(message: Message):
+async def search_command(message: Message, user: User | None):
     """
     Обработка команды поиска трека.
 
     :param message: Сообщение пользователя
     :type message: Message
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
     # Получение запроса из текста команды
@@ -32,153 +134,211 @@ async def search_command(message: Message):
         await message.answer("🔎 Введите запрос: `/search название трека`", parse_mode="Markdown")
         return
 
-    # Получение пользователя из БД
-    user = await User.get_or_none(telegram_id=message.from_user.id)
+    # Проверка авторизации пользователя
     if not user or not user.spotify_access_token:
         await message.answer("⚠️ Сначала авторизуйтесь через /start.")
         return
 
     # Поиск треков через Spotify
-    tracks = await search_tracks(user, query)
+    try:
+        tracks, local = await search_tracks(user, query)
+    except SEARCH_ERRORS as e:
+        await message.answer(search_error_text(e))
+        return
     if not tracks:
         await message.answer("❌ Ничего не найдено.")
         return
 
-    # Формирование клавиатуры с найденными треками
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [
-            InlineKeyboardButton(
-                text=f"{track['artist']} — {track['name']}",
-                callback_data=f"track_select:{track['id']}|{query}"
-            )
-        ] for track in tracks
-    ])
+    # Сохранение результатов в сессии и формирование клавиатуры
+    key = create_session(message.from_user.id, query, tracks, local)
+    session = get_session(key)
+    keyboard = await results_keyboard(key, session, user)
 
-    await message.answer("🔍 Найденные треки:", reply_markup=keyboard)
+    await message.answer(results_text(session), reply_markup=keyboard)
 
+    # Следующая страница загружается заранее
+    if session.has_next():
+        prefetch_page(session, user, 1)
 
-@router.callback_query(F.data.startswith("track_select:"))
-async def track_select_handler(callback: CallbackQuery):
+
+@router.callback_query(F.data.startswith("search_page:"))
+async def search_page_handler(callback: CallbackQuery, user: User | None):
     """
-    Обработка выбора трека из поиска.
+    Переключение страницы результатов поиска в том же сообщении.
 
     :param callback: CallbackQuery от кнопки
     :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
-    # Извлечение ID трека и запроса
-    data = callback.data[len("track_select:"):]
-    track_id, query = data.split("|", 1)
+    key, _, page = callback.data[len("search_page:"):].partition(":")
+    session = own_session(key, user)
+    if not session or not page.isdigit():
+        await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+        return
 
-    # Проверка авторизации пользователя
-    user = await User.get_or_none(telegram_id=callback.from_user.id)
-    if not user or not user.spotify_access_token:
-        await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
+    # Страница берётся из сессии или загружается (обычно уже загружена заранее)
+    page = int(page)
+    try:
+        tracks = await load_page(session, user, page)
+    except SEARCH_ERRORS as e:
+        await callback.answer(search_error_text(e), show_alert=True)
+        return
+    if not tracks:
+        await callback.answer("Больше результатов нет")
         return
 
-    # Получение информации о треке
-    track = await get_track_info(user, track_id)
-    if not track:
-        await callback.answer("❌ Не удалось получить информацию", show_alert=True)
+    session.page = page
+    keyboard = await results_keyboard(key, session, user)
+    await callback.message.edit_text(results_text(session), reply_markup=keyboard)
+    await callback.answer()
+
+    # Следующая страница загружается заранее
+    if session.has_next():
+        prefetch_page(session, user, page + 1)
+
+
+@router.callback_query(F.data.startswith("track_select:"))
+async def track_select_handler(callback: CallbackQuery, user: User | None):
+    """
+    Обработка выбора трека из поиска.
+
+    :param callback: CallbackQuery от кнопки
+    :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
+    :return: None
+    """
+    # Извлечение ключа сессии и номера трека
+    key, _, index = callback.data[len("track_select:"):].partition(":")
+
+    # Трек берётся из сохранённых результатов поиска
+    session = own_session(key, user)
+    if not session or not index.isdigit() or int(index) >= len(session.tracks):
+        await callback.answer(EXPIRED_MESSAGE, show_alert=True)
         return
+    track = session.tracks[int(index)]
+    track_id = track["id"]
 
     # Клавиатура с действиями для трека
     kb = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="▶️ Воспроизвести", callback_data=f"play:{track_id}|{query}")],
-        [InlineKeyboardButton(text="❤️ Лайкнуть", callback_data=f"like:{track_id}|{query}")],
-        [InlineKeyboardButton(text="➕ В очередь", callback_data=f"queue:{track_id}|{query}")],
-        [InlineKeyboardButton(text="⬅️ Назад к результатам поиска", callback_data=f"search_back:{query}")]
+        [InlineKeyboardButton(text="▶️ Воспроизвести", callback_data=f"play:{track_id}")],
+        [InlineKeyboardButton(text="❤️ Лайкнуть", callback_data=f"like:{track_id}")],
+        [InlineKeyboardButton(text="➕ В очередь", callback_data=f"queue:{track_id}")],
+        [InlineKeyboardButton(text="⬅️ Назад к результатам поиска", callback_data=f"search_back:{key}")]
     ])
 
-    await callback.message.answer(
-        f"*{track['name']}* — {track['artist']}",
-        parse_mode="Markdown",
+    # Плейлисты с этим треком — из локального зеркала библиотеки.
+    # Названия экранируются: в них могут быть символы разметки
+    text = f"{html.bold(html.quote(track['name']))} — {html.quote(track['artist'])}"
+    playlists = await playlists_with_track(user.telegram_id, track_id)
+    if playlists:
+        text += "\n📂 В плейлистах: " + html.quote(", ".join(playlists))
+
+    # Сообщение с результатами заменяется карточкой трека
+    await callback.message.edit_text(
+        text,
+        parse_mode="HTML",
         reply_markup=kb
     )
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("search_back:"))
-async def search_back_handler(callback: CallbackQuery):
+async def search_back_handler(callback: CallbackQuery, user: User | None):
     """
     Возврат к результатам поиска.
 
     :param callback: CallbackQuery от кнопки
     :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
-    # Удаление предыдущего сообщения
-    await callback.message.delete()
+    key = callback.data[len("search_back:"):]
+    session = own_session(key, user)
+    if not session:
+        await callback.answer(EXPIRED_MESSAGE, show_alert=True)
+        return
+
+    # Перерисовка текущей страницы результатов из сохранённой сессии
+    keyboard = await results_keyboard(key, session, user)
+    await callback.message.edit_text(results_text(session), reply_markup=keyboard)
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("queue:"))
-async def queue_track_handler(callback: CallbackQuery):
+async def queue_track_handler(callback: CallbackQuery, user: User | None):
     """
     Добавление трека в очередь воспроизведения.
 
     :param callback: CallbackQuery от кнопки
     :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
-    data = callback.data[len("queue:"):]
-    track_id, query = data.split("|", 1)
+    track_id = callback.data[len("queue:"):]
 
     # Проверка авторизации
-    user = await User.get_or_none(telegram_id=callback.from_user.id)
     if not user or not user.spotify_access_token:
         await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
         return
 
-    from bot.services.spotify import add_track_to_queue
-    success, message = await add_track_to_queue(user, track_id)
+    # Повторные нажатия получают результат первого
+    success, message = await actions.run(
+        user.telegram_id, "queue", track_id, lambda: add_track_to_queue(user, track_id)
+    )
     # Ответ пользователю с результатом
     await callback.answer(message, show_alert=not success)
 
 
 @router.callback_query(F.data.startswith("play:"))
-async def play_track_handler(callback: CallbackQuery):
+async def play_track_handler(callback: CallbackQuery, user: User | None):
     """
     Воспроизведение выбранного трека.
 
     :param callback: CallbackQuery от кнопки
     :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
-    data = callback.data[len("play:"):]
-    track_id, query = data.split("|", 1)
+    track_id = callback.data[len("play:"):]
 
-    user = await User.get_or_none(telegram_id=callback.from_user.id)
     if not user or not user.spotify_access_token:
         await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
         return
 
-    from bot.services.spotify import play_track
-    success, message = await play_track(user, track_id)
+    success, message = await actions.run(
+        user.telegram_id, "play", track_id, lambda: play_track(user, track_id)
+    )
     await callback.answer(message, show_alert=not success)
 
 
 @router.callback_query(F.data.startswith("like:"))
-async def like_track_handler(callback: CallbackQuery):
+async def like_track_handler(callback: CallbackQuery, user: User | None):
     """
     Лайк трека в Spotify.
 
     :param callback: CallbackQuery от кнопки
     :type callback: CallbackQuery
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
-    data = callback.data[len("like:"):]
-    track_id, query = data.split("|", 1)
+    track_id = callback.data[len("like:"):]
 
     # Проверка авторизации
-    user = await User.get_or_none(telegram_id=callback.from_user.id)
     if not user or not user.spotify_access_token:
         await callback.answer("⚠️ Авторизация не найдена", show_alert=True)
         return
 
-    # Лайк трека
-    success = await like_track(user, track_id)
+    # Лайк трека; лайки копятся в пакет, поэтому не занимают слот одновременных действий
+    success, message = await actions.run(
+        user.telegram_id, "like", track_id, lambda: like_track(user, track_id), limited=False
+    )
     if success:
-        await callback.answer("❤️ Добавлено в избранное!")
-    else:
-        await callback.answer("❌ Ошибка при добавлении", show_alert=True)
+        await mark_saved(user.telegram_id, [track_id])
+    await callback.answer(message, show_alert=not success)
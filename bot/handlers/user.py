@@ -1,51 +1,33 @@
 from aiogram import Router, F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
-from bot.config import SPOTIFY_CLIENT_ID, SPOTIFY_REDIRECT_URI
 from bot.database.models import User
-import urllib.parse
+from bot.services.auth import authorize_url
 
 router = Router()
 
 
-@router.message(F.text == "/start")
-async def start_handler(message: Message):
+@router.message(F.text.startswith("/start"))
+async def start_handler(message: Message, user: User | None):
     """
-    Обработка команды /start для авторизации через Spotify.
+    Обработка команды /start для авторизации через Spotify
+    (в том числе /start login из кнопки inline-режима).
 
     :param message: Сообщение пользователя
     :type message: Message
+    :param user: Пользователь из БД (подставляется мидлварью)
+    :type user: User | None
     :return: None
     """
     # ID пользователя Telegram
     user_id = message.from_user.id
 
     # Проверка существующего пользователя с токеном
-    user = await User.get_or_none(telegram_id=user_id)
     if user and user.spotify_access_token:
         await message.answer(f"👋 Привет снова, {message.from_user.full_name}! Ты уже авторизован.")
         return
 
-    # Права доступа для Spotify
-    scope = (
-        "user-library-read "
-        "user-library-modify "
-        "user-read-playback-state "
-        "user-modify-playback-state "
-        "playlist-read-private "
-        "playlist-read-collaborative"
-    )
-
-    # Формирование URL для авторизации
-    auth_url = (
-            "https://accounts.spotify.com/authorize?"
-            + urllib.parse.urlencode({
-        "client_id": SPOTIFY_CLIENT_ID,
-        "response_type": "code",
-        "redirect_uri": SPOTIFY_REDIRECT_URI,
-        "scope": scope,
-        "state": str(user_id)
-    })
-    )
+    # Формирование URL для авторизации с подписанным state
+    auth_url = authorize_url(user_id)
 
     # Кнопка для авторизации через Spotify
     kb = InlineKeyboardMarkup(inline_keyboard=[
@@ -74,6 +56,10 @@ async def help_handler(message: Message):
         "Доступные команды:\n"
         "• /start — авторизация через Spotify\n"
         "• /search <название> — поиск трека\n"
+        "• /nowplaying — текущий трек (с живым обновлением)\n"
+        "• /library — избранное и плейлисты\n"
+        "• /playlists — просмотр плейлистов\n"
+        "• @имя\\_бота <название> — поиск из любого чата\n"
         "• /help — показать это сообщение\n\n"
         "💡 После поиска трека вы сможете:\n"
         "   ▶️ Запустить воспроизведение\n"
@@ -1,7 +1,37 @@
 from aiogram import Bot, Dispatcher
 from bot.config import BOT_TOKEN
 from bot.database.db import init_db
-from bot.handlers import user, spotify
+from bot.handlers import user, spotify, inline, nowplaying, library, playlists
+from bot.middlewares.metrics import MetricsMiddleware
+from bot.middlewares.user import UserMiddleware
+
+
+def create_dispatcher() -> Dispatcher:
+    """
+    Создание диспетчера с мидлварями и роутерами обработчиков.
+
+    :return: Диспетчер
+    :rtype: Dispatcher
+    """
+    # Создание диспетчера
+    dp = Dispatcher()
+
+    # Метрики обработчиков и получение пользователя из кэша один раз на апдейт
+    for observer in (dp.message, dp.callback_query, dp.inline_query):
+        observer.middleware(MetricsMiddleware())
+        observer.middleware(UserMiddleware())
+
+    # Подключение роутеров обработчиков
+    dp.include_routers(
+        user.router,
+        spotify.router,
+        nowplaying.router,
+        library.router,
+        playlists.router,
+        inline.router,
+    )
+
+    return dp
 
 
 async def setup_bot() -> tuple[Dispatcher, Bot]:
@@ -17,13 +47,4 @@ async def setup_bot() -> tuple[Dispatcher, Bot]:
     # Создание объекта бота
     bot = Bot(token=BOT_TOKEN)
 
-    # Создание диспетчера
-    dp = Dispatcher()
-
-    # Подключение роутеров обработчиков
-    dp.include_routers(
-        user.router,
-        spotify.router,
-    )
-
-    return dp, bot
+    return create_dispatcher(), bot
@@ -0,0 +1,56 @@
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.utils.logger import log_context, logger
+from bot.utils.metrics import HANDLER_ERRORS, HANDLER_LATENCY, SPOTIFY_CALLS_PER_UPDATE, spotify_calls
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Мидлварь, замеряющая длительность обработчика и число
+    запросов к Spotify, выполненных при обработке апдейта.
+
+    Также задаёт контекст журнала: записи, сделанные при обработке,
+    получают telegram_id, имя обработчика и время от начала обработки.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        """
+        Замер обработки апдейта.
+
+        :param handler: Следующий обработчик в цепочке
+        :param event: Событие Telegram
+        :param data: Данные, передаваемые обработчику
+        :return: Результат обработчика
+        """
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object else "unknown"
+
+        from_user = data.get("event_from_user")
+        calls = [0]
+        token = spotify_calls.set(calls)
+        start = time.perf_counter()
+        context_token = log_context.set({
+            "telegram_id": from_user.id if from_user else None,
+            "handler": name,
+            "start": start,
+        })
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(name).inc()
+            raise
+        finally:
+            HANDLER_LATENCY.labels(name).observe(time.perf_counter() - start)
+            SPOTIFY_CALLS_PER_UPDATE.observe(calls[0])
+            logger.debug("Обработчик %s завершён, запросов к Spotify: %d", name, calls[0])
+            log_context.reset(context_token)
+            spotify_calls.reset(token)
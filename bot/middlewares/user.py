@@ -0,0 +1,31 @@
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, User as TelegramUser
+
+from bot.services.users import get_user
+
+
+class UserMiddleware(BaseMiddleware):
+    """
+    Мидлварь, которая один раз за апдейт получает пользователя
+    из кэша и передаёт его в обработчик аргументом ``user``.
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: dict[str, Any],
+    ) -> Any:
+        """
+        Подстановка пользователя в данные обработчика.
+
+        :param handler: Следующий обработчик в цепочке
+        :param event: Событие Telegram
+        :param data: Данные, передаваемые обработчику
+        :return: Результат обработчика
+        """
+        from_user: TelegramUser | None = data.get("event_from_user")
+        data["user"] = await get_user(from_user.id) if from_user else None
+        return await handler(event, data)
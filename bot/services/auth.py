@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+import urllib.parse
+
+from aiogram import Bot
+
+from bot.config import (
+    BOT_TOKEN,
+    OAUTH_MAX_CONCURRENT,
+    OAUTH_STATE_SECRET,
+    OAUTH_STATE_TTL,
+    SPOTIFY_ACCOUNTS_URL,
+    SPOTIFY_CLIENT_ID,
+    SPOTIFY_REDIRECT_URI,
+)
+from bot.services.spotify import exchange_code_for_token
+from bot.utils.logger import logger
+
+"""
+Авторизация через Spotify OAuth: подписанный state и завершение входа
+"""
+
+# Права доступа для Spotify
+SCOPE = (
+    "user-library-read "
+    "user-library-modify "
+    "user-read-playback-state "
+    "user-modify-playback-state "
+    "playlist-read-private "
+    "playlist-read-collaborative"
+)
+
+# Ключ HMAC для state: одинаковый во всех процессах бота
+_state_key = (OAUTH_STATE_SECRET or hashlib.sha256(f"oauth-state:{BOT_TOKEN}".encode()).hexdigest()).encode()
+
+# Ограничение одновременных обменов кода на токен
+_exchanges = asyncio.Semaphore(OAUTH_MAX_CONCURRENT)
+
+
+def _signature(payload: str) -> str:
+    """
+    Подпись state.
+
+    :param payload: Подписываемая часть state
+    :type payload: str
+    :return: Подпись в base64url без выравнивания
+    :rtype: str
+    """
+    digest = hmac.new(_state_key, payload.encode(), hashlib.sha256).digest()[:16]
+    return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+
+def sign_state(telegram_id: int, ttl: int = OAUTH_STATE_TTL) -> str:
+    """
+    Создание подписанного state для ссылки авторизации.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :param ttl: Срок действия в секундах
+    :type ttl: int
+    :return: State вида "<telegram_id>.<истекает>.<nonce>.<подпись>"
+    :rtype: str
+    """
+    payload = f"{telegram_id}.{int(time.time()) + ttl}.{secrets.token_urlsafe(6)}"
+    return f"{payload}.{_signature(payload)}"
+
+
+def verify_state(state: str) -> int | None:
+    """
+    Проверка подписи и срока действия state.
+
+    :param state: State из колбэка Spotify
+    :type state: str
+    :return: ID пользователя Telegram или None, если state недействителен
+    :rtype: int | None
+    """
+    payload, _, signature = state.rpartition(".")
+    if not payload or not hmac.compare_digest(signature.encode(), _signature(payload).encode()):
+        return None
+
+    telegram_id, expires, _ = payload.split(".", 2)
+    if int(expires) < time.time():
+        return None
+    return int(telegram_id)
+
+
+def authorize_url(telegram_id: int) -> str:
+    """
+    Ссылка на страницу авторизации Spotify.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :return: URL авторизации
+    :rtype: str
+    """
+    return f"{SPOTIFY_ACCOUNTS_URL}/authorize?" + urllib.parse.urlencode({
+        "client_id": SPOTIFY_CLIENT_ID,
+        "response_type": "code",
+        "redirect_uri": SPOTIFY_REDIRECT_URI,
+        "scope": SCOPE,
+        "state": sign_state(telegram_id),
+    })
+
+
+async def complete_authorization(bot: Bot, code: str, telegram_id: int):
+    """
+    Обмен кода на токен и подтверждение пользователю в Telegram.
+
+    Число одновременных обменов ограничено OAUTH_MAX_CONCURRENT.
+
+    :param bot: Объект бота
+    :type bot: Bot
+    :param code: Код авторизации от Spotify
+    :type code: str
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :return: None
+    """
+    try:
+        async with _exchanges:
+            await exchange_code_for_token(code, telegram_id)
+        text = "✅ Spotify подключён! Отправьте /search <название>, чтобы найти трек."
+    except Exception as e:
+        logger.error("Ошибка обмена кода авторизации: %s", e)
+        text = "❌ Не удалось завершить авторизацию в Spotify. Отправьте /start и попробуйте ещё раз."
+
+    try:
+        await bot.send_message(telegram_id, text)
+    except Exception as e:
+        logger.error("Не удалось отправить подтверждение авторизации: %s", e)
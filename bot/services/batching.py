@@ -0,0 +1,127 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from bot.database.models import User
+
+"""
+Накопление однотипных запросов пользователя в пакеты
+"""
+
+
+class _Batch:
+    """
+    Накапливаемый пакет одного пользователя.
+
+    :ivar user: Пользователь
+    :ivar waiters: Ожидающие результата по каждому элементу
+    :ivar timer: Отложенная отправка пакета
+    """
+
+    def __init__(self, user: User):
+        self.user = user
+        self.waiters: dict[str, list[asyncio.Future]] = {}
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class UserBatcher:
+    """
+    Пакетирование запросов по пользователю.
+
+    Элементы копятся ``window`` секунд или до ``max_batch`` штук, затем
+    отправляются одним вызовом ``flush``. Каждый вызывающий получает
+    результат своего элемента.
+
+    :ivar window: Окно накопления в секундах
+    :ivar max_batch: Максимальный размер пакета
+    :ivar batches: Число отправленных пакетов
+    :ivar items: Число отправленных элементов
+    """
+
+    def __init__(
+            self,
+            flush: Callable[[User, list[str]], Awaitable[dict[str, Any]]],
+            window: float,
+            max_batch: int,
+    ):
+        self.flush = flush
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._pending: dict[int, _Batch] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def stats(self) -> dict:
+        """
+        Статистика пакетирования.
+
+        :return: Число пакетов, элементов и ожидающих пакетов
+        :rtype: dict
+        """
+        return {"batches": self.batches, "items": self.items, "pending": len(self._pending)}
+
+    async def submit(self, user: User, item: str) -> Any:
+        """
+        Добавление элемента в пакет пользователя и ожидание результата.
+
+        :param user: Пользователь
+        :type user: User
+        :param item: Элемент (например, ID трека)
+        :type item: str
+        :return: Результат для этого элемента
+        :rtype: Any
+        """
+        batch = self._pending.get(user.telegram_id)
+        if batch is None:
+            batch = self._pending[user.telegram_id] = _Batch(user)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._start, user.telegram_id)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.waiters.setdefault(item, []).append(future)
+
+        # Полный пакет отправляется сразу
+        if len(batch.waiters) >= self.max_batch:
+            self._start(user.telegram_id)
+
+        return await future
+
+    def _start(self, telegram_id: int):
+        """
+        Отсоединение пакета пользователя и запуск его отправки.
+
+        :param telegram_id: ID пользователя Telegram
+        :type telegram_id: int
+        :return: None
+        """
+        batch = self._pending.pop(telegram_id, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._flush(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, batch: _Batch):
+        """
+        Отправка пакета и раздача результатов ожидающим.
+
+        :param batch: Пакет пользователя
+        :type batch: _Batch
+        :return: None
+        """
+        self.batches += 1
+        self.items += len(batch.waiters)
+        try:
+            results = await self.flush(batch.user, list(batch.waiters))
+        except Exception as e:
+            for futures in batch.waiters.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for item, futures in batch.waiters.items():
+            for future in futures:
+                if not future.done():
+                    future.set_result(results.get(item))
@@ -0,0 +1,146 @@
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from bot.database.models import User
+from bot.services.ratelimit import request_priority
+from bot.services.spotify_api import SpotifyAPIError
+
+"""
+Объединение одинаковых одновременных запросов к Spotify от разных пользователей
+"""
+
+T = TypeVar("T")
+
+
+@dataclass
+class SharedRequest(Generic[T]):
+    """
+    Выполняющийся общий запрос.
+
+    :ivar task: Задача запроса
+    :ivar telegram_id: ID пользователя, чьим токеном выполняется запрос
+    :ivar priority: Приоритет запросов задачи в планировщике
+    """
+    task: asyncio.Task
+    telegram_id: int
+    priority: int
+
+
+class SharedRequests(Generic[T]):
+    """
+    Одинаковые одновременные запросы разных пользователей выполняются один раз.
+
+    Общий запрос идёт с токеном и приоритетом пользователя, который его
+    начал, поэтому:
+
+    * запрос с более высоким приоритетом не ждёт фоновый, а начинает
+      собственный (фоновый результат по-прежнему попадает в кэш);
+    * если общий запрос чужого пользователя завершился ошибкой доступа
+      (``retry_statuses``), ожидающий повторяет его со своим токеном.
+
+    :ivar retry_statuses: Статусы Spotify, после которых запрос повторяется своим токеном
+    :ivar coalesced: Число запросов, получивших результат чужого запроса
+    :ivar retried: Число повторов своим токеном
+    """
+
+    def __init__(self, retry_statuses: tuple[int, ...] = (401, 403)):
+        self.retry_statuses = retry_statuses
+        self.coalesced = 0
+        self.retried = 0
+        self._in_flight: dict[Hashable, SharedRequest[T]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def stats(self) -> dict:
+        """
+        Статистика объединения запросов.
+
+        :return: Число выполняющихся, объединённых и повторённых запросов
+        :rtype: dict
+        """
+        return {"in_flight": len(self._in_flight), "coalesced": self.coalesced, "retried": self.retried}
+
+    def join(self, key: Hashable, user: User, fetch: Callable[[User], Awaitable[T]]) -> SharedRequest[T]:
+        """
+        Присоединение к выполняющемуся запросу или запуск нового.
+
+        Новый запрос запускается и тогда, когда выполняющийся идёт
+        с более низким приоритетом, чем у вызывающего.
+
+        :param key: Ключ запроса
+        :type key: Hashable
+        :param user: Пользователь
+        :type user: User
+        :param fetch: Корутина-функция запроса с токеном пользователя
+        :type fetch: Callable[[User], Awaitable[T]]
+        :return: Общий запрос
+        :rtype: SharedRequest[T]
+        """
+        priority = request_priority.get()
+        request = self._in_flight.get(key)
+        if request is not None and request.priority <= priority:
+            self.coalesced += 1
+            return request
+
+        # Задача наследует контекст, а с ним и приоритет вызывающего
+        request = SharedRequest(asyncio.create_task(fetch(user)), user.telegram_id, priority)
+        self._in_flight[key] = request
+        request.task.add_done_callback(lambda task: self._finish(key, task))
+        return request
+
+    async def result(self, request: SharedRequest[T], user: User, fetch: Callable[[User], Awaitable[T]]) -> T:
+        """
+        Результат общего запроса с повтором своим токеном после ошибки доступа.
+
+        :param request: Общий запрос из join()
+        :type request: SharedRequest[T]
+        :param user: Пользователь
+        :type user: User
+        :param fetch: Корутина-функция запроса с токеном пользователя
+        :type fetch: Callable[[User], Awaitable[T]]
+        :return: Результат запроса
+        :rtype: T
+        """
+        try:
+            # shield: отмена одного ожидающего не должна прерывать общий запрос
+            return await asyncio.shield(request.task)
+        except SpotifyAPIError as e:
+            if request.telegram_id == user.telegram_id or e.status not in self.retry_statuses:
+                raise
+        self.retried += 1
+        return await fetch(user)
+
+    async def run(self, key: Hashable, user: User, fetch: Callable[[User], Awaitable[T]]) -> T:
+        """
+        Выполнение запроса с объединением одинаковых одновременных вызовов.
+
+        :param key: Ключ запроса
+        :type key: Hashable
+        :param user: Пользователь
+        :type user: User
+        :param fetch: Корутина-функция запроса с токеном пользователя
+        :type fetch: Callable[[User], Awaitable[T]]
+        :return: Результат запроса
+        :rtype: T
+        """
+        return await self.result(self.join(key, user, fetch), user, fetch)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """
+        Снятие завершённого запроса из списка выполняющихся.
+
+        Ошибка забирается из задачи, даже если её результат уже никто не ждёт.
+
+        :param key: Ключ запроса
+        :type key: Hashable
+        :param task: Завершённая задача
+        :type task: asyncio.Task
+        :return: None
+        """
+        request = self._in_flight.get(key)
+        if request is not None and request.task is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,130 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+from bot.config import ACTION_DEDUP_WINDOW, USER_MAX_CONCURRENT_ACTIONS
+from bot.utils.cache import TTLCache
+from bot.utils.metrics import stats_collector
+
+"""
+Подавление повторных нажатий кнопок действий и ограничение параллелизма по пользователю
+"""
+
+T = TypeVar("T")
+
+
+class ActionDeduplicator:
+    """
+    Объединение одинаковых действий пользователя.
+
+    Пока действие (пользователь, тип, трек) выполняется или прошло меньше
+    ``window`` секунд после его успешного завершения, повторный вызов
+    получает тот же результат без нового запроса к Spotify. Одновременно у пользователя
+    выполняется не больше ``max_concurrent`` действий.
+
+    :ivar window: Окно подавления повторов в секундах
+    :ivar max_concurrent: Максимум одновременных действий пользователя
+    :ivar deduplicated: Число подавленных повторов
+    """
+
+    def __init__(self, window: float, max_concurrent: int, maxsize: int = 10000):
+        self.window = window
+        self.max_concurrent = max_concurrent
+        self.deduplicated = 0
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self._recent = TTLCache(maxsize=maxsize, ttl=window)
+        self._slots: dict[int, list] = {}
+
+    def stats(self) -> dict:
+        """
+        Статистика подавления повторов.
+
+        :return: Число подавленных повторов и выполняющихся действий
+        :rtype: dict
+        """
+        return {"deduplicated": self.deduplicated, "in_flight": len(self._in_flight)}
+
+    async def _execute(self, telegram_id: int, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполнение действия в пределах лимита пользователя.
+
+        :param telegram_id: ID пользователя Telegram
+        :type telegram_id: int
+        :param operation: Действие
+        :type operation: Callable[[], Awaitable[T]]
+        :return: Результат действия
+        :rtype: T
+        """
+        # [семафор, число использующих]; запись удаляется, когда пользователь простаивает
+        slot = self._slots.setdefault(telegram_id, [asyncio.Semaphore(self.max_concurrent), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                return await operation()
+        finally:
+            slot[1] -= 1
+            if not slot[1]:
+                self._slots.pop(telegram_id, None)
+
+    async def run(
+            self,
+            telegram_id: int,
+            action: str,
+            track_id: str,
+            operation: Callable[[], Awaitable[T]],
+            limited: bool = True,
+    ) -> T:
+        """
+        Выполнение действия с подавлением повторов.
+
+        :param telegram_id: ID пользователя Telegram
+        :type telegram_id: int
+        :param action: Тип действия (play, like, queue)
+        :type action: str
+        :param track_id: ID трека
+        :type track_id: str
+        :param operation: Действие, возвращающее кортеж (успех, ...)
+        :type operation: Callable[[], Awaitable[T]]
+        :param limited: Учитывать ли действие в лимите одновременных действий пользователя
+        :type limited: bool
+        :return: Результат действия (общий для повторов)
+        :rtype: T
+        """
+        key = (telegram_id, action, track_id)
+        if key in self._recent:
+            self.deduplicated += 1
+            return self._recent.get(key)
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.deduplicated += 1
+        else:
+            task = asyncio.create_task(self._execute(telegram_id, operation) if limited else operation())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        """
+        Перенос результата успешного действия в окно подавления повторов.
+
+        Результат вида (False, сообщение) не запоминается: пользователь мог
+        устранить причину (например, открыть Spotify) и нажать снова.
+
+        :param key: Ключ действия
+        :type key: Hashable
+        :param task: Завершённая задача
+        :type task: asyncio.Task
+        :return: None
+        """
+        self._in_flight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if result[0]:
+            self._recent.set(key, result)
+
+
+# Подавление повторных нажатий ▶️/❤️/➕
+actions = ActionDeduplicator(window=ACTION_DEDUP_WINDOW, max_concurrent=USER_MAX_CONCURRENT_ACTIONS)
+stats_collector.register("action_dedup", actions.stats)
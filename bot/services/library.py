@@ -0,0 +1,504 @@
+import asyncio
+import datetime
+import time
+
+from tortoise import timezone
+
+from bot.config import (
+    LIBRARY_SYNC_CONCURRENCY,
+    LIBRARY_SYNC_INTERVAL,
+    LIBRARY_SYNC_TICK,
+    SPOTIFY_MARKET,
+    WORKER_INDEX,
+    WORKERS,
+)
+from bot.database.models import LibraryState, Playlist, PlaylistTrack, SavedTrack, Track, User
+from bot.services.ratelimit import PRIORITY_BACKGROUND, request_priority
+from bot.services.spotify import cached_saved_flags, iter_pages
+from bot.services.spotify_api import SpotifyAPIError
+from bot.services.track_index import store_tracks
+from bot.services.tracks import track_to_dict
+from bot.services.users import get_user
+from bot.utils.logger import logger
+from bot.utils.metrics import register_counters
+
+"""
+Локальное зеркало избранного и плейлистов пользователя с инкрементальной синхронизацией
+"""
+
+# Размеры страниц Spotify для избранного и треков плейлиста (максимальные)
+SAVED_PAGE_SIZE = 50
+PLAYLISTS_PAGE_SIZE = 50
+PLAYLIST_PAGE_SIZE = 100
+
+# Поля треков плейлиста, нужные зеркалу (меньше ответ — быстрее разбор)
+PLAYLIST_ITEM_FIELDS = "items(track(id,name,type,artists(name),external_urls)),next"
+
+# Размер пакета при удалении записей по списку ID
+DELETE_BATCH_SIZE = 500
+
+# Текущие синхронизации по telegram_id
+_sync_in_flight: dict[int, asyncio.Task] = {}
+
+# Фоновые синхронизации, запущенные из обработчиков
+_background: set[asyncio.Task] = set()
+
+# Пользователи с неудачной синхронизацией: повтор не раньше этого момента (time.monotonic())
+_retry_after: dict[int, float] = {}
+
+# Счётчики: синхронизации, ошибки, страницы, полные пересинхронизации избранного,
+# загруженные и пропущенные (snapshot_id не изменился) плейлисты
+sync_stats = {
+    "syncs": 0,
+    "failures": 0,
+    "pages": 0,
+    "saved_full_resyncs": 0,
+    "playlists_fetched": 0,
+    "playlists_unchanged": 0,
+}
+register_counters("library_sync", "Синхронизация библиотек пользователей", sync_stats)
+
+
+def _parse_time(value: str) -> datetime.datetime:
+    """
+    Разбор времени Spotify в формате ISO 8601.
+
+    :param value: Строка вида 2024-01-01T12:00:00Z
+    :type value: str
+    :return: Время с часовым поясом
+    :rtype: datetime.datetime
+    """
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+async def _delete_saved(telegram_id: int, track_ids: list[str]):
+    """
+    Удаление треков из зеркала избранного пакетами.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param track_ids: ID треков
+    :type track_ids: list[str]
+    :return: None
+    """
+    for start in range(0, len(track_ids), DELETE_BATCH_SIZE):
+        await SavedTrack.filter(
+            telegram_id=telegram_id, track_id__in=track_ids[start:start + DELETE_BATCH_SIZE]
+        ).delete()
+
+
+async def _sync_saved(user: User, state: LibraryState):
+    """
+    Инкрементальная синхронизация избранного.
+
+    Spotify отдаёт избранное от новых к старым, поэтому страницы читаются,
+    пока не встретится трек старше водяного знака (added_at самого нового
+    сохранённого трека). Если после этого число треков не сходится с
+    total, значит треки удалялись, и выполняется полный проход.
+
+    :param user: Пользователь
+    :type user: User
+    :param state: Состояние синхронизации (обновляется на месте)
+    :type state: LibraryState
+    :return: None
+    """
+    watermark = state.saved_watermark
+    newest = watermark
+    total = None
+
+    async for page in iter_pages(user, lambda sp, offset: sp.current_user_saved_tracks(
+            limit=SAVED_PAGE_SIZE, offset=offset, market=SPOTIFY_MARKET)):
+        sync_stats["pages"] += 1
+        if total is None:
+            total = page["total"]
+
+        rows, tracks, reached = [], [], False
+        for item in page["items"]:
+            added_at = _parse_time(item["added_at"])
+            # Треки, добавленные в ту же секунду, что и водяной знак, перечитываются
+            if watermark and added_at < watermark:
+                reached = True
+                break
+            track = item.get("track")
+            if not track or not track.get("id"):
+                continue
+            tracks.append(track_to_dict(track))
+            rows.append(SavedTrack(telegram_id=user.telegram_id, track_id=track["id"], added_at=added_at))
+            newest = added_at if newest is None else max(newest, added_at)
+
+        await store_tracks(tracks)
+        await SavedTrack.bulk_create(rows, ignore_conflicts=True)
+        if reached:
+            break
+
+    total = total or 0
+    if await SavedTrack.filter(telegram_id=user.telegram_id).count() != total:
+        await _resync_saved(user)
+
+    state.saved_total = total
+    state.saved_watermark = newest
+
+
+async def _resync_saved(user: User):
+    """
+    Полный проход по избранному с удалением треков, которых больше нет.
+
+    В памяти держится только множество ID, а не сами страницы.
+
+    :param user: Пользователь
+    :type user: User
+    :return: None
+    """
+    sync_stats["saved_full_resyncs"] += 1
+    seen: set[str] = set()
+
+    async for page in iter_pages(user, lambda sp, offset: sp.current_user_saved_tracks(
+            limit=SAVED_PAGE_SIZE, offset=offset, market=SPOTIFY_MARKET)):
+        sync_stats["pages"] += 1
+        rows, tracks = [], []
+        for item in page["items"]:
+            track = item.get("track")
+            if not track or not track.get("id"):
+                continue
+            seen.add(track["id"])
+            tracks.append(track_to_dict(track))
+            rows.append(SavedTrack(
+                telegram_id=user.telegram_id, track_id=track["id"], added_at=_parse_time(item["added_at"])
+            ))
+        await store_tracks(tracks)
+        await SavedTrack.bulk_create(rows, ignore_conflicts=True)
+
+    local = await SavedTrack.filter(telegram_id=user.telegram_id).values_list("track_id", flat=True)
+    await _delete_saved(user.telegram_id, [track_id for track_id in local if track_id not in seen])
+
+
+async def _sync_playlist_tracks(user: User, playlist: Playlist, snapshot_id: str):
+    """
+    Загрузка треков изменившегося плейлиста.
+
+    Пока загрузка не завершена, snapshot_id плейлиста пуст, поэтому
+    прерванная загрузка будет повторена при следующей синхронизации.
+
+    :param user: Пользователь
+    :type user: User
+    :param playlist: Плейлист
+    :type playlist: Playlist
+    :param snapshot_id: Текущая версия плейлиста в Spotify
+    :type snapshot_id: str
+    :return: None
+    """
+    if playlist.snapshot_id is not None:
+        playlist.snapshot_id = None
+        await playlist.save(update_fields=["snapshot_id"])
+    await PlaylistTrack.filter(playlist_id=playlist.id).delete()
+
+    position = 0
+    async for page in iter_pages(user, lambda sp, offset: sp.playlist_items(
+            playlist.playlist_id, limit=PLAYLIST_PAGE_SIZE, offset=offset,
+            market=SPOTIFY_MARKET, fields=PLAYLIST_ITEM_FIELDS)):
+        sync_stats["pages"] += 1
+        rows, tracks = [], []
+        for item in page["items"]:
+            track = item.get("track")
+            # Подкасты и локальные файлы пропускаются, но занимают позицию
+            if track and track.get("type") == "track" and track.get("id"):
+                tracks.append(track_to_dict(track))
+                rows.append(PlaylistTrack(playlist=playlist, track_id=track["id"], position=position))
+            position += 1
+        await store_tracks(tracks)
+        await PlaylistTrack.bulk_create(rows)
+
+    playlist.snapshot_id = snapshot_id
+    await playlist.save(update_fields=["snapshot_id"])
+    sync_stats["playlists_fetched"] += 1
+
+
+async def _sync_playlists(user: User):
+    """
+    Синхронизация списка плейлистов и треков изменившихся плейлистов.
+
+    Треки плейлиста загружаются, только если его snapshot_id отличается
+    от сохранённого.
+
+    :param user: Пользователь
+    :type user: User
+    :return: None
+    """
+    stored = {playlist.playlist_id: playlist for playlist in await Playlist.filter(telegram_id=user.telegram_id)}
+    changed: list[tuple[Playlist, str]] = []
+    seen: set[str] = set()
+    position = 0
+
+    async for page in iter_pages(user, lambda sp, offset: sp.current_user_playlists(
+            limit=PLAYLISTS_PAGE_SIZE, offset=offset)):
+        sync_stats["pages"] += 1
+        for item in page["items"]:
+            if not item:
+                continue
+            fields = {
+                "name": item["name"],
+                "position": position,
+                "tracks_total": (item.get("tracks") or {}).get("total", 0),
+            }
+            position += 1
+            seen.add(item["id"])
+
+            playlist = stored.get(item["id"])
+            if playlist is None:
+                playlist = await Playlist.create(telegram_id=user.telegram_id, playlist_id=item["id"], **fields)
+            elif any(getattr(playlist, name) != value for name, value in fields.items()):
+                playlist.update_from_dict(fields)
+                await playlist.save(update_fields=list(fields))
+
+            if playlist.snapshot_id != item["snapshot_id"]:
+                changed.append((playlist, item["snapshot_id"]))
+            else:
+                sync_stats["playlists_unchanged"] += 1
+
+    # Плейлисты, удалённые из библиотеки
+    removed = [playlist.id for playlist_id, playlist in stored.items() if playlist_id not in seen]
+    if removed:
+        await PlaylistTrack.filter(playlist_id__in=removed).delete()
+        await Playlist.filter(id__in=removed).delete()
+
+    for playlist, snapshot_id in changed:
+        try:
+            await _sync_playlist_tracks(user, playlist, snapshot_id)
+        except SpotifyAPIError as e:
+            # Недоступный плейлист не мешает синхронизации остальных
+            logger.warning("Не удалось загрузить плейлист %s: %s", playlist.playlist_id, e)
+
+
+async def _sync(user: User) -> LibraryState:
+    """
+    Синхронизация библиотеки пользователя с фоновым приоритетом.
+
+    :param user: Пользователь
+    :type user: User
+    :return: Состояние синхронизации
+    :rtype: LibraryState
+    """
+    request_priority.set(PRIORITY_BACKGROUND)
+    started = time.perf_counter()
+    state, _ = await LibraryState.get_or_create(telegram_id=user.telegram_id)
+    try:
+        await _sync_saved(user, state)
+        await _sync_playlists(user)
+    except Exception:
+        sync_stats["failures"] += 1
+        _retry_after[user.telegram_id] = time.monotonic() + LIBRARY_SYNC_INTERVAL
+        raise
+
+    state.synced_at = timezone.now()
+    await state.save()
+    _retry_after.pop(user.telegram_id, None)
+    sync_stats["syncs"] += 1
+    logger.info("Библиотека пользователя синхронизирована за %.1f с", time.perf_counter() - started)
+    return state
+
+
+async def sync_library(user: User) -> LibraryState:
+    """
+    Синхронизация библиотеки; одновременные вызовы объединяются.
+
+    :param user: Пользователь
+    :type user: User
+    :return: Состояние синхронизации
+    :rtype: LibraryState
+    """
+    task = _sync_in_flight.get(user.telegram_id)
+    if task is None:
+        task = asyncio.create_task(_sync(user))
+        _sync_in_flight[user.telegram_id] = task
+        task.add_done_callback(lambda _: _sync_in_flight.pop(user.telegram_id, None))
+    return await asyncio.shield(task)
+
+
+def schedule_sync(user: User):
+    """
+    Запуск синхронизации в фоне без ожидания результата.
+
+    :param user: Пользователь
+    :type user: User
+    :return: None
+    """
+    def done(task: asyncio.Task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.warning("Ошибка синхронизации библиотеки: %s", task.exception())
+
+    task = asyncio.create_task(sync_library(user))
+    _background.add(task)
+    task.add_done_callback(done)
+
+
+async def _sync_due_users():
+    """
+    Синхронизация пользователей этого процесса, чьи библиотеки устарели.
+
+    :return: None
+    """
+    deadline = timezone.now() - datetime.timedelta(seconds=LIBRARY_SYNC_INTERVAL)
+    fresh = set(await LibraryState.filter(synced_at__gte=deadline).values_list("telegram_id", flat=True))
+    candidates = await User.filter(spotify_refresh_token__isnull=False).values_list("telegram_id", flat=True)
+
+    # Пользователь синхронизируется процессом, который обрабатывает его апдейты
+    shard, now = int(WORKER_INDEX or 0), time.monotonic()
+    due = iter([
+        telegram_id for telegram_id in candidates
+        if telegram_id % WORKERS == shard and telegram_id not in fresh and _retry_after.get(telegram_id, 0) <= now
+    ])
+
+    async def worker():
+        for telegram_id in due:
+            user = await get_user(telegram_id)
+            if not user or not user.spotify_access_token:
+                continue
+            try:
+                await sync_library(user)
+            except Exception as e:
+                logger.warning("Ошибка синхронизации библиотеки: %s", e)
+
+    await asyncio.gather(*(worker() for _ in range(LIBRARY_SYNC_CONCURRENCY)))
+
+
+async def library_sync_loop():
+    """
+    Фоновая синхронизация библиотек: раз в LIBRARY_SYNC_TICK проверяются
+    пользователи, не синхронизированные дольше LIBRARY_SYNC_INTERVAL.
+
+    :return: None
+    """
+    while True:
+        try:
+            await _sync_due_users()
+        except Exception as e:
+            logger.error("Ошибка планировщика синхронизации библиотек: %s", e)
+        await asyncio.sleep(LIBRARY_SYNC_TICK)
+
+
+async def _fresh_state(telegram_id: int) -> LibraryState | None:
+    """
+    Состояние синхронизации, если зеркалу можно доверять.
+
+    Зеркало считается актуальным в течение двух периодов синхронизации:
+    один пропущенный цикл не переводит чтения обратно в Spotify.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :return: Состояние или None, если синхронизации не было или она устарела
+    :rtype: LibraryState | None
+    """
+    state = await LibraryState.get_or_none(telegram_id=telegram_id)
+    if state is None or state.synced_at is None:
+        return None
+    if timezone.now() - state.synced_at > datetime.timedelta(seconds=2 * LIBRARY_SYNC_INTERVAL):
+        return None
+    return state
+
+
+async def saved_flags(user: User, track_ids: list[str]) -> dict[str, bool]:
+    """
+    Какие треки в избранном: из зеркала, если оно актуально, иначе из кэша.
+
+    Spotify не запрашивается: отметки строятся при каждом показе
+    результатов поиска. Пока зеркало не синхронизировано, отмечаются
+    только треки с известным признаком (например, лайкнутые через бота).
+
+    :param user: Пользователь
+    :type user: User
+    :param track_ids: ID треков
+    :type track_ids: list[str]
+    :return: Словарь ID -> признак «в избранном»
+    :rtype: dict[str, bool]
+    """
+    if not track_ids:
+        return {}
+    if await _fresh_state(user.telegram_id) is None:
+        return cached_saved_flags(user, track_ids)
+
+    saved = set(await SavedTrack.filter(
+        telegram_id=user.telegram_id, track_id__in=track_ids
+    ).values_list("track_id", flat=True))
+    return {track_id: track_id in saved for track_id in track_ids}
+
+
+async def mark_saved(telegram_id: int, track_ids: list[str]):
+    """
+    Запись лайков, поставленных через бота, в зеркало избранного.
+
+    Водяной знак не сдвигается: следующая синхронизация получит эти
+    треки из Spotify с настоящим added_at.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param track_ids: ID треков
+    :type track_ids: list[str]
+    :return: None
+    """
+    if not await LibraryState.exists(telegram_id=telegram_id):
+        return
+    now = timezone.now()
+    await SavedTrack.bulk_create(
+        [SavedTrack(telegram_id=telegram_id, track_id=track_id, added_at=now) for track_id in track_ids],
+        ignore_conflicts=True,
+    )
+
+
+async def playlists_with_track(telegram_id: int, track_id: str) -> list[str]:
+    """
+    Названия плейлистов пользователя, в которых есть трек.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param track_id: ID трека
+    :type track_id: str
+    :return: Названия плейлистов в порядке библиотеки
+    :rtype: list[str]
+    """
+    return await Playlist.filter(
+        telegram_id=telegram_id, items__track_id=track_id
+    ).order_by("position").distinct().values_list("name", flat=True)
+
+
+async def liked_tracks(telegram_id: int, limit: int, offset: int = 0) -> list[dict]:
+    """
+    Треки из зеркала избранного, от новых к старым.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :param limit: Число треков
+    :type limit: int
+    :param offset: Смещение
+    :type offset: int
+    :return: Словари треков
+    :rtype: list[dict]
+    """
+    track_ids = await SavedTrack.filter(telegram_id=telegram_id).order_by(
+        "-added_at", "-id"
+    ).offset(offset).limit(limit).values_list("track_id", flat=True)
+    tracks = {
+        track["id"]: track
+        for track in await Track.filter(id__in=track_ids).values("id", "name", "artist", "spotify_url")
+    }
+    return [tracks[track_id] for track_id in track_ids if track_id in tracks]
+
+
+async def library_summary(telegram_id: int) -> dict | None:
+    """
+    Сводка по зеркалу библиотеки.
+
+    :param telegram_id: ID пользователя
+    :type telegram_id: int
+    :return: Число избранных треков и плейлистов, время синхронизации;
+        None, если библиотека ещё не синхронизировалась
+    :rtype: dict | None
+    """
+    state = await LibraryState.get_or_none(telegram_id=telegram_id)
+    if state is None or state.synced_at is None:
+        return None
+    return {
+        "saved": await SavedTrack.filter(telegram_id=telegram_id).count(),
+        "playlists": await Playlist.filter(telegram_id=telegram_id).count(),
+        "synced_at": state.synced_at,
+    }
@@ -0,0 +1,458 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+
+from aiogram import Bot, html
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.config import (
+    NOWPLAYING_IDLE_INTERVAL,
+    NOWPLAYING_INTERVAL,
+    NOWPLAYING_MAX_IDLE_INTERVAL,
+    NOWPLAYING_RATE,
+    NOWPLAYING_WATCH_TTL,
+    SPOTIFY_MARKET,
+    WORKERS,
+)
+from bot.database.models import User
+from bot.services.ratelimit import PRIORITY_BACKGROUND, SpotifyBusyError, request_priority
+from bot.services.spotify import call_spotify
+from bot.services.spotify_api import SpotifyAPIError
+from bot.services.track_index import index_tracks
+from bot.services.tracks import remember_tracks, track_to_dict
+from bot.services.users import get_user
+from bot.utils.logger import logger
+from bot.utils.metrics import stats_collector
+
+"""
+Текущий трек пользователя и общий планировщик опроса для живых сообщений /nowplaying
+"""
+
+# Минимальный период опроса одного пользователя (сек.)
+MIN_POLL_INTERVAL = 1.0
+
+# Запас после расчётного конца трека, чтобы Spotify успел переключиться (сек.)
+TRACK_END_MARGIN = 1.0
+
+# Ошибки Telegram, после которых живое сообщение больше нельзя редактировать
+MESSAGE_GONE_ERRORS = ("message to edit not found", "message can't be edited", "chat not found")
+
+
+async def get_now_playing(user: User) -> dict | None:
+    """
+    Получение текущего состояния воспроизведения.
+
+    :param user: Пользователь
+    :type user: User
+    :return: Словарь с треком (или None для подкастов и рекламы), признаком
+        воспроизведения, позицией и длительностью; None, если ничего не играет
+    :rtype: dict | None
+    """
+    result = await call_spotify(user, lambda sp: sp.currently_playing(market=SPOTIFY_MARKET))
+    if not result:
+        return None
+
+    item = result.get("item")
+    track = track_to_dict(item) if item and item.get("type") == "track" else None
+    if track:
+        remember_tracks([track])
+        index_tracks([track])
+    return {
+        "track": track,
+        "is_playing": bool(result.get("is_playing")),
+        "progress_ms": result.get("progress_ms") or 0,
+        "duration_ms": item.get("duration_ms", 0) if item else 0,
+    }
+
+
+def _format_duration(ms: int) -> str:
+    seconds = ms // 1000
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def now_playing_text(state: dict | None, live: bool = False) -> str:
+    """
+    Текст сообщения о текущем треке.
+
+    :param state: Состояние из get_now_playing
+    :type state: dict | None
+    :param live: Сообщение обновляется автоматически
+    :type live: bool
+    :return: Текст в HTML (названия экранированы)
+    :rtype: str
+    """
+    if not state:
+        text = "🔇 Сейчас ничего не играет."
+    elif not state["track"]:
+        text = "🎙 Сейчас играет не трек (подкаст или реклама)."
+    else:
+        track = state["track"]
+        icon = "▶️" if state["is_playing"] else "⏸"
+        text = (f"{icon} {html.bold(html.quote(track['name']))} — {html.quote(track['artist'])} "
+                f"({_format_duration(state['duration_ms'])})")
+    if live:
+        text += "\n\n📡 Сообщение обновляется при смене трека."
+    return text
+
+
+def now_playing_keyboard(state: dict | None, live: bool = False) -> InlineKeyboardMarkup:
+    """
+    Клавиатура сообщения о текущем треке.
+
+    :param state: Состояние из get_now_playing
+    :type state: dict | None
+    :param live: Сообщение обновляется автоматически
+    :type live: bool
+    :return: Inline-клавиатура
+    :rtype: InlineKeyboardMarkup
+    """
+    rows = []
+    if state and state["track"]:
+        rows.append([InlineKeyboardButton(text="❤️ Лайкнуть", callback_data=f"like:{state['track']['id']}")])
+    if live:
+        rows.append([InlineKeyboardButton(text="⏹ Остановить обновление", callback_data="nowplaying_stop")])
+    else:
+        rows.append([
+            InlineKeyboardButton(text="🔄 Обновить", callback_data="nowplaying_refresh"),
+            InlineKeyboardButton(text="📡 Следить", callback_data="nowplaying_watch"),
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def _state_signature(state: dict | None) -> tuple:
+    """
+    Часть состояния, при изменении которой сообщение перерисовывается.
+
+    :param state: Состояние из get_now_playing
+    :type state: dict | None
+    :return: Кортеж (ID трека, признак воспроизведения)
+    :rtype: tuple
+    """
+    if not state:
+        return None, False
+    return (state["track"] or {}).get("id"), state["is_playing"]
+
+
+@dataclass
+class Subscription:
+    """
+    Живое сообщение /nowplaying одного пользователя.
+
+    :ivar telegram_id: ID пользователя
+    :ivar chat_id: ID чата с сообщением
+    :ivar message_id: ID обновляемого сообщения
+    :ivar expires_at: Момент окончания слежения (time.monotonic())
+    :ivar signature: Последнее показанное состояние
+    :ivar idle_polls: Число опросов подряд без воспроизведения
+    :ivar due: Время следующего опроса (time.monotonic())
+    """
+    telegram_id: int
+    chat_id: int
+    message_id: int
+    expires_at: float
+    signature: tuple = (None, False)
+    idle_polls: int = 0
+    due: float = 0.0
+
+
+class NowPlayingWatcher:
+    """
+    Общий планировщик опроса текущего трека для всех подписчиков.
+
+    Подписки хранятся в куче по времени следующего опроса. Опросы
+    выполняются не чаще rate в секунду независимо от числа подписчиков:
+    при нехватке бюджета они сдвигаются, а не копятся. Период опроса
+    подстраивается под состояние: во время воспроизведения — не реже
+    interval и сразу после расчётного конца трека, на паузе — с
+    удвоением от idle_interval до max_idle_interval.
+
+    :ivar rate: Бюджет запросов к Spotify в секунду
+    :ivar interval: Максимальный период опроса во время воспроизведения
+    :ivar idle_interval: Начальный период опроса без воспроизведения
+    :ivar max_idle_interval: Предельный период опроса без воспроизведения
+    :ivar ttl: Длительность слежения за одним сообщением
+    """
+
+    def __init__(self, rate: float, interval: float, idle_interval: float, max_idle_interval: float, ttl: float):
+        self.rate = rate
+        self.interval = interval
+        self.idle_interval = idle_interval
+        self.max_idle_interval = max_idle_interval
+        self.ttl = ttl
+        self._bot: Bot | None = None
+        self._subscriptions: dict[int, Subscription] = {}
+        self._queue: list[tuple[float, int, Subscription]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker: asyncio.Task | None = None
+        self._polls: set[asyncio.Task] = set()
+        self._next_slot = 0.0
+
+        # Статистика
+        self.polls = 0
+        self.edits = 0
+        self.delayed = 0
+        self.lag_max = 0.0
+
+    def subscribe(self, bot: Bot, telegram_id: int, chat_id: int, message_id: int, state: dict | None):
+        """
+        Подписка сообщения на обновления.
+
+        Прежняя подписка пользователя заменяется: живым остаётся
+        только последнее сообщение.
+
+        :param bot: Бот для редактирования сообщений
+        :type bot: Bot
+        :param telegram_id: ID пользователя
+        :type telegram_id: int
+        :param chat_id: ID чата
+        :type chat_id: int
+        :param message_id: ID сообщения
+        :type message_id: int
+        :param state: Уже показанное в сообщении состояние
+        :type state: dict | None
+        :return: None
+        """
+        self._bot = bot
+        subscription = Subscription(
+            telegram_id=telegram_id,
+            chat_id=chat_id,
+            message_id=message_id,
+            expires_at=time.monotonic() + self.ttl,
+            signature=_state_signature(state),
+        )
+        self._subscriptions[telegram_id] = subscription
+        self._schedule(subscription, self._next_delay(subscription, state))
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    def unsubscribe(self, telegram_id: int, message_id: int | None = None) -> Subscription | None:
+        """
+        Отмена подписки пользователя.
+
+        :param telegram_id: ID пользователя
+        :type telegram_id: int
+        :param message_id: Отменить, только если живое именно это сообщение
+        :type message_id: int | None
+        :return: Отменённая подписка или None
+        :rtype: Subscription | None
+        """
+        subscription = self._subscriptions.get(telegram_id)
+        if subscription is None or message_id not in (None, subscription.message_id):
+            return None
+
+        # Запись в куче остаётся и пропускается при извлечении
+        return self._subscriptions.pop(telegram_id)
+
+    def _schedule(self, subscription: Subscription, delay: float):
+        """
+        Постановка следующего опроса в кучу.
+
+        :param subscription: Подписка
+        :type subscription: Subscription
+        :param delay: Задержка до опроса в секундах
+        :type delay: float
+        :return: None
+        """
+        subscription.due = time.monotonic() + delay
+        heapq.heappush(self._queue, (subscription.due, next(self._counter), subscription))
+        self._wakeup.set()
+
+    def _next_delay(self, subscription: Subscription, state: dict | None) -> float:
+        """
+        Период до следующего опроса по текущему состоянию.
+
+        :param subscription: Подписка
+        :type subscription: Subscription
+        :param state: Состояние из get_now_playing
+        :type state: dict | None
+        :return: Задержка в секундах
+        :rtype: float
+        """
+        if state and state["is_playing"]:
+            subscription.idle_polls = 0
+            remaining = (state["duration_ms"] - state["progress_ms"]) / 1000
+            return max(MIN_POLL_INTERVAL, min(self.interval, remaining + TRACK_END_MARGIN))
+
+        subscription.idle_polls += 1
+        return min(self.max_idle_interval, self.idle_interval * 2 ** (subscription.idle_polls - 1))
+
+    async def _run(self):
+        """
+        Цикл выдачи опросов по расписанию в пределах бюджета.
+
+        :return: None
+        """
+        while self._subscriptions:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, subscription = self._queue[0]
+            # Отменённые и переназначенные подписки пропускаются
+            if self._subscriptions.get(subscription.telegram_id) is not subscription or subscription.due != due:
+                heapq.heappop(self._queue)
+                continue
+
+            now = time.monotonic()
+            if due > now:
+                # Ожидание срока или более ранней новой подписки
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), due - now)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # Бюджет: не больше rate опросов в секунду
+            if self._next_slot > now:
+                await asyncio.sleep(self._next_slot - now)
+                continue
+            self._next_slot = now + 1 / self.rate
+
+            heapq.heappop(self._queue)
+            lag = now - due
+            if lag > 1:
+                self.delayed += 1
+            self.lag_max = max(self.lag_max, lag)
+
+            task = asyncio.create_task(self._poll(subscription))
+            self._polls.add(task)
+            task.add_done_callback(self._polls.discard)
+
+    async def _poll(self, subscription: Subscription):
+        """
+        Опрос одного подписчика и обновление его сообщения.
+
+        :param subscription: Подписка
+        :type subscription: Subscription
+        :return: None
+        """
+        request_priority.set(PRIORITY_BACKGROUND)
+        self.polls += 1
+
+        if time.monotonic() >= subscription.expires_at:
+            await self._finish(subscription, "⏹ Слежение остановлено по времени. Нажмите /nowplaying снова.")
+            return
+
+        user = await get_user(subscription.telegram_id)
+        if not user or not user.spotify_access_token:
+            await self._finish(subscription, "⚠️ Авторизация не найдена, слежение остановлено.")
+            return
+
+        try:
+            state = await get_now_playing(user)
+        except SpotifyBusyError:
+            # Очередь к Spotify занята — повтор позже без изменения сообщения
+            self._schedule(subscription, self.interval)
+            return
+        except SpotifyAPIError as e:
+            if e.status in (401, 403):
+                await self._finish(subscription, "⚠️ Нет доступа к Spotify, слежение остановлено.")
+                return
+            logger.warning("Ошибка опроса текущего трека: %s", e)
+            self._schedule(subscription, self._next_delay(subscription, None))
+            return
+        except Exception as e:
+            logger.error("Ошибка опроса текущего трека: %s", e)
+            self._schedule(subscription, self._next_delay(subscription, None))
+            return
+
+        if self._subscriptions.get(subscription.telegram_id) is not subscription:
+            return
+
+        signature = _state_signature(state)
+        if signature != subscription.signature:
+            subscription.signature = signature
+            if not await self._edit(subscription, now_playing_text(state, live=True),
+                                    now_playing_keyboard(state, live=True)):
+                self.unsubscribe(subscription.telegram_id)
+                return
+
+        self._schedule(subscription, self._next_delay(subscription, state))
+
+    async def _edit(self, subscription: Subscription, text: str, keyboard: InlineKeyboardMarkup) -> bool:
+        """
+        Редактирование живого сообщения.
+
+        :param subscription: Подписка
+        :type subscription: Subscription
+        :param text: Новый текст
+        :type text: str
+        :param keyboard: Новая клавиатура
+        :type keyboard: InlineKeyboardMarkup
+        :return: False, если сообщение больше нельзя редактировать
+        :rtype: bool
+        """
+        try:
+            await self._bot.edit_message_text(
+                text=text,
+                chat_id=subscription.chat_id,
+                message_id=subscription.message_id,
+                parse_mode="HTML",
+                reply_markup=keyboard,
+            )
+            self.edits += 1
+            return True
+        except TelegramForbiddenError as e:
+            logger.debug("Живое сообщение недоступно: %s", e)
+            return False
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return True
+            # Слежение снимается, только если сообщения больше нет
+            if any(reason in str(e) for reason in MESSAGE_GONE_ERRORS):
+                logger.debug("Живое сообщение недоступно: %s", e)
+                return False
+            logger.warning("Не удалось обновить живое сообщение: %s", e)
+            return True
+        except Exception as e:
+            logger.warning("Не удалось обновить живое сообщение: %s", e)
+            return True
+
+    async def _finish(self, subscription: Subscription, text: str):
+        """
+        Завершение слежения с итоговой надписью в сообщении.
+
+        :param subscription: Подписка
+        :type subscription: Subscription
+        :param text: Текст сообщения
+        :type text: str
+        :return: None
+        """
+        if self._subscriptions.get(subscription.telegram_id) is not subscription:
+            return
+        self.unsubscribe(subscription.telegram_id)
+        await self._edit(subscription, text, now_playing_keyboard(None))
+
+    def stats(self) -> dict:
+        """
+        Статистика планировщика.
+
+        :return: Число подписчиков, опросов, правок и задержек бюджета
+        :rtype: dict
+        """
+        return {
+            "subscribers": len(self._subscriptions),
+            "scheduled": len(self._queue),
+            "polls": self.polls,
+            "edits": self.edits,
+            "delayed": self.delayed,
+            "lag_max": self.lag_max,
+        }
+
+
+# Планировщик живых сообщений; бюджет делится между процессами-обработчиками
+watcher = NowPlayingWatcher(
+    rate=NOWPLAYING_RATE / WORKERS,
+    interval=NOWPLAYING_INTERVAL,
+    idle_interval=NOWPLAYING_IDLE_INTERVAL,
+    max_idle_interval=NOWPLAYING_MAX_IDLE_INTERVAL,
+    ttl=NOWPLAYING_WATCH_TTL,
+)
+stats_collector.register("nowplaying", watcher.stats)
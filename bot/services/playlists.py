@@ -0,0 +1,332 @@
+import asyncio
+import secrets
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable
+
+from bot.config import (
+    PLAYLIST_BROWSER_PAGE_SIZE,
+    PLAYLIST_PAGE_CACHE_SIZE,
+    PLAYLIST_PAGE_CACHE_TTL,
+    SEARCH_SESSION_CACHE_SIZE,
+    SEARCH_SESSION_TTL,
+    SPOTIFY_MARKET,
+)
+from bot.database.models import User
+from bot.services.coalescing import SharedRequests
+from bot.services.library import PLAYLIST_ITEM_FIELDS
+from bot.services.ratelimit import PRIORITY_BACKGROUND, request_priority
+from bot.services.spotify import add_track_to_queue, call_spotify
+from bot.services.track_index import index_tracks
+from bot.services.tracks import remember_tracks, track_to_dict
+from bot.utils.cache import TTLCache
+from bot.utils.logger import logger
+from bot.utils.metrics import stats_collector
+
+"""
+Постраничный просмотр плейлистов: страницы треков кэшируются по snapshot_id
+"""
+
+# Страницы треков по (ID плейлиста, snapshot_id, номер страницы). Версия плейлиста
+# неизменна, поэтому страница не устаревает, пока не изменится snapshot_id.
+_track_pages = TTLCache(maxsize=PLAYLIST_PAGE_CACHE_SIZE, ttl=PLAYLIST_PAGE_CACHE_TTL)
+stats_collector.register("playlist_pages", _track_pages.stats)
+
+# Текущие загрузки страниц треков по ключу кэша (общие для всех пользователей).
+# Плейлист может быть доступен не каждому, поэтому после 403/404 под чужим
+# токеном страница загружается заново своим.
+_pages_in_flight: SharedRequests[list[dict]] = SharedRequests(retry_statuses=(401, 403, 404))
+stats_collector.register("playlist_pages_in_flight", _pages_in_flight.stats)
+
+
+@dataclass
+class PlaylistSession:
+    """
+    Состояние одного сообщения с плейлистами.
+
+    :ivar telegram_id: ID пользователя
+    :ivar playlists: Загруженные страницы списка плейлистов по номеру
+    :ivar playlists_total: Число плейлистов пользователя
+    :ivar list_page: Текущая страница списка плейлистов
+    :ivar playlist: Открытый плейлист (id, name, snapshot_id, total)
+    :ivar track_page: Текущая страница треков открытого плейлиста
+    :ivar loading: Страницы списка плейлистов, загружаемые в фоне
+    """
+    telegram_id: int
+    playlists: dict[int, list[dict]] = field(default_factory=dict)
+    playlists_total: int = 0
+    list_page: int = 0
+    playlist: dict | None = None
+    track_page: int = 0
+    loading: dict[int, asyncio.Task] = field(default_factory=dict)
+
+    def list_pages(self) -> int:
+        """
+        Число страниц списка плейлистов.
+
+        :return: Число страниц
+        :rtype: int
+        """
+        return max(1, -(-self.playlists_total // PLAYLIST_BROWSER_PAGE_SIZE))
+
+    def track_pages(self) -> int:
+        """
+        Число страниц треков открытого плейлиста.
+
+        :return: Число страниц
+        :rtype: int
+        """
+        total = self.playlist["total"] if self.playlist else 0
+        return max(1, -(-total // PLAYLIST_BROWSER_PAGE_SIZE))
+
+
+# Сессии по короткому ключу; срок жизни продлевается при обращении
+_sessions = TTLCache(maxsize=SEARCH_SESSION_CACHE_SIZE, ttl=SEARCH_SESSION_TTL, sliding=True)
+stats_collector.register("playlist_sessions", _sessions.stats)
+
+
+def create_playlist_session(telegram_id: int) -> tuple[str, PlaylistSession]:
+    """
+    Создание сессии просмотра плейлистов.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :return: Короткий ключ для callback_data и сессия
+    :rtype: tuple[str, PlaylistSession]
+    """
+    key = secrets.token_urlsafe(6)
+    while key in _sessions:
+        key = secrets.token_urlsafe(6)
+    session = PlaylistSession(telegram_id=telegram_id)
+    _sessions.set(key, session)
+    return key, session
+
+
+def get_playlist_session(key: str) -> PlaylistSession | None:
+    """
+    Получение сессии просмотра плейлистов по ключу.
+
+    :param key: Ключ сессии
+    :type key: str
+    :return: Сессия или None, если она истекла
+    :rtype: PlaylistSession | None
+    """
+    return _sessions.get(key)
+
+
+def _in_background(load: Callable[[], Awaitable]) -> asyncio.Task:
+    """
+    Запуск загрузки с фоновым приоритетом запросов к Spotify.
+
+    :param load: Корутина-функция загрузки
+    :type load: Callable[[], Awaitable]
+    :return: Задача загрузки
+    :rtype: asyncio.Task
+    """
+    async def run():
+        request_priority.set(PRIORITY_BACKGROUND)
+        return await load()
+
+    def done(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.debug("Не удалось заранее загрузить страницу: %s", task.exception())
+
+    task = asyncio.create_task(run())
+    task.add_done_callback(done)
+    return task
+
+
+async def _fetch_playlists(session: PlaylistSession, user: User, page: int) -> list[dict]:
+    """
+    Загрузка страницы списка плейлистов из Spotify.
+
+    :param session: Сессия
+    :type session: PlaylistSession
+    :param user: Пользователь
+    :type user: User
+    :param page: Номер страницы
+    :type page: int
+    :return: Плейлисты страницы
+    :rtype: list[dict]
+    """
+    result = await call_spotify(user, lambda sp: sp.current_user_playlists(
+        limit=PLAYLIST_BROWSER_PAGE_SIZE, offset=page * PLAYLIST_BROWSER_PAGE_SIZE
+    ))
+    playlists = [
+        {
+            "id": item["id"],
+            "name": item["name"],
+            "snapshot_id": item["snapshot_id"],
+            "total": (item.get("tracks") or {}).get("total", 0),
+        } for item in result["items"] if item
+    ]
+    session.playlists_total = result["total"]
+    session.playlists[page] = playlists
+    return playlists
+
+
+async def load_playlists_page(session: PlaylistSession, user: User, page: int) -> list[dict]:
+    """
+    Страница списка плейлистов из сессии, фоновой загрузки или Spotify.
+
+    :param session: Сессия
+    :type session: PlaylistSession
+    :param user: Пользователь
+    :type user: User
+    :param page: Номер страницы
+    :type page: int
+    :return: Плейлисты страницы
+    :rtype: list[dict]
+    """
+    if page in session.playlists:
+        return session.playlists[page]
+    task = session.loading.get(page)
+    if task is not None:
+        return await asyncio.shield(task)
+    return await _fetch_playlists(session, user, page)
+
+
+def prefetch_playlists_page(session: PlaylistSession, user: User, page: int):
+    """
+    Фоновая загрузка следующей страницы списка плейлистов.
+
+    :param session: Сессия
+    :type session: PlaylistSession
+    :param user: Пользователь
+    :type user: User
+    :param page: Номер страницы
+    :type page: int
+    :return: None
+    """
+    if page in session.playlists or page in session.loading or page >= session.list_pages():
+        return
+    task = _in_background(lambda: _fetch_playlists(session, user, page))
+    session.loading[page] = task
+    task.add_done_callback(lambda _: session.loading.pop(page, None))
+
+
+async def _fetch_track_page(user: User, playlist: dict, page: int) -> list[dict]:
+    """
+    Загрузка страницы треков плейлиста из Spotify в кэш.
+
+    :param user: Пользователь
+    :type user: User
+    :param playlist: Плейлист (id, snapshot_id)
+    :type playlist: dict
+    :param page: Номер страницы
+    :type page: int
+    :return: Треки страницы (подкасты и локальные файлы пропускаются)
+    :rtype: list[dict]
+    """
+    result = await call_spotify(user, lambda sp: sp.playlist_items(
+        playlist["id"], limit=PLAYLIST_BROWSER_PAGE_SIZE, offset=page * PLAYLIST_BROWSER_PAGE_SIZE,
+        market=SPOTIFY_MARKET, fields=PLAYLIST_ITEM_FIELDS,
+    ))
+    tracks = [
+        track_to_dict(item["track"]) for item in result["items"]
+        if item.get("track") and item["track"].get("type") == "track" and item["track"].get("id")
+    ]
+    _track_pages.set((playlist["id"], playlist["snapshot_id"], page), tracks)
+    remember_tracks(tracks)
+    index_tracks(tracks)
+    return tracks
+
+
+async def load_track_page(user: User, playlist: dict, page: int) -> list[dict]:
+    """
+    Страница треков плейлиста из кэша по snapshot_id или из Spotify.
+
+    Одновременные загрузки одной страницы (в том числе фоновая
+    и загрузки разных пользователей) объединяются; интерактивная загрузка
+    не ждёт фоновую.
+
+    :param user: Пользователь
+    :type user: User
+    :param playlist: Плейлист (id, snapshot_id)
+    :type playlist: dict
+    :param page: Номер страницы
+    :type page: int
+    :return: Треки страницы
+    :rtype: list[dict]
+    """
+    key = (playlist["id"], playlist["snapshot_id"], page)
+    tracks = _track_pages.get(key)
+    if tracks is not None:
+        return tracks
+
+    return await _pages_in_flight.run(key, user, lambda owner: _fetch_track_page(owner, playlist, page))
+
+
+def prefetch_track_page(user: User, playlist: dict, page: int):
+    """
+    Фоновая загрузка страницы треков, которую пользователь откроет следующей.
+
+    :param user: Пользователь
+    :type user: User
+    :param playlist: Плейлист (id, snapshot_id, total)
+    :type playlist: dict
+    :param page: Номер страницы
+    :type page: int
+    :return: None
+    """
+    key = (playlist["id"], playlist["snapshot_id"], page)
+    if page * PLAYLIST_BROWSER_PAGE_SIZE >= playlist["total"] or key in _track_pages or key in _pages_in_flight:
+        return
+    _in_background(lambda: load_track_page(user, playlist, page))
+
+
+async def iter_playlist_tracks(user: User, playlist: dict, start: int = 0) -> AsyncIterator[list[dict]]:
+    """
+    Ленивый обход треков плейлиста постранично, начиная с позиции start.
+
+    Каждая страница берётся из кэша или запрашивается, только когда
+    потребитель до неё дошёл.
+
+    :param user: Пользователь
+    :type user: User
+    :param playlist: Плейлист (id, snapshot_id, total)
+    :type playlist: dict
+    :param start: Позиция первого трека
+    :type start: int
+    :return: Асинхронный итератор списков треков
+    :rtype: AsyncIterator[list[dict]]
+    """
+    page, skip = divmod(start, PLAYLIST_BROWSER_PAGE_SIZE)
+    while page * PLAYLIST_BROWSER_PAGE_SIZE < playlist["total"]:
+        tracks = await load_track_page(user, playlist, page)
+        yield tracks[skip:]
+        page, skip = page + 1, 0
+
+
+async def queue_tracks(user: User, playlist: dict, start: int, count: int) -> tuple[int, str]:
+    """
+    Добавление следующих треков плейлиста в очередь воспроизведения.
+
+    Треки читаются пакетами-страницами по мере надобности (из кэша по
+    snapshot_id, если страница уже загружалась). Spotify принимает в
+    очередь один трек за запрос, поэтому внутри пакета треки добавляются
+    последовательно — так сохраняется их порядок.
+
+    :param user: Пользователь
+    :type user: User
+    :param playlist: Плейлист (id, snapshot_id, total)
+    :type playlist: dict
+    :param start: Позиция первого трека
+    :type start: int
+    :param count: Сколько треков добавить
+    :type count: int
+    :return: Кортеж (число добавленных треков, сообщение)
+    :rtype: tuple[int, str]
+    """
+    queued = 0
+    async for tracks in iter_playlist_tracks(user, playlist, start):
+        for track in tracks[:count - queued]:
+            success, message = await add_track_to_queue(user, track["id"])
+            if not success:
+                return queued, f"{message} (добавлено: {queued})" if queued else message
+            queued += 1
+        if queued >= count:
+            break
+
+    if not queued:
+        return 0, "❌ В плейлисте больше нет треков."
+    return queued, f"➕ В очередь добавлено треков: {queued}"
@@ -0,0 +1,205 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextvars import ContextVar
+from typing import Callable
+
+from bot.config import (
+    SPOTIFY_RATE_LIMIT,
+    SPOTIFY_RATE_BURST,
+    SPOTIFY_QUEUE_TIMEOUT,
+    SPOTIFY_BACKGROUND_QUEUE_TIMEOUT,
+)
+from bot.utils.metrics import stats_collector
+
+"""
+Общий для приложения планировщик исходящих запросов к Spotify
+"""
+
+# Приоритеты запросов: меньше — раньше
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Приоритет запросов текущей задачи (фоновые задачи выставляют PRIORITY_BACKGROUND)
+request_priority: ContextVar[int] = ContextVar("request_priority", default=PRIORITY_INTERACTIVE)
+
+# Сообщение пользователю, когда очередь к Spotify переполнена
+BUSY_MESSAGE = "⏳ Spotify сейчас перегружен, попробуйте через несколько секунд."
+
+
+class SpotifyBusyError(Exception):
+    """
+    Запрос не дождался своей очереди к Spotify до истечения срока.
+    """
+
+
+class RateLimiter:
+    """
+    Token bucket с приоритетной очередью и глобальной паузой по Retry-After.
+
+    :ivar rate: Пополнение корзины, запросов в секунду
+    :ivar burst: Ёмкость корзины
+    :ivar timeouts: Максимальное ожидание в очереди по приоритетам
+    :ivar on_pause: Вызывается при паузе по 429 (передаёт паузу другим процессам)
+    """
+
+    def __init__(self, rate: float, burst: int, timeouts: dict[int, float]):
+        self.rate = rate
+        self.burst = burst
+        self.timeouts = timeouts
+        self.on_pause: Callable[[float], None] | None = None
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._worker: asyncio.Task | None = None
+
+        # Статистика
+        self.acquired = 0
+        self.queued = 0
+        self.rejected = 0
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _refill(self, now: float):
+        """
+        Пополнение корзины по прошедшему времени.
+
+        :param now: Текущее время time.monotonic()
+        :type now: float
+        :return: None
+        """
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _delay(self, now: float) -> float:
+        """
+        Время до момента, когда можно отправить следующий запрос.
+
+        :param now: Текущее время time.monotonic()
+        :type now: float
+        :return: Задержка в секундах
+        :rtype: float
+        """
+        self._refill(now)
+        token_delay = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+        return max(self._blocked_until - now, token_delay)
+
+    def _record_wait(self, waited: float):
+        """
+        Учёт времени ожидания в статистике.
+
+        :param waited: Время ожидания в секундах
+        :type waited: float
+        :return: None
+        """
+        self.acquired += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    async def acquire(self, priority: int | None = None):
+        """
+        Ожидание разрешения на запрос к Spotify.
+
+        :param priority: Приоритет запроса (по умолчанию из request_priority)
+        :type priority: int | None
+        :return: None
+        :raises SpotifyBusyError: если очередь не подошла за отведённое время
+        """
+        priority = request_priority.get() if priority is None else priority
+        timeout = self.timeouts.get(priority, SPOTIFY_QUEUE_TIMEOUT)
+        now = time.monotonic()
+
+        # Свободный слот без очереди
+        if not self._queue and self._delay(now) <= 0:
+            self._tokens -= 1
+            self._record_wait(0.0)
+            return
+
+        # Пауза по Retry-After длиннее допустимого ожидания — отказ сразу
+        if self._blocked_until - now > timeout:
+            self.rejected += 1
+            raise SpotifyBusyError("Spotify rate limit")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._counter), future))
+        self.queued += 1
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._dispatch())
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise SpotifyBusyError("Spotify request queue timeout") from None
+        self._record_wait(time.monotonic() - now)
+
+    async def _dispatch(self):
+        """
+        Выдача слотов ожидающим запросам в порядке приоритета.
+
+        :return: None
+        """
+        while self._queue:
+            # Ожидающие, отменённые по таймауту, пропускаются
+            if self._queue[0][2].done():
+                heapq.heappop(self._queue)
+                continue
+
+            delay = self._delay(time.monotonic())
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                self._tokens -= 1
+                future.set_result(None)
+
+    def pause(self, retry_after: float, notify: bool = True):
+        """
+        Глобальная пауза всех запросов после ответа 429.
+
+        :param retry_after: Значение заголовка Retry-After в секундах
+        :type retry_after: float
+        :param notify: Сообщить о паузе через on_pause (False — пауза пришла от другого процесса)
+        :type notify: bool
+        :return: None
+        """
+        self.throttled += 1
+        self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        if notify and self.on_pause is not None:
+            self.on_pause(retry_after)
+
+    def stats(self) -> dict:
+        """
+        Статистика планировщика.
+
+        :return: Глубина очереди, число запросов, отказов и времена ожидания
+        :rtype: dict
+        """
+        return {
+            "queue_depth": sum(1 for _, _, future in self._queue if not future.done()),
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "wait_avg": self.wait_total / self.acquired if self.acquired else 0.0,
+            "wait_max": self.wait_max,
+            "blocked_for": max(0.0, self._blocked_until - time.monotonic()),
+        }
+
+
+# Планировщик всех запросов к Spotify Web API
+limiter = RateLimiter(
+    rate=SPOTIFY_RATE_LIMIT,
+    burst=SPOTIFY_RATE_BURST,
+    timeouts={
+        PRIORITY_INTERACTIVE: SPOTIFY_QUEUE_TIMEOUT,
+        PRIORITY_BACKGROUND: SPOTIFY_BACKGROUND_QUEUE_TIMEOUT,
+    },
+)
+stats_collector.register("spotify_limiter", limiter.stats)
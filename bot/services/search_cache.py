@@ -0,0 +1,119 @@
+from bot.config import SEARCH_CACHE_BACKEND, SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL
+from bot.utils.cache import TTLCache
+
+"""
+Кэш результатов поиска по каталогу Spotify, общий для всех пользователей
+"""
+
+
+def normalize_query(query: str) -> str:
+    """
+    Нормализация поискового запроса: регистр и пробелы.
+
+    :param query: Исходный запрос
+    :type query: str
+    :return: Нормализованный запрос
+    :rtype: str
+    """
+    return " ".join(query.casefold().split())
+
+
+def make_search_key(query: str, market: str | None, limit: int, offset: int = 0) -> str:
+    """
+    Построение ключа кэша для поискового запроса.
+
+    :param query: Поисковый запрос
+    :type query: str
+    :param market: Рынок Spotify
+    :type market: str | None
+    :param limit: Число результатов
+    :type limit: int
+    :param offset: Смещение результатов
+    :type offset: int
+    :return: Строковый ключ, пригодный для внешних хранилищ
+    :rtype: str
+    """
+    return f"search:{market or '-'}:{limit}:{offset}:{normalize_query(query)}"
+
+
+class SearchCacheBackend:
+    """
+    Базовый класс хранилища результатов поиска.
+
+    Методы асинхронные, чтобы наравне с памятью процесса можно было
+    подключить общее хранилище для нескольких процессов бота.
+    """
+
+    async def get(self, key: str) -> list[dict] | None:
+        """
+        Получение результатов по ключу.
+
+        :param key: Ключ запроса
+        :type key: str
+        :return: Список треков или None при промахе
+        :rtype: list[dict] | None
+        """
+        raise NotImplementedError
+
+    async def set(self, key: str, tracks: list[dict]):
+        """
+        Сохранение результатов по ключу.
+
+        :param key: Ключ запроса
+        :type key: str
+        :param tracks: Список треков
+        :type tracks: list[dict]
+        :return: None
+        """
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """
+        Статистика попаданий и промахов.
+
+        :return: Словарь со статистикой
+        :rtype: dict
+        """
+        raise NotImplementedError
+
+
+class MemorySearchCache(SearchCacheBackend):
+    """
+    Хранилище результатов поиска в памяти процесса (TTL + LRU).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> list[dict] | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, tracks: list[dict]):
+        self._cache.set(key, tracks)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+# Доступные бэкенды кэша поиска
+BACKENDS = {
+    "memory": lambda: MemorySearchCache(SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL),
+}
+
+
+def create_search_cache(backend: str = SEARCH_CACHE_BACKEND) -> SearchCacheBackend:
+    """
+    Создание хранилища результатов поиска по имени бэкенда.
+
+    :param backend: Имя бэкенда из BACKENDS
+    :type backend: str
+    :return: Хранилище результатов поиска
+    :rtype: SearchCacheBackend
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд кэша поиска: {backend}")
+    return BACKENDS[backend]()
+
+
+# Общий кэш результатов поиска
+search_cache = create_search_cache()
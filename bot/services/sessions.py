@@ -0,0 +1,181 @@
+import asyncio
+import secrets
+from dataclasses import dataclass, field
+
+from bot.config import SEARCH_PAGE_SIZE, SEARCH_SESSION_CACHE_SIZE, SEARCH_SESSION_TTL
+from bot.database.models import User
+from bot.services.ratelimit import PRIORITY_BACKGROUND, request_priority
+from bot.services.spotify import search_tracks
+from bot.utils.cache import TTLCache
+from bot.utils.logger import logger
+from bot.utils.metrics import stats_collector
+
+"""
+Серверное хранилище состояния поисковых сообщений для callback-кнопок
+"""
+
+# Spotify не отдаёт результаты поиска дальше этого смещения
+SEARCH_MAX_OFFSET = 1000
+
+
+@dataclass
+class SearchSession:
+    """
+    Состояние одного сообщения с результатами поиска.
+
+    :ivar telegram_id: ID пользователя, выполнившего поиск
+    :ivar query: Поисковый запрос
+    :ivar pages: Загруженные страницы результатов по номеру
+    :ivar page: Текущая страница результатов
+    :ivar loading: Страницы, загружаемые в фоне
+    :ivar local_pages: Страницы, показанные из локального индекса вместо Spotify
+    """
+    telegram_id: int
+    query: str
+    pages: dict[int, list[dict]] = field(default_factory=dict)
+    page: int = 0
+    loading: dict[int, asyncio.Task] = field(default_factory=dict)
+    local_pages: set[int] = field(default_factory=set)
+
+    @property
+    def tracks(self) -> list[dict]:
+        """
+        Треки текущей страницы.
+
+        :return: Список треков
+        :rtype: list[dict]
+        """
+        return self.pages.get(self.page, [])
+
+    def has_next(self) -> bool:
+        """
+        Возможна ли следующая страница.
+
+        :return: True, если текущая страница заполнена и не последняя в Spotify
+        :rtype: bool
+        """
+        return (
+            len(self.tracks) == SEARCH_PAGE_SIZE
+            and (self.page + 1) * SEARCH_PAGE_SIZE < SEARCH_MAX_OFFSET
+            and self.pages.get(self.page + 1) != []
+        )
+
+
+# Сессии по короткому ключу; срок жизни продлевается при обращении
+_sessions = TTLCache(maxsize=SEARCH_SESSION_CACHE_SIZE, ttl=SEARCH_SESSION_TTL, sliding=True)
+stats_collector.register("search_sessions", _sessions.stats)
+
+
+def create_session(telegram_id: int, query: str, tracks: list[dict], local: bool = False) -> str:
+    """
+    Создание сессии поиска.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :param query: Поисковый запрос
+    :type query: str
+    :param tracks: Треки первой страницы
+    :type tracks: list[dict]
+    :param local: Первая страница получена из локального индекса
+    :type local: bool
+    :return: Короткий ключ сессии для callback_data
+    :rtype: str
+    """
+    key = secrets.token_urlsafe(6)
+    while key in _sessions:
+        key = secrets.token_urlsafe(6)
+    session = SearchSession(telegram_id=telegram_id, query=query, pages={0: tracks})
+    if local:
+        session.local_pages.add(0)
+    _sessions.set(key, session)
+    return key
+
+
+def get_session(key: str) -> SearchSession | None:
+    """
+    Получение сессии поиска по ключу.
+
+    :param key: Ключ сессии
+    :type key: str
+    :return: Сессия или None, если она истекла
+    :rtype: SearchSession | None
+    """
+    return _sessions.get(key)
+
+
+async def load_page(session: SearchSession, user: User, page: int) -> list[dict]:
+    """
+    Получение страницы результатов из сессии или поиском.
+
+    Если эта страница уже загружается в фоне, ожидается её загрузка,
+    поэтому лишнего запроса к Spotify не возникает. Страница, показанная
+    из локального индекса, при следующем показе запрашивается заново
+    (обычно к этому времени ответ Spotify уже в кэше поиска).
+
+    :param session: Сессия поиска
+    :type session: SearchSession
+    :param user: Пользователь
+    :type user: User
+    :param page: Номер страницы
+    :type page: int
+    :return: Треки страницы (пустой список, если результатов больше нет)
+    :rtype: list[dict]
+    """
+    if page in session.pages and page not in session.local_pages:
+        return session.pages[page]
+    if page * SEARCH_PAGE_SIZE >= SEARCH_MAX_OFFSET:
+        return []
+
+    # Ожидание фоновой загрузки (asyncio.wait не отменяет её при отмене нажатия).
+    # Если она не удалась или ответ пришёл из индекса, страница запрашивается заново
+    task = session.loading.get(page)
+    if task is not None:
+        await asyncio.wait({task})
+        if page in session.pages and page not in session.local_pages:
+            return session.pages[page]
+
+    tracks, local = await search_tracks(user, session.query, SEARCH_PAGE_SIZE, page * SEARCH_PAGE_SIZE)
+    session.pages[page] = tracks
+    if local:
+        session.local_pages.add(page)
+    else:
+        session.local_pages.discard(page)
+    return tracks
+
+
+def prefetch_page(session: SearchSession, user: User, page: int):
+    """
+    Фоновая загрузка страницы, которую пользователь, скорее всего, откроет следующей.
+
+    Запросы идут с фоновым приоритетом и не задерживают действия пользователей.
+
+    :param session: Сессия поиска
+    :type session: SearchSession
+    :param user: Пользователь
+    :type user: User
+    :param page: Номер страницы
+    :type page: int
+    :return: None
+    """
+    if page in session.pages or page in session.loading or page * SEARCH_PAGE_SIZE >= SEARCH_MAX_OFFSET:
+        return
+
+    async def prefetch():
+        request_priority.set(PRIORITY_BACKGROUND)
+        return await search_tracks(user, session.query, SEARCH_PAGE_SIZE, page * SEARCH_PAGE_SIZE)
+
+    def store(task: asyncio.Task):
+        session.loading.pop(page, None)
+        if task.cancelled():
+            return
+        if task.exception():
+            logger.debug("Не удалось заранее загрузить страницу поиска: %s", task.exception())
+            return
+        # Ответ локального индекса не сохраняется: страница загрузится при показе
+        tracks, local = task.result()
+        if not local:
+            session.pages[page] = tracks
+
+    task = asyncio.create_task(prefetch())
+    session.loading[page] = task
+    task.add_done_callback(store)
@@ -1,28 +1,124 @@
-import spotipy
-from spotipy import Spotify
-from spotipy.oauth2 import SpotifyOAuth
+import asyncio
+from datetime import timedelta
+from typing import AsyncIterator, Awaitable, Callable, TypeVar
+
+import aiohttp
+from tortoise import timezone
+
 from bot.config import (
-    SPOTIFY_CLIENT_ID,
-    SPOTIFY_CLIENT_SECRET,
-    SPOTIFY_REDIRECT_URI,
-    SOCKS5_PROXY
+    DEVICE_CACHE_TTL,
+    LIKE_BATCH_WINDOW,
+    SAVED_STATE_TTL,
+    SEARCH_LATENCY_BUDGET,
+    SEARCH_PAGE_SIZE,
+    SPOTIFY_CLIENT_CACHE_SIZE,
+    SPOTIFY_CLIENT_IDLE_TTL,
+    SPOTIFY_MARKET,
 )
 from bot.database.models import User
+from bot.services import spotify_api
+from bot.services.batching import UserBatcher
+from bot.services.coalescing import SharedRequests
+from bot.services.ratelimit import BUSY_MESSAGE, SpotifyBusyError
+from bot.services.search_cache import make_search_key, search_cache
+from bot.services.track_index import index_tracks, search_local
+from bot.services.tracks import (
+    TRACKS_BATCH_SIZE,
+    get_cached_track,
+    track_cache,
+    remember_tracks,
+    track_to_dict,
+)
+from bot.services.users import invalidate_user, store_user
+from bot.services.spotify_api import SpotifyAPIError, SpotifyClient
 from tortoise.transactions import in_transaction
+from bot.utils.cache import TTLCache
 from bot.utils.logger import logger
+from bot.utils.metrics import register_counters, stats_collector
 
-# Настройка OAuth для Spotify
-oauth = SpotifyOAuth(
-    client_id=SPOTIFY_CLIENT_ID,
-    client_secret=SPOTIFY_CLIENT_SECRET,
-    redirect_uri=SPOTIFY_REDIRECT_URI,
-    scope=(
-        "user-library-read user-library-modify "
-        "user-read-playback-state user-modify-playback-state "
-        "playlist-read-private playlist-read-collaborative"
-    ),
-    proxies={"http": SOCKS5_PROXY, "https": SOCKS5_PROXY}
-)
+T = TypeVar("T")
+
+
+# Реестр клиентов Spotify по telegram_id с вытеснением по LRU и простою
+_clients = TTLCache(maxsize=SPOTIFY_CLIENT_CACHE_SIZE, ttl=SPOTIFY_CLIENT_IDLE_TTL, sliding=True)
+
+# Списки устройств пользователей по telegram_id
+_devices = TTLCache(maxsize=SPOTIFY_CLIENT_CACHE_SIZE, ttl=DEVICE_CACHE_TTL)
+
+# Признаки «в избранном» по (telegram_id, track_id)
+_saved = TTLCache(maxsize=SPOTIFY_CLIENT_CACHE_SIZE * 50, ttl=SAVED_STATE_TTL)
+
+# Текущие запросы поиска по ключу кэша (общие для всех пользователей)
+_search_in_flight: SharedRequests[list[dict]] = SharedRequests()
+
+# Текущие обновления токенов по telegram_id
+_refresh_in_flight: dict[int, asyncio.Task] = {}
+
+# Счётчики обновлений: попытки, объединённые ожидания и ошибки
+refresh_stats = {"attempts": 0, "coalesced": 0, "failures": 0}
+
+# Ответы на поиск из локального индекса: вместо Spotify, по истечении бюджета ожидания, при ошибке
+local_search_stats = {"local_first": 0, "latency_budget": 0, "error": 0}
+
+# Экспорт статистики в /metrics
+register_counters("spotify_token_refresh", "Обновления токенов Spotify", refresh_stats)
+register_counters("search_local_answers", "Ответы на поиск из локального индекса", local_search_stats)
+stats_collector.register("client_registry", _clients.stats)
+stats_collector.register("device_cache", _devices.stats)
+stats_collector.register("saved_cache", _saved.stats)
+stats_collector.register("search_cache", search_cache.stats)
+stats_collector.register("search_in_flight", _search_in_flight.stats)
+stats_collector.register("track_cache", track_cache.stats)
+
+# Запас времени до истечения токена, при котором он обновляется заранее
+TOKEN_REFRESH_MARGIN = timedelta(seconds=60)
+
+
+def _apply_token_info(user: User, token_info: dict):
+    """
+    Запись полученных от Spotify токенов и срока их действия в пользователя.
+
+    :param user: Объект пользователя
+    :type user: User
+    :param token_info: Ответ эндпоинта токенов Spotify
+    :type token_info: dict
+    :return: None
+    """
+    user.spotify_access_token = token_info["access_token"]
+    if token_info.get("refresh_token"):
+        user.spotify_refresh_token = token_info["refresh_token"]
+    user.spotify_token_expires_at = timezone.now() + timedelta(seconds=int(token_info.get("expires_in", 3600)))
+
+
+def _token_expiring(user: User) -> bool:
+    """
+    Проверка, что токен пользователя истёк или скоро истечёт.
+
+    :param user: Объект пользователя
+    :type user: User
+    :return: True, если токен пора обновить
+    :rtype: bool
+    """
+    expires_at = user.spotify_token_expires_at
+    # Для старых записей срок неизвестен — полагаемся на повтор после 401
+    if expires_at is None:
+        return False
+    if timezone.is_naive(expires_at):
+        expires_at = timezone.make_aware(expires_at)
+    return expires_at - TOKEN_REFRESH_MARGIN <= timezone.now()
+
+
+def _update_client(user: User):
+    """
+    Обновление токена в клиенте из реестра без пересоздания клиента.
+
+    :param user: Пользователь с актуальным токеном
+    :type user: User
+    :return: None
+    """
+    client = _clients.get(user.telegram_id)
+    if client is not None:
+        client.access_token = user.spotify_access_token
 
 
 async def exchange_code_for_token(code: str, telegram_id: int):
@@ -35,94 +131,310 @@ async def exchange_code_for_token(code: str, telegram_id: int):
     :type telegram_id: int
     :return: None
     """
-    token_info = oauth.get_access_token(code, as_dict=True)
-    access_token = token_info["access_token"]
-    refresh_token = token_info["refresh_token"]
+    token_info = await spotify_api.exchange_code(code)
 
     # Сохранение токенов в БД
     async with in_transaction():
         user, _ = await User.get_or_create(telegram_id=telegram_id)
-        user.spotify_access_token = access_token
-        user.spotify_refresh_token = refresh_token
+        _apply_token_info(user, token_info)
         await user.save()
 
+    # Новый объект пользователя заменяет закэшированный
+    store_user(user)
+    _update_client(user)
 
-async def refresh_user_token(user: User) -> str | None:
+
+def _copy_tokens(source: User, target: User):
     """
-    Обновление токена Spotify для пользователя.
+    Копирование токенов и срока их действия между объектами пользователя.
+
+    :param source: Пользователь с актуальными токенами
+    :type source: User
+    :param target: Пользователь, которого нужно обновить
+    :type target: User
+    :return: None
+    """
+    target.spotify_access_token = source.spotify_access_token
+    target.spotify_refresh_token = source.spotify_refresh_token
+    target.spotify_token_expires_at = source.spotify_token_expires_at
+
+
+async def _refresh_token(user: User) -> User | None:
+    """
+    Обновление токена в Spotify и сохранение в БД (одна попытка).
 
     :param user: Объект пользователя
     :type user: User
-    :return: Новый access_token или None при ошибке
-    :rtype: str | None
+    :return: Пользователь с новыми токенами или None при ошибке
+    :rtype: User | None
     """
+    refresh_stats["attempts"] += 1
     try:
-        token_info = oauth.refresh_access_token(user.spotify_refresh_token)
-        access_token = token_info["access_token"]
+        # Токен мог уже обновить другой обработчик со своим объектом пользователя
+        stored = await User.get_or_none(telegram_id=user.telegram_id)
+        if stored and stored.spotify_access_token != user.spotify_access_token and not _token_expiring(stored):
+            return stored
+
+        stored = stored or user
+        token_info = await spotify_api.refresh_access_token(stored.spotify_refresh_token)
 
         # Обновление токенов в БД
         async with in_transaction():
-            user.spotify_access_token = access_token
-            if "refresh_token" in token_info:
-                user.spotify_refresh_token = token_info["refresh_token"]
-            await user.save()
+            _apply_token_info(stored, token_info)
+            await stored.save()
 
-        return access_token
+        return stored
     except Exception as e:
-        logger.error(f"Ошибка обновления токена: {e}")
+        refresh_stats["failures"] += 1
+        logger.error("Ошибка обновления токена: %s", e)
+        return None
+
+
+async def refresh_user_token(user: User) -> str | None:
+    """
+    Обновление токена Spotify для пользователя.
+
+    Одновременные вызовы для одного telegram_id объединяются:
+    в Spotify уходит один запрос, а все ожидающие получают его результат.
+
+    :param user: Объект пользователя
+    :type user: User
+    :return: Новый access_token или None при ошибке
+    :rtype: str | None
+    """
+    telegram_id = user.telegram_id
+    task = _refresh_in_flight.get(telegram_id)
+    if task is None:
+        task = asyncio.create_task(_refresh_token(user))
+        _refresh_in_flight[telegram_id] = task
+        task.add_done_callback(lambda _: _refresh_in_flight.pop(telegram_id, None))
+    else:
+        refresh_stats["coalesced"] += 1
+
+    # shield: отмена одного обработчика не должна прерывать общее обновление
+    refreshed = await asyncio.shield(task)
+    if refreshed is None:
+        # Токены в БД могли измениться в другом процессе — перечитаем при следующем обращении
+        invalidate_user(telegram_id)
         return None
 
+    if refreshed is not user:
+        _copy_tokens(refreshed, user)
+    _update_client(user)
+    return user.spotify_access_token
+
 
-async def get_spotify_client(user: User) -> Spotify:
+async def get_spotify_client(user: User) -> SpotifyClient:
     """
-    Получение клиента Spotify с проверкой токена.
+    Получение клиента Spotify из реестра с заблаговременным обновлением токена.
+
+    Токен обновляется, если до истечения срока осталось меньше
+    TOKEN_REFRESH_MARGIN; отдельный проверочный запрос не выполняется.
 
     :param user: Объект пользователя
     :type user: User
-    :return: Объект Spotify
-    :rtype: Spotify
+    :return: Клиент Spotify
+    :rtype: SpotifyClient
+    """
+    if _token_expiring(user):
+        await refresh_user_token(user)
+
+    client = _clients.get(user.telegram_id)
+    if client is None:
+        client = SpotifyClient(user.spotify_access_token)
+        _clients.set(user.telegram_id, client)
+    elif client.access_token != user.spotify_access_token:
+        client.access_token = user.spotify_access_token
+    return client
+
+
+async def call_spotify(user: User, operation: Callable[[SpotifyClient], Awaitable[T]]) -> T:
     """
-    sp = spotipy.Spotify(auth=user.spotify_access_token, proxies={"http": SOCKS5_PROXY, "https": SOCKS5_PROXY})
+    Выполнение операции Spotify с одним повтором после 401.
 
-    # Проверка валидности токена
+    :param user: Объект пользователя
+    :type user: User
+    :param operation: Корутина-функция, принимающая клиент Spotify
+    :type operation: Callable[[SpotifyClient], Awaitable[T]]
+    :return: Результат операции
+    :rtype: T
+    """
+    sp = await get_spotify_client(user)
     try:
-        sp.current_user()
-    except spotipy.exceptions.SpotifyException as e:
-        if e.http_status == 401:
-            new_token = await refresh_user_token(user)
-            if not new_token:
-                raise e
-            sp = spotipy.Spotify(auth=new_token, proxies={"http": SOCKS5_PROXY, "https": SOCKS5_PROXY})
-        else:
-            raise e
+        return await operation(sp)
+    except SpotifyAPIError as e:
+        if e.status != 401:
+            raise
+
+        # Токен отозван или истёк раньше срока — обновляем и повторяем один раз
+        if not await refresh_user_token(user):
+            raise
+        return await operation(sp)
+
+
+async def iter_pages(user: User, fetch: Callable[[SpotifyClient, int], Awaitable[dict]],
+                     offset: int = 0) -> AsyncIterator[dict]:
+    """
+    Постраничный обход списка Spotify (paging object).
+
+    Следующая страница запрашивается только когда потребитель дошёл
+    до неё, поэтому в памяти одновременно находится одна страница,
+    а прерванный обход не тратит лишних запросов.
 
-    return sp
+    :param user: Пользователь
+    :type user: User
+    :param fetch: Корутина-функция (клиент, смещение) -> страница
+    :type fetch: Callable[[SpotifyClient, int], Awaitable[dict]]
+    :param offset: Смещение первой страницы
+    :type offset: int
+    :return: Асинхронный итератор страниц
+    :rtype: AsyncIterator[dict]
+    """
+    while True:
+        page = await call_spotify(user, lambda sp: fetch(sp, offset))
+        yield page
+        if not page.get("next") or not page["items"]:
+            return
+        offset += len(page["items"])
 
 
-async def search_tracks(user: User, query: str) -> list[dict]:
+async def _fetch_search(user: User, query: str, limit: int, offset: int) -> list[dict]:
     """
-    Поиск треков в Spotify.
+    Поиск треков непосредственно в Spotify.
 
     :param user: Пользователь
     :type user: User
     :param query: Строка поиска
     :type query: str
+    :param limit: Число результатов
+    :type limit: int
+    :param offset: Смещение первого результата
+    :type offset: int
     :return: Список словарей с информацией о треках
     :rtype: list[dict]
     """
-    sp = await get_spotify_client(user)
-    result = sp.search(q=query, type="track", limit=5)
+    result = await call_spotify(
+        user, lambda sp: sp.search(q=query, type="track", limit=limit, offset=offset, market=SPOTIFY_MARKET)
+    )
 
     # Формирование списка треков
-    return [
-        {
-            "id": item["id"],
-            "name": item["name"],
-            "artist": item["artists"][0]["name"],
-            "spotify_url": item["external_urls"]["spotify"]
-        }
-        for item in result["tracks"]["items"]
-    ]
+    return [track_to_dict(item) for item in result["tracks"]["items"]]
+
+
+async def _fetch_and_cache(user: User, key: str, query: str, limit: int, offset: int) -> list[dict]:
+    """
+    Поиск в Spotify с записью результата в кэш и локальный индекс.
+
+    Выполняется отдельной задачей, поэтому результат сохраняется, даже
+    если пользователю уже ответили из локального индекса.
+
+    :return: Список словарей с информацией о треках
+    :rtype: list[dict]
+    """
+    tracks = await _fetch_search(user, query, limit, offset)
+    await search_cache.set(key, tracks)
+    remember_tracks(tracks)
+    index_tracks(tracks)
+    return tracks
+
+
+async def search_tracks(user: User, query: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0,
+                        local_first: bool = False) -> tuple[list[dict], bool]:
+    """
+    Поиск треков с общим кэшем результатов и локальным индексом.
+
+    Результаты не зависят от пользователя, поэтому кэшируются по
+    нормализованному запросу, рынку, лимиту и смещению. Одинаковые
+    одновременные промахи объединяются в один запрос к Spotify; если он
+    выполнялся чужим токеном и не прошёл авторизацию, поиск повторяется
+    своим, а интерактивный поиск не ждёт фоновую загрузку той же страницы.
+    Если Spotify не ответил за SEARCH_LATENCY_BUDGET или вернул ошибку,
+    ответ берётся из локального индекса (когда там что-то нашлось).
+    Порядок и страницы индекса не совпадают со Spotify, поэтому такой
+    ответ помечается, чтобы его не сохраняли как страницу результатов.
+
+    :param user: Пользователь
+    :type user: User
+    :param query: Строка поиска
+    :type query: str
+    :param limit: Число результатов
+    :type limit: int
+    :param offset: Смещение первого результата
+    :type offset: int
+    :param local_first: Полная страница из локального индекса возвращается без запроса к Spotify
+    :type local_first: bool
+    :return: Кортеж (список словарей с информацией о треках, ответ из локального индекса)
+    :rtype: tuple[list[dict], bool]
+    """
+    key = make_search_key(query, SPOTIFY_MARKET, limit, offset)
+    tracks = await search_cache.get(key)
+    if tracks is not None:
+        remember_tracks(tracks)
+        return tracks, False
+
+    if local_first:
+        tracks = await search_local(query, limit, offset)
+        if len(tracks) == limit:
+            local_search_stats["local_first"] += 1
+            return tracks, True
+
+    def fetch(owner: User) -> Awaitable[list[dict]]:
+        return _fetch_and_cache(owner, key, query, limit, offset)
+
+    request = _search_in_flight.join(key, user, fetch)
+
+    # Spotify не уложился в бюджет — ответ из индекса, если он что-то знает
+    done, _ = await asyncio.wait({request.task}, timeout=SEARCH_LATENCY_BUDGET)
+    if not done:
+        tracks = await search_local(query, limit, offset)
+        if tracks:
+            local_search_stats["latency_budget"] += 1
+            return tracks, True
+
+    try:
+        return await _search_in_flight.result(request, user, fetch), False
+    except (SpotifyBusyError, SpotifyAPIError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+        tracks = await search_local(query, limit, offset)
+        if not tracks:
+            raise
+        logger.warning("Поиск в Spotify не удался, ответ из локального индекса: %s", e)
+        local_search_stats["error"] += 1
+        return tracks, True
+
+
+async def get_tracks_info(user: User, track_ids: list[str]) -> dict[str, dict]:
+    """
+    Получение информации о нескольких треках.
+
+    Сначала используется хранилище метаданных; недостающие треки
+    запрашиваются пачками по TRACKS_BATCH_SIZE за один запрос.
+
+    :param user: Пользователь
+    :type user: User
+    :param track_ids: Список ID треков
+    :type track_ids: list[str]
+    :return: Словарь ID -> информация о треке (только найденные)
+    :rtype: dict[str, dict]
+    """
+    found = {}
+    missing = []
+    for track_id in dict.fromkeys(track_ids):
+        track = get_cached_track(track_id)
+        if track is not None:
+            found[track_id] = track
+        else:
+            missing.append(track_id)
+
+    # Запрос недостающих треков пачками
+    for start in range(0, len(missing), TRACKS_BATCH_SIZE):
+        batch = missing[start:start + TRACKS_BATCH_SIZE]
+        result = await call_spotify(user, lambda sp: sp.tracks(batch, market=SPOTIFY_MARKET))
+        tracks = [track_to_dict(item) for item in result["tracks"] if item]
+        remember_tracks(tracks)
+        index_tracks(tracks)
+        found.update((track["id"], track) for track in tracks)
+
+    return found
 
 
 async def get_track_info(user: User, track_id: str) -> dict | None:
@@ -137,23 +449,86 @@ async def get_track_info(user: User, track_id: str) -> dict | None:
     :rtype: dict | None
     """
     try:
-        sp = await get_spotify_client(user)
-        track = sp.track(track_id)
-        return {
-            "id": track["id"],
-            "name": track["name"],
-            "artist": track["artists"][0]["name"],
-            "spotify_url": track["external_urls"]["spotify"]
-        }
+        return (await get_tracks_info(user, [track_id])).get(track_id)
     except Exception as e:
-        logger.info(f"Error fetching track info: {e}")
+        logger.info("Error fetching track info: %s", e)
         return None
 
 
+async def get_devices(user: User, sp: SpotifyClient) -> list[dict]:
+    """
+    Получение списка устройств пользователя с кэшированием на DEVICE_CACHE_TTL.
+
+    :param user: Пользователь
+    :type user: User
+    :param sp: Клиент Spotify
+    :type sp: SpotifyClient
+    :return: Список устройств Spotify
+    :rtype: list[dict]
+    """
+    devices = _devices.get(user.telegram_id)
+    if devices is None:
+        devices = (await sp.devices())["devices"]
+        _devices.set(user.telegram_id, devices)
+    return devices
+
+
+def _pick_device(user: User, devices: list[dict]) -> str:
+    """
+    Выбор устройства: активное, затем предпочитаемое, затем первое.
+
+    :param user: Пользователь
+    :type user: User
+    :param devices: Список устройств Spotify
+    :type devices: list[dict]
+    :return: ID устройства
+    :rtype: str
+    """
+    for device in devices:
+        if device.get("is_active"):
+            return device["id"]
+    for device in devices:
+        if device["id"] == user.spotify_device_id:
+            return device["id"]
+    return devices[0]["id"]
+
+
+async def _set_preferred_device(user: User, device_id: str | None):
+    """
+    Сохранение предпочитаемого устройства (запись в БД только при изменении).
+
+    :param user: Пользователь
+    :type user: User
+    :param device_id: ID устройства или None, чтобы забыть устройство
+    :type device_id: str | None
+    :return: None
+    """
+    if user.spotify_device_id != device_id:
+        user.spotify_device_id = device_id
+        await user.save(update_fields=["spotify_device_id"])
+
+
+async def _forget_device(user: User):
+    """
+    Сброс кэша устройств и предпочитаемого устройства, когда Spotify его не находит.
+
+    :param user: Пользователь
+    :type user: User
+    :return: None
+    """
+    _devices.pop(user.telegram_id)
+    await _set_preferred_device(user, None)
+
+
 async def play_track(user: User, track_id: str) -> tuple[bool, str]:
     """
     Воспроизведение трека на устройстве пользователя.
 
+    Предпочтение отдаётся активному устройству: по кэшу списка устройств,
+    а если кэша нет — запуском без device_id (Spotify выбирает активное
+    устройство сам). Запомненное устройство используется, только когда
+    активного нет, и в обоих случаях запуск обычно занимает один запрос.
+
     :param user: Пользователь
     :type user: User
     :param track_id: ID трека
@@ -161,43 +536,126 @@ async def play_track(user: User, track_id: str) -> tuple[bool, str]:
     :return: Кортеж (успех, сообщение)
     :rtype: tuple[bool, str]
     """
-    try:
-        sp = await get_spotify_client(user)
-        devices = sp.devices()
+    uris = [f"spotify:track:{track_id}"]
+
+    async def start(sp: SpotifyClient) -> bool:
+        cached = _devices.get(user.telegram_id)
+        active = next((device["id"] for device in cached or [] if device.get("is_active")), None)
+        if active or cached is None:
+            try:
+                # Без device_id воспроизведение начинается на активном устройстве
+                await sp.start_playback(device_id=active, uris=uris)
+                if active:
+                    await _set_preferred_device(user, active)
+                return True
+            except SpotifyAPIError as e:
+                # Активного устройства нет (или оно пропало)
+                if e.status != 404:
+                    raise
+                _devices.pop(user.telegram_id)
+
+        if user.spotify_device_id:
+            try:
+                await sp.start_playback(device_id=user.spotify_device_id, uris=uris)
+                return True
+            except SpotifyAPIError as e:
+                # Устройство пропало — выбираем заново по актуальному списку
+                if e.status != 404:
+                    raise
+                await _forget_device(user)
+
+        devices = await get_devices(user, sp)
 
         # Проверка наличия активного устройства
-        if not devices["devices"]:
-            return False, "❌ Нет активного устройства Spotify."
+        if not devices:
+            return False
+
+        device_id = _pick_device(user, devices)
+        try:
+            await sp.start_playback(device_id=device_id, uris=uris)
+        except SpotifyAPIError as e:
+            if e.status == 404:
+                _devices.pop(user.telegram_id)
+            raise
+        await _set_preferred_device(user, device_id)
+        return True
 
-        device_id = devices["devices"][0]["id"]
-        sp.start_playback(device_id=device_id, uris=[f"spotify:track:{track_id}"])
+    try:
+        if not await call_spotify(user, start):
+            return False, "❌ Нет активного устройства Spotify."
         return True, "▶️ Воспроизведение началось!"
-    except spotipy.exceptions.SpotifyException as e:
-        logger.error(f"SpotifyException: {e}")
+    except SpotifyBusyError:
+        return False, BUSY_MESSAGE
+    except SpotifyAPIError as e:
+        logger.error("SpotifyAPIError: %s", e)
         return False, "❌ Ошибка при воспроизведении (возможно, нет Premium?)"
     except Exception as e:
-        logger.error(f"Error playing track: {e}")
+        logger.error("Error playing track: %s", e)
         return False, "❌ Ошибка при воспроизведении."
 
 
-async def like_track(user: User, track_id: str) -> bool:
+async def _save_tracks(user: User, track_ids: list[str]) -> dict[str, bool]:
+    """
+    Добавление пакета треков в избранное одним запросом.
+
+    :param user: Пользователь
+    :type user: User
+    :param track_ids: ID треков (до TRACKS_BATCH_SIZE)
+    :type track_ids: list[str]
+    :return: Словарь ID -> True
+    :rtype: dict[str, bool]
+    """
+    await call_spotify(user, lambda sp: sp.current_user_saved_tracks_add(track_ids))
+    for track_id in track_ids:
+        _saved.set((user.telegram_id, track_id), True)
+    return dict.fromkeys(track_ids, True)
+
+
+# Пакетная запись лайков по пользователю
+_likes = UserBatcher(_save_tracks, window=LIKE_BATCH_WINDOW, max_batch=TRACKS_BATCH_SIZE)
+stats_collector.register("like_batcher", _likes.stats)
+
+
+def cached_saved_flags(user: User, track_ids: list[str]) -> dict[str, bool]:
+    """
+    Признаки «в избранном», уже известные из кэша, без запросов к Spotify.
+
+    :param user: Пользователь
+    :type user: User
+    :param track_ids: Список ID треков
+    :type track_ids: list[str]
+    :return: Словарь ID -> признак только для известных треков
+    :rtype: dict[str, bool]
+    """
+    result = {}
+    for track_id in track_ids:
+        saved = _saved.get((user.telegram_id, track_id))
+        if saved is not None:
+            result[track_id] = saved
+    return result
+
+
+async def like_track(user: User, track_id: str) -> tuple[bool, str]:
     """
     Добавление трека в избранное пользователя.
 
+    Лайки за короткое окно объединяются в один запрос к Spotify.
+
     :param user: Пользователь
     :type user: User
     :param track_id: ID трека
     :type track_id: str
-    :return: True при успехе, False при ошибке
-    :rtype: bool
+    :return: Кортеж (успех, сообщение)
+    :rtype: tuple[bool, str]
     """
     try:
-        sp = await get_spotify_client(user)
-        sp.current_user_saved_tracks_add([track_id])
-        return True
+        await _likes.submit(user, track_id)
+        return True, "❤️ Добавлено в избранное!"
+    except SpotifyBusyError:
+        return False, BUSY_MESSAGE
     except Exception as e:
-        logger.error(f"Error liking track: {e}")
-        return False
+        logger.error("Error liking track: %s", e)
+        return False, "❌ Ошибка при добавлении"
 
 
 async def add_track_to_queue(user: User, track_id: str) -> tuple[bool, str]:
@@ -212,17 +670,17 @@ async def add_track_to_queue(user: User, track_id: str) -> tuple[bool, str]:
     :rtype: tuple[bool, str]
     """
     try:
-        sp = await get_spotify_client(user)
-        devices = sp.devices()
-
-        if not devices["devices"]:
-            return False, "❌ Нет активного устройства Spotify."
-
-        sp.add_to_queue(uri=f"spotify:track:{track_id}")
+        # Очередь относится к активному устройству, список устройств не нужен
+        await call_spotify(user, lambda sp: sp.add_to_queue(uri=f"spotify:track:{track_id}"))
         return True, "➕ Трек добавлен в очередь!"
-    except spotipy.exceptions.SpotifyException as e:
-        logger.error(f"SpotifyException: {e}")
+    except SpotifyBusyError:
+        return False, BUSY_MESSAGE
+    except SpotifyAPIError as e:
+        if e.status == 404:
+            _devices.pop(user.telegram_id)
+            return False, "❌ Нет активного устройства Spotify."
+        logger.error("SpotifyAPIError: %s", e)
         return False, "❌ Ошибка при добавлении в очередь (возможно, нет Premium?)"
     except Exception as e:
-        logger.error(f"Error adding to queue: {e}")
+        logger.error("Error adding to queue: %s", e)
         return False, "❌ Ошибка при добавлении в очередь."
@@ -0,0 +1,396 @@
+import asyncio
+import json
+import math
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import aiohttp
+from aiohttp import BasicAuth, ClientSession, ClientTimeout, TCPConnector
+
+from bot.config import (
+    SPOTIFY_CLIENT_ID,
+    SPOTIFY_CLIENT_SECRET,
+    SPOTIFY_REDIRECT_URI,
+    SPOTIFY_API_URL,
+    SPOTIFY_ACCOUNTS_URL,
+    SPOTIFY_HTTP_POOL_SIZE,
+    SPOTIFY_HTTP_TIMEOUT,
+    SOCKS5_PROXY,
+)
+from bot.services.ratelimit import SpotifyBusyError, limiter
+from bot.utils.metrics import endpoint_label, observe_spotify_request
+
+"""
+Асинхронный клиент Spotify Web API на общей сессии aiohttp
+"""
+
+# Число повторов запроса после ответа 429
+RATE_LIMIT_RETRIES = 1
+
+# Пауза после 429 без понятного Retry-After (сек.)
+DEFAULT_RETRY_AFTER = 1.0
+
+# Общая HTTP-сессия с пулом keep-alive соединений
+_session: ClientSession | None = None
+
+
+class SpotifyAPIError(Exception):
+    """
+    Ошибка ответа Spotify Web API.
+
+    :ivar status: HTTP-статус ответа
+    :ivar message: Текст ошибки от Spotify
+    :ivar reason: Машинный код причины (например, NO_ACTIVE_DEVICE)
+    """
+
+    def __init__(self, status: int, message: str, reason: str | None = None):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+        self.reason = reason
+
+
+def _make_connector() -> aiohttp.BaseConnector:
+    """
+    Создание коннектора с пулом соединений и поддержкой SOCKS5-прокси.
+
+    :return: Коннектор aiohttp
+    :rtype: aiohttp.BaseConnector
+    """
+    if SOCKS5_PROXY:
+        from aiohttp_socks import ProxyConnector
+
+        return ProxyConnector.from_url(SOCKS5_PROXY, limit=SPOTIFY_HTTP_POOL_SIZE, keepalive_timeout=60)
+    return TCPConnector(limit=SPOTIFY_HTTP_POOL_SIZE, keepalive_timeout=60)
+
+
+async def get_session() -> ClientSession:
+    """
+    Получение общей HTTP-сессии (создаётся при первом обращении).
+
+    :return: Сессия aiohttp
+    :rtype: ClientSession
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = ClientSession(
+            connector=_make_connector(),
+            timeout=ClientTimeout(total=SPOTIFY_HTTP_TIMEOUT),
+        )
+    return _session
+
+
+async def close_session():
+    """
+    Закрытие общей HTTP-сессии при остановке бота.
+
+    :return: None
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+
+def retry_after(value: str | None) -> float:
+    """
+    Пауза из заголовка Retry-After (секунды или HTTP-дата).
+
+    :param value: Значение заголовка
+    :type value: str | None
+    :return: Пауза в секундах, не меньше 0 (DEFAULT_RETRY_AFTER, если заголовок не разобран)
+    :rtype: float
+    """
+    try:
+        delay = float(value)
+    except (TypeError, ValueError):
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            delay = DEFAULT_RETRY_AFTER
+    if math.isnan(delay):
+        delay = DEFAULT_RETRY_AFTER
+    return max(delay, 0.0)
+
+
+async def _parse_error(response: aiohttp.ClientResponse) -> SpotifyAPIError:
+    """
+    Преобразование ответа с ошибкой в SpotifyAPIError.
+
+    :param response: Ответ Spotify
+    :type response: aiohttp.ClientResponse
+    :return: Исключение с деталями ошибки
+    :rtype: SpotifyAPIError
+    """
+    message, reason = response.reason or "error", None
+    try:
+        payload = await response.json(content_type=None)
+    except (ValueError, aiohttp.ClientError):
+        payload = None
+
+    if isinstance(payload, dict):
+        error = payload.get("error")
+        if isinstance(error, dict):
+            message = error.get("message", message)
+            reason = error.get("reason")
+        elif isinstance(error, str):
+            message = payload.get("error_description", error)
+            reason = error
+
+    return SpotifyAPIError(response.status, message, reason)
+
+
+async def request_token(data: dict) -> dict:
+    """
+    Запрос к эндпоинту токенов Spotify (обмен кода или обновление).
+
+    :param data: Параметры формы запроса
+    :type data: dict
+    :return: Ответ с access_token, expires_in и, возможно, refresh_token
+    :rtype: dict
+    """
+    session = await get_session()
+    start, status = time.perf_counter(), "error"
+    try:
+        async with session.post(
+            f"{SPOTIFY_ACCOUNTS_URL}/api/token",
+            data=data,
+            auth=BasicAuth(SPOTIFY_CLIENT_ID or "", SPOTIFY_CLIENT_SECRET or ""),
+        ) as response:
+            status = response.status
+            if status != 200:
+                raise await _parse_error(response)
+            return await response.json()
+    finally:
+        observe_spotify_request("POST /api/token", status, time.perf_counter() - start)
+
+
+async def exchange_code(code: str) -> dict:
+    """
+    Обмен кода авторизации на токены.
+
+    :param code: Код авторизации от Spotify
+    :type code: str
+    :return: Информация о токенах
+    :rtype: dict
+    """
+    return await request_token({
+        "grant_type": "authorization_code",
+        "code": code,
+        "redirect_uri": SPOTIFY_REDIRECT_URI,
+    })
+
+
+async def refresh_access_token(refresh_token: str) -> dict:
+    """
+    Обновление access_token по refresh_token.
+
+    :param refresh_token: Токен обновления
+    :type refresh_token: str
+    :return: Информация о токенах
+    :rtype: dict
+    """
+    return await request_token({
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+    })
+
+
+class SpotifyClient:
+    """
+    Клиент Spotify Web API для одного пользователя.
+
+    Все запросы идут через общую сессию, поэтому соединения
+    переиспользуются между пользователями.
+
+    :ivar access_token: Текущий токен доступа пользователя
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+
+    async def _request(
+            self,
+            method: str,
+            path: str,
+            params: dict | None = None,
+            payload: Any = None,
+    ) -> Any:
+        """
+        Выполнение запроса к Web API.
+
+        :param method: HTTP-метод
+        :type method: str
+        :param path: Путь относительно корня API
+        :type path: str
+        :param params: Параметры строки запроса
+        :type params: dict | None
+        :param payload: Тело запроса (JSON)
+        :type payload: Any
+        :return: Разобранный JSON-ответ или None для пустого ответа
+        :rtype: Any
+        :raises SpotifyBusyError: если Spotify ответил 429 и на повтор
+        """
+        session = await get_session()
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        if params:
+            params = {key: value for key, value in params.items() if value is not None}
+
+        endpoint = endpoint_label(method, path)
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            # Ожидание слота в общем планировщике запросов
+            await limiter.acquire()
+
+            start, status = time.perf_counter(), "error"
+            try:
+                async with session.request(
+                    method, f"{SPOTIFY_API_URL}{path}", params=params, json=payload, headers=headers
+                ) as response:
+                    status = response.status
+                    if status == 429:
+                        # Превышен лимит приложения — пауза для всех запросов на весь Retry-After и повтор;
+                        # если пауза длиннее допустимого ожидания, limiter.acquire() откажет сразу
+                        limiter.pause(retry_after(response.headers.get("Retry-After")))
+                        if attempt < RATE_LIMIT_RETRIES:
+                            continue
+                        raise SpotifyBusyError("Spotify rate limit")
+                    if status >= 400:
+                        raise await _parse_error(response)
+                    body = await response.read()
+                    break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+                raise
+            finally:
+                # Учитываются и неудачные попытки, включая ответы 429
+                observe_spotify_request(endpoint, status, time.perf_counter() - start)
+
+        # Эндпоинты управления плеером отвечают пустым телом
+        if not body:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    async def current_user(self) -> dict:
+        """
+        Получение профиля текущего пользователя.
+
+        :return: Профиль пользователя Spotify
+        :rtype: dict
+        """
+        return await self._request("GET", "/me")
+
+    async def search(self, q: str, type: str = "track", limit: int = 10, offset: int = 0,
+                     market: str | None = None) -> dict:
+        """
+        Поиск по каталогу Spotify.
+
+        :return: Ответ Spotify с результатами поиска
+        :rtype: dict
+        """
+        return await self._request("GET", "/search", params={
+            "q": q, "type": type, "limit": limit, "offset": offset, "market": market,
+        })
+
+    async def track(self, track_id: str, market: str | None = None) -> dict:
+        """
+        Получение информации о треке.
+
+        :return: Объект трека Spotify
+        :rtype: dict
+        """
+        return await self._request("GET", f"/tracks/{track_id}", params={"market": market})
+
+    async def tracks(self, track_ids: list[str], market: str | None = None) -> dict:
+        """
+        Получение информации о нескольких треках (до 50 за запрос).
+
+        :return: Ответ со списком треков
+        :rtype: dict
+        """
+        return await self._request("GET", "/tracks", params={"ids": ",".join(track_ids), "market": market})
+
+    async def current_user_saved_tracks(self, limit: int = 50, offset: int = 0, market: str | None = None) -> dict:
+        """
+        Страница избранных треков пользователя (новые — первыми).
+
+        :return: Страница с полями items, total и next
+        :rtype: dict
+        """
+        return await self._request("GET", "/me/tracks", params={"limit": limit, "offset": offset, "market": market})
+
+    async def current_user_playlists(self, limit: int = 50, offset: int = 0) -> dict:
+        """
+        Страница плейлистов пользователя.
+
+        :return: Страница с полями items, total и next
+        :rtype: dict
+        """
+        return await self._request("GET", "/me/playlists", params={"limit": limit, "offset": offset})
+
+    async def playlist_items(self, playlist_id: str, limit: int = 100, offset: int = 0,
+                             market: str | None = None, fields: str | None = None) -> dict:
+        """
+        Страница треков плейлиста.
+
+        :return: Страница с полями items, total и next
+        :rtype: dict
+        """
+        return await self._request("GET", f"/playlists/{playlist_id}/tracks", params={
+            "limit": limit, "offset": offset, "market": market, "fields": fields,
+        })
+
+    async def currently_playing(self, market: str | None = None) -> dict | None:
+        """
+        Получение трека, который сейчас играет у пользователя.
+
+        :return: Состояние воспроизведения или None, если ничего не играет
+        :rtype: dict | None
+        """
+        return await self._request("GET", "/me/player/currently-playing", params={"market": market})
+
+    async def devices(self) -> dict:
+        """
+        Получение списка доступных устройств пользователя.
+
+        :return: Ответ со списком устройств
+        :rtype: dict
+        """
+        return await self._request("GET", "/me/player/devices")
+
+    async def start_playback(self, device_id: str | None = None, uris: list[str] | None = None):
+        """
+        Запуск воспроизведения на устройстве.
+
+        :return: None
+        """
+        await self._request("PUT", "/me/player/play", params={"device_id": device_id},
+                            payload={"uris": uris})
+
+    async def add_to_queue(self, uri: str, device_id: str | None = None):
+        """
+        Добавление трека в очередь воспроизведения.
+
+        :return: None
+        """
+        await self._request("POST", "/me/player/queue", params={"uri": uri, "device_id": device_id})
+
+    async def current_user_saved_tracks_add(self, tracks: list[str]):
+        """
+        Добавление треков в избранное пользователя.
+
+        :return: None
+        """
+        await self._request("PUT", "/me/tracks", params={"ids": ",".join(tracks)})
+
+    async def current_user_saved_tracks_contains(self, tracks: list[str]) -> list[bool]:
+        """
+        Проверка, добавлены ли треки в избранное пользователя.
+
+        :return: Список признаков в порядке переданных ID
+        :rtype: list[bool]
+        """
+        return await self._request("GET", "/me/tracks/contains", params={"ids": ",".join(tracks)})
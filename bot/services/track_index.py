@@ -0,0 +1,177 @@
+import asyncio
+import re
+from functools import reduce
+from operator import and_
+
+from tortoise import Tortoise
+from tortoise.expressions import Q
+
+from bot.config import TRACK_CACHE_SIZE, TRACK_CACHE_TTL, TRACK_INDEX_FLUSH_DELAY
+from bot.database.migrations import table_exists
+from bot.database.models import Track
+from bot.services.tracks import remember_tracks
+from bot.utils.cache import TTLCache
+from bot.utils.logger import logger
+from bot.utils.metrics import stats_collector
+
+"""
+Локальный поисковый индекс по всем трекам, которые видел бот (таблица tracks и FTS5)
+"""
+
+# Треков в одной пакетной записи
+FLUSH_BATCH_SIZE = 500
+
+# Слова запроса (буквы и цифры любых алфавитов)
+_WORD_RE = re.compile(r"\w+")
+
+# Треки, ожидающие записи в БД
+_pending: dict[str, dict] = {}
+
+# Недавно записанные треки: повторная запись не нужна
+_indexed = TTLCache(maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL)
+
+# Отложенная запись и признак наличия FTS5 (определяется при первом поиске)
+_flush_task: asyncio.Task | None = None
+_fts_available: bool | None = None
+
+# Статистика
+index_stats = {"written": 0, "flushes": 0, "searches": 0, "hits": 0}
+
+
+async def store_tracks(tracks: list[dict]):
+    """
+    Запись метаданных треков в таблицу tracks (индекс обновляется триггерами).
+
+    :param tracks: Словари треков
+    :type tracks: list[dict]
+    :return: None
+    """
+    if not tracks:
+        return
+    unique = {track["id"]: track for track in tracks}
+    await Track.bulk_create(
+        [Track(**track) for track in unique.values()],
+        on_conflict=["id"],
+        update_fields=["name", "artist", "spotify_url"],
+    )
+    remember_tracks(list(unique.values()))
+    for track_id in unique:
+        _indexed.set(track_id, True)
+    index_stats["written"] += len(unique)
+
+
+def index_tracks(tracks: list[dict]):
+    """
+    Постановка треков в очередь на запись в индекс.
+
+    Запись выполняется в фоне пакетом через TRACK_INDEX_FLUSH_DELAY
+    секунд, поэтому не задерживает ответ пользователю.
+
+    :param tracks: Словари треков
+    :type tracks: list[dict]
+    :return: None
+    """
+    global _flush_task
+    for track in tracks:
+        if track["id"] not in _pending and _indexed.get(track["id"]) is None:
+            _pending[track["id"]] = track
+
+    if _pending and (_flush_task is None or _flush_task.done()):
+        _flush_task = asyncio.create_task(_flush_later())
+
+
+async def _flush_later():
+    """
+    Пакетная запись накопленных треков.
+
+    :return: None
+    """
+    await asyncio.sleep(TRACK_INDEX_FLUSH_DELAY)
+    while _pending:
+        batch = [_pending.pop(track_id) for track_id in list(_pending)[:FLUSH_BATCH_SIZE]]
+        try:
+            await store_tracks(batch)
+            index_stats["flushes"] += 1
+        except Exception as e:
+            logger.warning("Не удалось записать треки в локальный индекс: %s", e)
+
+
+def build_match(query: str) -> str | None:
+    """
+    Запрос FTS5: каждое слово как префикс, все слова обязательны.
+
+    :param query: Поисковый запрос пользователя
+    :type query: str
+    :return: Выражение MATCH или None, если в запросе нет слов
+    :rtype: str | None
+    """
+    words = _WORD_RE.findall(query.casefold())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+async def _has_fts() -> bool:
+    """
+    Есть ли в БД индекс tracks_fts.
+
+    :return: True, если индекс создан миграцией
+    :rtype: bool
+    """
+    global _fts_available
+    if _fts_available is None:
+        _fts_available = await table_exists(Tortoise.get_connection("default"), "tracks_fts")
+    return _fts_available
+
+
+async def search_local(query: str, limit: int, offset: int = 0) -> list[dict]:
+    """
+    Поиск треков в локальном индексе.
+
+    В SQLite с FTS5 — по префиксам слов без учёта регистра и диакритики
+    с ранжированием bm25, иначе — подстроками через LIKE.
+
+    :param query: Поисковый запрос
+    :type query: str
+    :param limit: Число результатов
+    :type limit: int
+    :param offset: Смещение первого результата
+    :type offset: int
+    :return: Список словарей с информацией о треках
+    :rtype: list[dict]
+    """
+    match = build_match(query)
+    if match is None:
+        return []
+    index_stats["searches"] += 1
+
+    if await _has_fts():
+        tracks = await Tortoise.get_connection("default").execute_query_dict(
+            "SELECT t.id, t.name, t.artist, t.spotify_url FROM tracks_fts "
+            "JOIN tracks t ON t.rowid = tracks_fts.rowid "
+            "WHERE tracks_fts MATCH ? ORDER BY bm25(tracks_fts) LIMIT ? OFFSET ?",
+            [match, limit, offset],
+        )
+    else:
+        words = _WORD_RE.findall(query)
+        condition = reduce(and_, (Q(name__icontains=word) | Q(artist__icontains=word) for word in words))
+        tracks = await Track.filter(condition).offset(offset).limit(limit).values(
+            "id", "name", "artist", "spotify_url"
+        )
+
+    if tracks:
+        index_stats["hits"] += 1
+    return [dict(track) for track in tracks]
+
+
+def stats() -> dict:
+    """
+    Статистика локального индекса.
+
+    :return: Очередь записи, записанные треки, поиски и попадания
+    :rtype: dict
+    """
+    return {"pending": len(_pending), **index_stats}
+
+
+stats_collector.register("track_index", stats)
@@ -0,0 +1,53 @@
+from bot.config import TRACK_CACHE_SIZE, TRACK_CACHE_TTL
+from bot.utils.cache import TTLCache
+
+"""
+Хранилище метаданных треков, уже полученных от Spotify
+"""
+
+# Максимум ID в одном запросе GET /tracks
+TRACKS_BATCH_SIZE = 50
+
+# Метаданные треков по ID
+track_cache = TTLCache(maxsize=TRACK_CACHE_SIZE, ttl=TRACK_CACHE_TTL)
+
+
+def track_to_dict(item: dict) -> dict:
+    """
+    Преобразование объекта трека Spotify в словарь бота.
+
+    :param item: Объект трека из ответа Spotify
+    :type item: dict
+    :return: Словарь с id, названием, исполнителем и ссылкой
+    :rtype: dict
+    """
+    return {
+        "id": item["id"],
+        "name": item["name"],
+        "artist": item["artists"][0]["name"],
+        "spotify_url": item["external_urls"]["spotify"]
+    }
+
+
+def remember_tracks(tracks: list[dict]):
+    """
+    Сохранение метаданных треков в хранилище.
+
+    :param tracks: Список словарей треков
+    :type tracks: list[dict]
+    :return: None
+    """
+    for track in tracks:
+        track_cache.set(track["id"], track)
+
+
+def get_cached_track(track_id: str) -> dict | None:
+    """
+    Получение метаданных трека из хранилища.
+
+    :param track_id: ID трека
+    :type track_id: str
+    :return: Словарь трека или None при промахе
+    :rtype: dict | None
+    """
+    return track_cache.get(track_id)
@@ -0,0 +1,55 @@
+from bot.config import USER_CACHE_SIZE, USER_CACHE_TTL
+from bot.database.models import User
+from bot.utils.cache import TTLCache
+from bot.utils.metrics import stats_collector
+
+"""
+Кэш пользователей в памяти процесса поверх таблицы users
+"""
+
+# Маркер пользователя, которого нет в БД
+_NOT_FOUND = object()
+
+# Пользователи по telegram_id
+_users = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+stats_collector.register("user_cache", _users.stats)
+
+
+async def get_user(telegram_id: int) -> User | None:
+    """
+    Получение пользователя из кэша или БД.
+
+    Отсутствие пользователя тоже кэшируется, пока он не авторизуется.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :return: Пользователь или None
+    :rtype: User | None
+    """
+    user = _users.get(telegram_id)
+    if user is None:
+        user = await User.get_or_none(telegram_id=telegram_id) or _NOT_FOUND
+        _users.set(telegram_id, user)
+    return None if user is _NOT_FOUND else user
+
+
+def store_user(user: User):
+    """
+    Запись актуального объекта пользователя в кэш.
+
+    :param user: Пользователь
+    :type user: User
+    :return: None
+    """
+    _users.set(user.telegram_id, user)
+
+
+def invalidate_user(telegram_id: int):
+    """
+    Удаление пользователя из кэша (следующее обращение прочитает БД).
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :return: None
+    """
+    _users.pop(telegram_id)
@@ -1,39 +1,153 @@
+import asyncio
+import hashlib
+from functools import partial
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 from aiohttp import web
 from aiohttp.web_request import Request
 from aiohttp.web_response import Response
+from tortoise import Tortoise
 
-from bot.services.spotify import exchange_code_for_token
+from bot.config import (
+    BOT_TOKEN,
+    MAX_CONCURRENT_UPDATES,
+    WEBHOOK_MAX_CONNECTIONS,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+)
+from bot.database.db import init_db
+from bot.services.auth import complete_authorization, verify_state
+from bot.services.spotify_api import close_session
+from bot.utils.metrics import METRICS_CONTENT_TYPE, render_metrics
 
 """
-Сервер для обработки колбэка Spotify OAuth
+Сервер для обработки колбэка Spotify OAuth, webhook Telegram и метрик
 """
 
 # Таблица маршрутов
 routes = web.RouteTableDef()
 
+# Секрет webhook: одинаковый во всех экземплярах бота, иначе каждый set_webhook
+# заменял бы секрет остальных и они отклоняли бы апдейты Telegram
+webhook_secret = WEBHOOK_SECRET or hashlib.sha256(f"webhook:{BOT_TOKEN}".encode()).hexdigest()
+
+# Выполняющиеся в фоне авторизации (ссылки не дают задачам пропасть до завершения)
+_authorizations: set[asyncio.Task] = set()
+
 
 @routes.get("/callback")
 async def spotify_callback(request: Request) -> Response:
     """
     Обработка колбэка Spotify после авторизации.
 
+    Обмен кода на токен выполняется в фоне через ``app["authorize"]``,
+    а результат бот присылает пользователю в Telegram.
+
     :param request: HTTP-запрос
     :type request: Request
-    :return: HTTP-ответ с результатом авторизации
+    :return: HTTP-ответ с результатом проверки запроса
     :rtype: Response
     """
     # Получение кода и состояния из запроса
     code = request.query.get("code")
     state = request.query.get("state")
 
+    # Пользователь отказал в доступе на странице Spotify
+    if request.query.get("error"):
+        return web.Response(text="Авторизация отменена. Отправьте /start в боте, чтобы попробовать снова.")
+
     # Проверка наличия обязательных параметров
     if not code or not state:
-        return web.Response(text="Ошибка: отсутствует code или state.")
+        return web.Response(status=400, text="Ошибка: отсутствует code или state.")
+
+    # Проверка подписи и срока действия state
+    telegram_id = verify_state(state)
+    if telegram_id is None:
+        return web.Response(
+            status=400,
+            text="Ошибка: ссылка авторизации недействительна или устарела. Отправьте /start в боте ещё раз.",
+        )
+
+    # Обмен кода на токен в фоне (в режиме супервизора — в процессе-владельце пользователя)
+    task = asyncio.create_task(request.app["authorize"](code, telegram_id))
+    _authorizations.add(task)
+    task.add_done_callback(_authorizations.discard)
+
+    return web.Response(text="⏳ Авторизация завершается. Вернитесь в Telegram — бот пришлёт подтверждение.")
+
+
+@routes.get("/metrics")
+async def metrics(request: Request) -> Response:
+    """
+    Метрики бота в текстовом формате Prometheus.
+
+    :param request: HTTP-запрос
+    :type request: Request
+    :return: HTTP-ответ с метриками
+    :rtype: Response
+    """
+    return web.Response(body=render_metrics(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
+class BoundedRequestHandler(SimpleRequestHandler):
+    """
+    Обработчик webhook, ограничивающий число одновременно
+    обрабатываемых апдейтов.
+
+    :ivar semaphore: Семафор на MAX_CONCURRENT_UPDATES апдейтов
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, max_concurrent_updates: int, **kwargs: Any):
+        super().__init__(dispatcher=dispatcher, bot=bot, **kwargs)
+        self.semaphore = asyncio.Semaphore(max_concurrent_updates)
+
+    async def _background_feed_update(self, bot: Bot, update: dict[str, Any]) -> None:
+        async with self.semaphore:
+            await super()._background_feed_update(bot, update)
+
+
+def setup_webhook(dp: Dispatcher, bot: Bot) -> str:
+    """
+    Подключение обработчика webhook Telegram к приложению сервера.
+
+    :param dp: Диспетчер бота
+    :type dp: Dispatcher
+    :param bot: Объект бота
+    :type bot: Bot
+    :return: Секретный токен, который Telegram передаёт в заголовке
+    :rtype: str
+    """
+    BoundedRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        max_concurrent_updates=MAX_CONCURRENT_UPDATES,
+        secret_token=webhook_secret,
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return webhook_secret
 
-    # Обмен кода на токен
-    await exchange_code_for_token(code, int(state))
 
-    return web.Response(text="✅ Авторизация прошла успешно! Можете вернуться в Telegram-бота.")
+async def set_webhook(dp: Dispatcher, bot: Bot, secret: str):
+    """
+    Регистрация адреса webhook в Telegram.
+
+    :param dp: Диспетчер бота
+    :type dp: Dispatcher
+    :param bot: Объект бота
+    :type bot: Bot
+    :param secret: Секретный токен webhook
+    :type secret: str
+    :return: None
+    """
+    await bot.set_webhook(
+        url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=secret,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
 
 
 # Создание приложения и регистрация маршрутов
@@ -43,6 +157,25 @@ app.add_routes(routes)
 
 def run_server():
     """
-    Запуск веб-сервера на порту 8888.
+    Запуск веб-сервера на порту 8888 без бота (колбэк OAuth и метрики).
+
+    Колбэк сохраняет токены в БД и отправляет подтверждение через
+    отдельный объект бота, если обработчик авторизации не задан заранее.
     """
+    if "authorize" not in app:
+        bot = Bot(token=BOT_TOKEN)
+        app["authorize"] = partial(complete_authorization, bot)
+
+        async def startup(_: web.Application):
+            await init_db()
+
+        async def cleanup(_: web.Application):
+            await asyncio.gather(*_authorizations, return_exceptions=True)
+            await close_session()
+            await bot.session.close()
+            await Tortoise.close_connections()
+
+        app.on_startup.append(startup)
+        app.on_cleanup.append(cleanup)
+
     web.run_app(app, port=8888)
@@ -0,0 +1,151 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+"""
+Кэш в памяти процесса с LRU-вытеснением и временем жизни записей
+"""
+
+# Маркер отсутствующего значения
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    LRU-кэш ограниченного размера со временем жизни записей.
+
+    При ``sliding=True`` срок жизни продлевается при каждом чтении,
+    то есть записи вытесняются после простоя, а не с момента создания.
+
+    :ivar maxsize: Максимальное число записей
+    :ivar ttl: Время жизни записи в секундах (None — без ограничения)
+    :ivar sliding: Продлевать ли срок жизни при чтении
+    :ivar hits: Число попаданий
+    :ivar misses: Число промахов
+    :ivar evictions: Число вытеснений по размеру или сроку
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None, sliding: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.sliding = sliding
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+
+    def _expires_at(self, ttl: float | None) -> float | None:
+        """
+        Вычисление момента истечения записи.
+
+        :param ttl: Время жизни в секундах
+        :type ttl: float | None
+        :return: Момент истечения по time.monotonic() или None
+        :rtype: float | None
+        """
+        ttl = self.ttl if ttl is None else ttl
+        return None if ttl is None else time.monotonic() + ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Получение значения с обновлением позиции в LRU.
+
+        :param key: Ключ записи
+        :type key: Hashable
+        :param default: Значение при промахе
+        :type default: Any
+        :return: Значение из кэша или default
+        :rtype: Any
+        """
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.evictions += 1
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        if self.sliding:
+            self._data[key] = (self._expires_at(None), value)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """
+        Сохранение значения с вытеснением самых старых записей.
+
+        :param key: Ключ записи
+        :type key: Hashable
+        :param value: Значение
+        :type value: Any
+        :param ttl: Время жизни записи (по умолчанию — ttl кэша)
+        :type ttl: float | None
+        :return: None
+        """
+        self._data[key] = (self._expires_at(ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Удаление записи из кэша.
+
+        :param key: Ключ записи
+        :type key: Hashable
+        :param default: Значение, если записи нет
+        :type default: Any
+        :return: Удалённое значение или default
+        :rtype: Any
+        """
+        entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[1]
+
+    def purge(self) -> int:
+        """
+        Удаление всех истёкших записей.
+
+        :return: Число удалённых записей
+        :rtype: int
+        """
+        now = time.monotonic()
+        expired = [key for key, (expires_at, _) in self._data.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+        self.evictions += len(expired)
+        return len(expired)
+
+    def clear(self):
+        """
+        Очистка кэша.
+
+        :return: None
+        """
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Статистика использования кэша.
+
+        :return: Словарь с размером, попаданиями, промахами и вытеснениями
+        :rtype: dict
+        """
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key, _MISSING)
+        return entry is not _MISSING and (entry[0] is None or entry[0] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
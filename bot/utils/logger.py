@@ -1,40 +1,179 @@
+import atexit
+import json
 import logging
+import queue
+import time
+from collections import Counter
+from contextvars import ContextVar
 from logging import Logger
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import sys
 
+from bot.config import LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE, WORKER_INDEX
+from bot.utils.metrics import stats_collector
 
-def setup_logger() -> Logger:
+"""
+Логирование через очередь: обработчики с вводом-выводом работают в фоновом потоке
+"""
+
+# Контекст текущего апдейта: telegram_id, имя обработчика и момент начала
+log_context: ContextVar[dict | None] = ContextVar("log_context", default=None)
+
+
+class ContextFilter(logging.Filter):
+    """
+    Добавление в запись полей текущего апдейта из log_context.
+
+    Выполняется в потоке, создавшем запись, — до передачи в очередь.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        context = log_context.get()
+        if context:
+            record.telegram_id = context.get("telegram_id")
+            record.handler = context.get("handler")
+            record.duration = time.perf_counter() - context["start"]
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Передача записей в ограниченную очередь без блокировки.
+
+    Если очередь заполнена, запись отбрасывается и учитывается в счётчике.
+    Когда очередь освобождается наполовину, в журнал попадает
+    предупреждение о потерях.
+    Сообщение не форматируется на месте: подстановка аргументов
+    выполняется в фоновом потоке.
+
+    :ivar dropped: Число отброшенных записей по уровням
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped: Counter[str] = Counter()
+        self._unreported = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Очередь внутри процесса: запись передаётся как есть
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self._unreported and self.queue.qsize() <= self.queue.maxsize // 2:
+            try:
+                self.queue.put_nowait(self._drop_report())
+                self._unreported = 0
+            except queue.Full:
+                pass
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped[record.levelname] += 1
+            self._unreported += 1
+
+    def _drop_report(self) -> logging.LogRecord:
+        """
+        Запись о потерянных сообщениях.
+
+        :return: Запись уровня WARNING
+        :rtype: logging.LogRecord
+        """
+        return logging.LogRecord(
+            "bot.utils.logger", logging.WARNING, __file__, 0,
+            "Очередь журнала переполнена, отброшено записей: %d", (self._unreported,), None,
+        )
+
+    def stats(self) -> dict:
+        """
+        Статистика очереди журнала.
+
+        :return: Размер очереди и число отброшенных записей
+        :rtype: dict
+        """
+        return {"queued": self.queue.qsize(), "dropped": sum(self.dropped.values())}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирование записи в одну строку JSON.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in ("telegram_id", "handler"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        duration = getattr(record, "duration", None)
+        if duration is not None:
+            entry["duration_ms"] = round(duration * 1000, 1)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _make_formatter() -> logging.Formatter:
+    """
+    Форматтер по настройке LOG_FORMAT.
+
+    :return: Форматтер
+    :rtype: logging.Formatter
+    """
+    if LOG_FORMAT == "json":
+        return JsonFormatter()
+    return logging.Formatter(
+        fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S"
+    )
+
+
+def setup_logger() -> tuple[Logger, BoundedQueueHandler]:
     """
     Настройка логгера для консоли и файла.
 
-    :return: Объект логгера
-    :rtype: Logger
+    Корневой логгер пишет только в очередь, а консоль и файл
+    обслуживает фоновый QueueListener.
+
+    :return: Объект логгера и обработчик очереди
+    :rtype: tuple[Logger, BoundedQueueHandler]
     """
     # Создание логгера и установка уровня
     logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
+    logger.setLevel(LOG_LEVEL)
 
     # Форматирование логов
-    formatter = logging.Formatter(
-        fmt="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S"
-    )
+    formatter = _make_formatter()
 
     # Консольный обработчик
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
-    # Файловый обработчик с ротацией
+    # Файловый обработчик с ротацией (у каждого процесса-обработчика свой файл)
     file_handler = RotatingFileHandler(
-        "bot.log", maxBytes=1_000_000, backupCount=5, encoding="utf-8"
+        f"bot.worker{WORKER_INDEX}.log" if WORKER_INDEX else "bot.log", maxBytes=1_000_000, backupCount=5, encoding="utf-8"
     )
     file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
 
-    return logger
+    # Ограниченная очередь и фоновый поток записи
+    queue_handler = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    queue_handler.addFilter(ContextFilter())
+    logger.addHandler(queue_handler)
+
+    listener = QueueListener(queue_handler.queue, console_handler, file_handler)
+    listener.start()
+
+    # Запись оставшихся сообщений при завершении процесса
+    atexit.register(listener.stop)
+
+    return logger, queue_handler
 
 
 # Инициализация логгера
-logger = setup_logger()
+logger, queue_handler = setup_logger()
+stats_collector.register("log_queue", queue_handler.stats)
@@ -0,0 +1,209 @@
+import asyncio
+import functools
+import re
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+"""
+Метрики Prometheus: обработчики, запросы к Spotify, БД, кэши и задержка цикла событий
+"""
+
+# Тип содержимого ответа /metrics
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Длительность обработчиков aiogram
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Длительность обработчиков апдейтов", ["handler"],
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Исключения в обработчиках апдейтов", ["handler"],
+)
+
+# Запросы к Spotify Web API
+SPOTIFY_REQUESTS = Counter(
+    "spotify_requests_total", "Запросы к Spotify Web API", ["endpoint", "status"],
+)
+SPOTIFY_LATENCY = Histogram(
+    "spotify_request_duration_seconds", "Длительность запросов к Spotify Web API", ["endpoint"],
+)
+SPOTIFY_CALLS_PER_UPDATE = Histogram(
+    "bot_spotify_calls_per_update", "Число запросов к Spotify на один апдейт",
+    buckets=(0, 1, 2, 3, 5, 8, 13),
+)
+
+# Запросы к БД
+DB_LATENCY = Histogram(
+    "db_query_duration_seconds", "Длительность запросов Tortoise ORM", ["operation"],
+)
+
+# Задержка цикла событий
+EVENT_LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Запаздывание цикла событий относительно ожидаемого пробуждения",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+# Счётчик запросов к Spotify в рамках текущего апдейта
+spotify_calls: ContextVar[list[int] | None] = ContextVar("spotify_calls", default=None)
+
+# Spotify ID (base62, 22 символа) в пути заменяется шаблоном, чтобы не плодить метки
+_ID_RE = re.compile(r"/[0-9A-Za-z]{22}(?=/|$)")
+
+
+def endpoint_label(method: str, path: str) -> str:
+    """
+    Метка эндпоинта Spotify без идентификаторов.
+
+    :param method: HTTP-метод
+    :type method: str
+    :param path: Путь запроса
+    :type path: str
+    :return: Метка вида "GET /tracks/{id}"
+    :rtype: str
+    """
+    return f"{method} {_ID_RE.sub('/{id}', path)}"
+
+
+def observe_spotify_request(endpoint: str, status: int | str, duration: float):
+    """
+    Учёт одного запроса к Spotify.
+
+    :param endpoint: Метка эндпоинта
+    :type endpoint: str
+    :param status: HTTP-статус или тип ошибки
+    :type status: int | str
+    :param duration: Длительность в секундах
+    :type duration: float
+    :return: None
+    """
+    SPOTIFY_REQUESTS.labels(endpoint, str(status)).inc()
+    SPOTIFY_LATENCY.labels(endpoint).observe(duration)
+    calls = spotify_calls.get()
+    if calls is not None:
+        calls[0] += 1
+
+
+class StatsCollector(Collector):
+    """
+    Сборщик, читающий словари статистики (кэши, планировщик и т. п.)
+    только в момент запроса /metrics.
+    """
+
+    def __init__(self):
+        self._sources: dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, source: Callable[[], dict]):
+        """
+        Регистрация источника статистики.
+
+        :param name: Имя источника (метка ``source``)
+        :type name: str
+        :param source: Функция, возвращающая словарь числовых значений
+        :type source: Callable[[], dict]
+        :return: None
+        """
+        self._sources[name] = source
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        gauge = GaugeMetricFamily("bot_component_stat", "Статистика компонентов бота", labels=["source", "stat"])
+        for name, source in self._sources.items():
+            for stat, value in source().items():
+                gauge.add_metric([name, stat], float(value))
+        yield gauge
+
+
+class _CounterDictCollector(Collector):
+    """
+    Экспорт словаря-счётчика как Counter с меткой ``kind``.
+    """
+
+    def __init__(self, name: str, documentation: str, counters: dict):
+        self.name = name
+        self.documentation = documentation
+        self.counters = counters
+
+    def collect(self) -> Iterator[CounterMetricFamily]:
+        counter = CounterMetricFamily(self.name, self.documentation, labels=["kind"])
+        for kind, value in self.counters.items():
+            counter.add_metric([kind], value)
+        yield counter
+
+
+# Статистика компонентов, собираемая при запросе
+stats_collector = StatsCollector()
+REGISTRY.register(stats_collector)
+
+
+def register_counters(name: str, documentation: str, counters: dict):
+    """
+    Экспорт словаря-счётчика (например, refresh_stats) в Prometheus.
+
+    :param name: Имя метрики без суффикса _total
+    :type name: str
+    :param documentation: Описание метрики
+    :type documentation: str
+    :param counters: Словарь вида {вид: значение}
+    :type counters: dict
+    :return: None
+    """
+    REGISTRY.register(_CounterDictCollector(name, documentation, counters))
+
+
+def instrument_db_client(client: Any):
+    """
+    Замер длительности запросов клиента Tortoise (включая транзакции).
+
+    Методы оборачиваются на уровне класса клиента, поэтому замеряются
+    и запросы обёрток транзакций, унаследованных от него.
+
+    :param client: Подключение Tortoise
+    :type client: Any
+    :return: None
+    """
+    cls = type(client)
+    if getattr(cls, "_metrics_instrumented", False):
+        return
+
+    def wrap(method: Callable) -> Callable:
+        @functools.wraps(method)
+        async def wrapper(self, query: str, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await method(self, query, *args, **kwargs)
+            finally:
+                operation = query.lstrip().split(None, 1)[0].upper() if query.strip() else "UNKNOWN"
+                DB_LATENCY.labels(operation).observe(time.perf_counter() - start)
+        return wrapper
+
+    for name in ("execute_query", "execute_query_dict", "execute_insert", "execute_many", "execute_script"):
+        if hasattr(cls, name):
+            setattr(cls, name, wrap(getattr(cls, name)))
+    cls._metrics_instrumented = True
+
+
+async def monitor_event_loop(interval: float = 0.5):
+    """
+    Фоновое измерение задержки цикла событий.
+
+    :param interval: Период измерения в секундах
+    :type interval: float
+    :return: None
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, time.perf_counter() - start - interval))
+
+
+def render_metrics() -> bytes:
+    """
+    Текущие значения метрик в текстовом формате Prometheus.
+
+    :return: Тело ответа /metrics
+    :rtype: bytes
+    """
+    return generate_latest(REGISTRY)
@@ -0,0 +1,559 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+from aiohttp.web_request import Request
+from aiohttp.web_response import Response
+from tortoise import Tortoise
+
+from bot.config import (
+    BOT_TOKEN,
+    MAX_CONCURRENT_UPDATES,
+    SPOTIFY_RATE_BURST,
+    SPOTIFY_RATE_LIMIT,
+    WEBHOOK_PATH,
+    WEBHOOK_URL,
+    WORKER_HEARTBEAT_INTERVAL,
+    WORKER_METRICS_PORT,
+    WORKERS,
+)
+from bot.database.db import init_db
+from bot.main import create_dispatcher, setup_bot
+from bot.services.ratelimit import limiter
+from bot.services.auth import complete_authorization
+from bot.services.library import library_sync_loop
+from bot.services.spotify_api import close_session
+from bot.spotify_redirect_server import app as redirect_app, metrics, set_webhook, webhook_secret
+from bot.utils.logger import logger
+from bot.utils.metrics import monitor_event_loop, stats_collector
+
+"""
+Многопроцессный режим: супервизор принимает апдейты и колбэки OAuth
+и распределяет их по процессам-обработчикам по telegram_id
+"""
+
+# Таймаут ожидания long polling getUpdates (сек.)
+POLLING_TIMEOUT = 30
+
+# Время на завершение процесса-обработчика при остановке (сек.)
+WORKER_STOP_TIMEOUT = 10
+
+
+def shard_for(telegram_id: int, workers: int) -> int:
+    """
+    Номер процесса-обработчика, которому принадлежит пользователь.
+
+    :param telegram_id: ID пользователя Telegram
+    :type telegram_id: int
+    :param workers: Число процессов-обработчиков
+    :type workers: int
+    :return: Номер процесса
+    :rtype: int
+    """
+    return telegram_id % workers
+
+
+def update_user_id(update: dict[str, Any]) -> int:
+    """
+    ID пользователя (или чата), к которому относится апдейт.
+
+    :param update: Апдейт в формате Bot API
+    :type update: dict[str, Any]
+    :return: ID пользователя или 0, если его нет
+    :rtype: int
+    """
+    for key, event in update.items():
+        if key == "update_id" or not isinstance(event, dict):
+            continue
+        owner = event.get("from") or event.get("user") or event.get("chat")
+        if isinstance(owner, dict) and "id" in owner:
+            return int(owner["id"])
+    return 0
+
+
+class WorkerRuntime:
+    """
+    Процесс-обработчик: получает апдейты своего шарда и обрабатывает их
+    через Dispatcher.
+
+    Апдейты пользователя запускаются в порядке поступления, но обработчики
+    выполняются параллельно: на этом держатся debounce inline-запросов,
+    объединение лайков и дедупликация повторных нажатий.
+
+    :ivar index: Номер процесса
+    :ivar processed: Число обработанных апдейтов
+    :ivar errors: Число апдейтов, завершившихся исключением
+    """
+
+    def __init__(self, index: int, inbox: multiprocessing.Queue, outbox: multiprocessing.Queue):
+        self.index = index
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.errors = 0
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPDATES)
+        self._user_updates: Counter[int] = Counter()
+        self._tasks: set[asyncio.Task] = set()
+        self._stopped = asyncio.Event()
+        self._dp: Dispatcher | None = None
+        self._bot: Bot | None = None
+
+    def stats(self) -> dict:
+        """
+        Состояние процесса для супервизора.
+
+        :return: Число обработанных апдейтов, ошибок и выполняющихся задач
+        :rtype: dict
+        """
+        return {
+            "pid": os.getpid(),
+            "processed": self.processed,
+            "errors": self.errors,
+            "in_flight": len(self._tasks),
+            "users": len(self._user_updates),
+        }
+
+    async def _process_update(self, update: dict[str, Any]):
+        """
+        Обработка апдейта.
+
+        Задачи создаются в порядке поступления апдейтов, а семафор пропускает
+        ожидающих по очереди, поэтому апдейты пользователя начинают
+        обрабатываться в порядке получения. Блокировка на время работы
+        обработчика не берётся.
+
+        :param update: Апдейт в формате Bot API
+        :type update: dict[str, Any]
+        :return: None
+        """
+        telegram_id = update_user_id(update)
+        self._user_updates[telegram_id] += 1
+        try:
+            async with self._semaphore:
+                await self._dp.feed_raw_update(self._bot, update)
+            self.processed += 1
+        except Exception:
+            self.errors += 1
+            logger.exception("Ошибка обработки апдейта %s", update.get("update_id"))
+        finally:
+            self._user_updates[telegram_id] -= 1
+            if not self._user_updates[telegram_id]:
+                del self._user_updates[telegram_id]
+
+    def _dispatch(self, message: tuple):
+        """
+        Запуск обработки сообщения от супервизора (в потоке цикла событий).
+
+        :param message: Сообщение вида (тип, данные...)
+        :type message: tuple
+        :return: None
+        """
+        kind = message[0]
+        if kind == "stop":
+            self._stopped.set()
+            return
+
+        if kind == "pause":
+            # Пауза по 429 из другого процесса: лимит Spotify общий для приложения
+            limiter.pause(message[1], notify=False)
+            return
+
+        if kind == "update":
+            coroutine = self._process_update(message[1])
+        elif kind == "oauth":
+            coroutine = complete_authorization(self._bot, *message[1:])
+        else:
+            logger.warning("Неизвестное сообщение супервизора: %s", kind)
+            return
+
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _read_inbox(self, loop: asyncio.AbstractEventLoop):
+        """
+        Чтение очереди супервизора в отдельном потоке.
+
+        :param loop: Цикл событий процесса
+        :type loop: asyncio.AbstractEventLoop
+        :return: None
+        """
+        while True:
+            message = self.inbox.get()
+            loop.call_soon_threadsafe(self._dispatch, message)
+            if message[0] == "stop":
+                return
+
+    async def _heartbeat(self):
+        """
+        Периодический отчёт супервизору о состоянии.
+
+        :return: None
+        """
+        while True:
+            self.outbox.put(("heartbeat", self.index, self.stats()))
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+    async def _start_metrics_server(self) -> web.AppRunner | None:
+        """
+        Запуск /metrics процесса на порту WORKER_METRICS_PORT + номер.
+
+        :return: Runner сервера или None, если порт не задан
+        :rtype: web.AppRunner | None
+        """
+        if not WORKER_METRICS_PORT:
+            return None
+        app = web.Application()
+        app.router.add_get("/metrics", metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "0.0.0.0", WORKER_METRICS_PORT + self.index).start()
+        return runner
+
+    async def run(self):
+        """
+        Основной цикл процесса-обработчика.
+
+        :return: None
+        """
+        self._dp, self._bot = await setup_bot()
+
+        # Общий лимит запросов к Spotify делится между процессами
+        limiter.rate = SPOTIFY_RATE_LIMIT / WORKERS
+        limiter.burst = max(1, SPOTIFY_RATE_BURST // WORKERS)
+
+        # Пауза по 429 передаётся через супервизор всем процессам
+        limiter.on_pause = lambda retry_after: self.outbox.put(("pause", self.index, retry_after))
+
+        metrics_runner = await self._start_metrics_server()
+        background = [
+            asyncio.create_task(self._heartbeat()),
+            asyncio.create_task(monitor_event_loop()),
+            asyncio.create_task(library_sync_loop()),
+        ]
+        threading.Thread(
+            target=self._read_inbox, args=(asyncio.get_running_loop(),), name="supervisor-inbox", daemon=True,
+        ).start()
+        logger.info("Процесс-обработчик %d запущен (pid %d)", self.index, os.getpid())
+
+        try:
+            await self._stopped.wait()
+            if self._tasks:
+                await asyncio.wait(self._tasks, timeout=WORKER_STOP_TIMEOUT)
+        finally:
+            for task in background:
+                task.cancel()
+            if metrics_runner:
+                await metrics_runner.cleanup()
+            await close_session()
+            await self._bot.session.close()
+            await Tortoise.close_connections()
+
+
+def worker_main(index: int, inbox: multiprocessing.Queue, outbox: multiprocessing.Queue):
+    """
+    Точка входа процесса-обработчика.
+
+    :param index: Номер процесса
+    :type index: int
+    :param inbox: Очередь сообщений от супервизора
+    :type inbox: multiprocessing.Queue
+    :param outbox: Очередь сообщений супервизору
+    :type outbox: multiprocessing.Queue
+    :return: None
+    """
+    try:
+        asyncio.run(WorkerRuntime(index, inbox, outbox).run())
+    except KeyboardInterrupt:
+        pass
+
+
+class Supervisor:
+    """
+    Супервизор процессов-обработчиков.
+
+    Апдейты и колбэки OAuth направляются процессу по telegram_id, поэтому
+    токены, кэши и порядок апдейтов пользователя остаются внутри одного
+    процесса. Упавшие процессы перезапускаются.
+
+    :ivar workers: Число процессов-обработчиков
+    :ivar health: Последний отчёт каждого процесса
+    :ivar restarts: Число перезапусков каждого процесса
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.health: dict[int, dict] = {}
+        self.restarts: Counter[int] = Counter()
+        self._context = multiprocessing.get_context("spawn")
+        self._inboxes = [self._context.Queue() for _ in range(workers)]
+        self._outbox = self._context.Queue()
+        self._processes: list[multiprocessing.Process | None] = [None] * workers
+        self._heartbeats: dict[int, float] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def _spawn(self, index: int):
+        """
+        Запуск процесса-обработчика.
+
+        :param index: Номер процесса
+        :type index: int
+        :return: None
+        """
+        # Номер передаётся через окружение: он нужен при импорте конфигурации в новом процессе
+        os.environ["BOT_WORKER_INDEX"] = str(index)
+        try:
+            process = self._context.Process(
+                target=worker_main,
+                args=(index, self._inboxes[index], self._outbox),
+                name=f"bot-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+        finally:
+            os.environ.pop("BOT_WORKER_INDEX", None)
+        self._processes[index] = process
+
+    def route_update(self, update: dict[str, Any]):
+        """
+        Передача апдейта процессу-владельцу пользователя.
+
+        :param update: Апдейт в формате Bot API
+        :type update: dict[str, Any]
+        :return: None
+        """
+        index = shard_for(update_user_id(update), self.workers)
+        self._inboxes[index].put(("update", update))
+
+    async def authorize(self, code: str, telegram_id: int):
+        """
+        Передача кода OAuth процессу-владельцу пользователя: он обменяет
+        код на токен и пришлёт подтверждение в Telegram.
+
+        :param code: Код авторизации
+        :type code: str
+        :param telegram_id: ID пользователя Telegram
+        :type telegram_id: int
+        :return: None
+        """
+        self._inboxes[shard_for(telegram_id, self.workers)].put(("oauth", code, telegram_id))
+
+    def _handle_message(self, message: tuple):
+        """
+        Обработка сообщения процесса-обработчика (в потоке цикла событий).
+
+        :param message: Сообщение вида (тип, данные...)
+        :type message: tuple
+        :return: None
+        """
+        if message[0] == "heartbeat":
+            _, index, stats = message
+            self.health[index] = stats
+            self._heartbeats[index] = time.monotonic()
+        elif message[0] == "pause":
+            self.broadcast_pause(*message[1:])
+
+    def broadcast_pause(self, source: int, retry_after: float):
+        """
+        Передача паузы по 429 остальным процессам-обработчикам.
+
+        :param source: Номер процесса, получившего 429
+        :type source: int
+        :param retry_after: Пауза в секундах
+        :type retry_after: float
+        :return: None
+        """
+        for index, inbox in enumerate(self._inboxes):
+            if index != source:
+                inbox.put(("pause", retry_after))
+
+    def _read_outbox(self):
+        """
+        Чтение очереди процессов-обработчиков в отдельном потоке.
+
+        :return: None
+        """
+        while True:
+            message = self._outbox.get()
+            if message is None:
+                return
+            self._loop.call_soon_threadsafe(self._handle_message, message)
+
+    def worker_report(self, index: int) -> dict:
+        """
+        Состояние процесса-обработчика.
+
+        :param index: Номер процесса
+        :type index: int
+        :return: Словарь с признаком работоспособности и статистикой
+        :rtype: dict
+        """
+        process = self._processes[index]
+        heartbeat = self._heartbeats.get(index)
+        age = time.monotonic() - heartbeat if heartbeat else None
+        try:
+            queued = self._inboxes[index].qsize()
+        except NotImplementedError:
+            queued = None
+        return {
+            "index": index,
+            "alive": bool(process and process.is_alive()),
+            "healthy": bool(process and process.is_alive() and age is not None
+                            and age < WORKER_HEARTBEAT_INTERVAL * 3),
+            "heartbeat_age": age,
+            "restarts": self.restarts[index],
+            "queued": queued,
+            **self.health.get(index, {}),
+        }
+
+    async def health_handler(self, request: Request) -> Response:
+        """
+        Состояние процессов-обработчиков в формате JSON.
+
+        :param request: HTTP-запрос
+        :type request: Request
+        :return: 200, если все процессы работают, иначе 503
+        :rtype: Response
+        """
+        workers = [self.worker_report(index) for index in range(self.workers)]
+        healthy = all(worker["healthy"] for worker in workers)
+        return web.json_response(
+            {"status": "ok" if healthy else "degraded", "workers": workers},
+            status=200 if healthy else 503,
+        )
+
+    async def webhook_handler(self, request: Request) -> Response:
+        """
+        Приём апдейта от Telegram и передача процессу-владельцу.
+
+        :param request: HTTP-запрос Telegram
+        :type request: Request
+        :return: Пустой ответ 200
+        :rtype: Response
+        """
+        if request.headers.get("X-Telegram-Bot-Api-Secret-Token") != request.app["webhook_secret"]:
+            return web.Response(status=401)
+        self.route_update(await request.json())
+        return web.Response()
+
+    async def poll(self, bot: Bot, allowed_updates: list[str]):
+        """
+        Получение апдейтов через long polling и распределение по процессам.
+
+        :param bot: Объект бота
+        :type bot: Bot
+        :param allowed_updates: Типы апдейтов, которые обрабатывает бот
+        :type allowed_updates: list[str]
+        :return: None
+        """
+        offset = None
+        while True:
+            try:
+                updates = await bot.get_updates(
+                    offset=offset, timeout=POLLING_TIMEOUT, allowed_updates=allowed_updates,
+                )
+            except Exception as e:
+                logger.error("Ошибка получения апдейтов: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                self.route_update(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+                offset = update.update_id + 1
+
+    async def monitor(self):
+        """
+        Перезапуск завершившихся процессов-обработчиков.
+
+        :return: None
+        """
+        while True:
+            await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+            for index, process in enumerate(self._processes):
+                if process and not process.is_alive():
+                    logger.error("Процесс-обработчик %d завершился (код %s), перезапуск", index, process.exitcode)
+                    self.restarts[index] += 1
+                    self._spawn(index)
+
+    def start(self):
+        """
+        Запуск процессов-обработчиков.
+
+        :return: None
+        """
+        self._loop = asyncio.get_running_loop()
+        threading.Thread(target=self._read_outbox, name="workers-outbox", daemon=True).start()
+        for index in range(self.workers):
+            self._spawn(index)
+            stats_collector.register(f"worker_{index}", lambda index=index: {
+                key: value for key, value in self.worker_report(index).items()
+                if isinstance(value, (int, float)) and key != "index"
+            })
+
+    async def stop(self):
+        """
+        Остановка процессов-обработчиков с ожиданием текущих апдейтов.
+
+        :return: None
+        """
+        for inbox in self._inboxes:
+            inbox.put(("stop",))
+        for process in self._processes:
+            if process:
+                await asyncio.to_thread(process.join, WORKER_STOP_TIMEOUT)
+                if process.is_alive():
+                    process.terminate()
+        self._outbox.put(None)
+
+
+async def run_supervisor():
+    """
+    Запуск супервизора: сервер OAuth/webhook/метрик, процессы-обработчики
+    и получение апдейтов.
+
+    :return: None
+    """
+    # Миграции выполняются один раз до запуска процессов-обработчиков
+    await init_db()
+    await Tortoise.close_connections()
+
+    supervisor = Supervisor(WORKERS)
+    bot = Bot(token=BOT_TOKEN)
+    dp = create_dispatcher()
+
+    # Колбэк OAuth обрабатывает процесс-владелец пользователя
+    redirect_app["authorize"] = supervisor.authorize
+    redirect_app.router.add_get("/health", supervisor.health_handler)
+    if WEBHOOK_URL:
+        secret = redirect_app["webhook_secret"] = webhook_secret
+        redirect_app.router.add_post(WEBHOOK_PATH, supervisor.webhook_handler)
+
+    supervisor.start()
+    runner = web.AppRunner(redirect_app)
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", 8888).start()
+    background = [
+        asyncio.create_task(supervisor.monitor()),
+        asyncio.create_task(monitor_event_loop()),
+    ]
+    logger.info("🚀 Супервизор запущен, процессов-обработчиков: %d", WORKERS)
+
+    try:
+        if WEBHOOK_URL:
+            await set_webhook(dp, bot, secret)
+            logger.info("🌐 Webhook установлен: %s", WEBHOOK_URL)
+            await asyncio.Event().wait()
+        else:
+            await bot.delete_webhook()
+            await supervisor.poll(bot, dp.resolve_used_update_types())
+    finally:
+        for task in background:
+            task.cancel()
+        await supervisor.stop()
+        await bot.session.close()
+        await runner.cleanup()
@@ -1,34 +1,72 @@
 import asyncio
+from functools import partial
+from bot.config import MAX_CONCURRENT_UPDATES, WEBHOOK_URL, WORKERS
 from bot.main import setup_bot
 from aiohttp import web
-from bot.spotify_redirect_server import app as redirect_app
+from bot.spotify_redirect_server import app as redirect_app, set_webhook, setup_webhook
+from bot.services.auth import complete_authorization
+from bot.services.library import library_sync_loop
+from bot.services.spotify_api import close_session
 from bot.utils.logger import logger
+from bot.utils.metrics import monitor_event_loop
+from bot.workers import run_supervisor
 
 
 async def run_bot_and_server():
     """
     Запуск Telegram-бота и веб-сервера для Spotify OAuth.
 
+    Если задан WEBHOOK_URL, апдейты принимаются через webhook на том же
+    сервере, иначе используется polling.
+
     :return: None
     """
     # Инициализация бота и диспетчера
     dp, bot = await setup_bot()
 
+    # Webhook подключается к приложению до его запуска
+    secret = setup_webhook(dp, bot) if WEBHOOK_URL else None
+
+    # Колбэк OAuth завершает авторизацию и отправляет подтверждение через этого бота
+    redirect_app["authorize"] = partial(complete_authorization, bot)
+
     # Настройка и запуск веб-сервера для колбэка Spotify
     runner = web.AppRunner(redirect_app)
     await runner.setup()
     site = web.TCPSite(runner, "0.0.0.0", 8888)
     await site.start()
 
+    # Фоновое измерение задержки цикла событий для /metrics
+    loop_monitor = asyncio.create_task(monitor_event_loop())
+
+    # Фоновая синхронизация библиотек пользователей
+    library_sync = asyncio.create_task(library_sync_loop())
+
     logger.info("✅ Redirect сервер запущен на http://localhost:8888")
     logger.info("🚀 Бот запущен!")
 
-    # Запуск polling Telegram-бота
-    await dp.start_polling(bot)
+    try:
+        if WEBHOOK_URL:
+            # Приём апдейтов через webhook
+            await set_webhook(dp, bot, secret)
+            logger.info("🌐 Webhook установлен: %s", WEBHOOK_URL)
+            await asyncio.Event().wait()
+        else:
+            # Запуск polling Telegram-бота (webhook при этом должен быть снят)
+            await bot.delete_webhook()
+            await dp.start_polling(bot, tasks_concurrency_limit=MAX_CONCURRENT_UPDATES)
+    finally:
+        loop_monitor.cancel()
+        library_sync.cancel()
+
+        # Закрытие общей HTTP-сессии Spotify
+        await close_session()
+        await runner.cleanup()
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(run_bot_and_server())
+        # При WORKERS > 1 апдейты обрабатывают отдельные процессы
+        asyncio.run(run_supervisor() if WORKERS > 1 else run_bot_and_server())
     except (KeyboardInterrupt, SystemExit):
         logger.info("⛔ Бот остановлен.")